@@ -24,6 +24,7 @@ os.environ['WDM_PRINT_FIRST_LINE'] = 'False'
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
 
 from database import SupabaseManager, DatabaseConfig
+from telemetry import instrument_driver
 
 # Helper functions
 def get_database_manager():
@@ -209,7 +210,7 @@ def setup_driver():
     options.add_experimental_option('excludeSwitches', ['enable-logging'])
     options.add_experimental_option('useAutomationExtension', False)
     
-    return webdriver.Chrome(options=options)
+    return instrument_driver(webdriver.Chrome(options=options), "stock_price")
 
 # Global variables for tracking
 dashboard_results = []
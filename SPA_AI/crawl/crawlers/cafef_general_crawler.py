@@ -22,6 +22,7 @@ import os
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
 
 from database import SupabaseManager, DatabaseConfig, format_datetime_for_db
+from telemetry import instrument_driver
 
 # Constants
 STOCK_CODES = ["FPT", "GAS", "IMP", "VCB"]
@@ -109,7 +110,7 @@ def setup_driver():
     options.add_argument("--log-level=3")
     options.add_experimental_option('excludeSwitches', ['enable-logging'])
     options.add_experimental_option('useAutomationExtension', False)
-    return webdriver.Chrome(options=options)
+    return instrument_driver(webdriver.Chrome(options=options), "cafef_general")
 
 # Helpers for source_link (CafeF)
 def _clean_url(u: str) -> Union[str, None]:
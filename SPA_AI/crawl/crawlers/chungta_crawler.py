@@ -23,6 +23,7 @@ sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspa
 
 
 from database import SupabaseManager, DatabaseConfig, format_datetime_for_db
+from telemetry import instrument_driver, timer
 
 # Constants
 STOCK_CODES = ["FPT", "GAS", "IMP", "VCB"]
@@ -136,7 +137,7 @@ def crawl_chungta(url, table_name, db_manager):
     options.add_argument("--log-level=3")
     options.add_experimental_option('excludeSwitches', ['enable-logging'])
     options.add_experimental_option('useAutomationExtension', False)
-    driver = webdriver.Chrome(options=options)
+    driver = instrument_driver(webdriver.Chrome(options=options), "chungta")
 
     driver.get(url)
     wait = WebDriverWait(driver, 10)
@@ -192,7 +193,8 @@ def crawl_chungta(url, table_name, db_manager):
         try:
             print(f"[{i+1}/{len(links_to_crawl)}] {link}")
             
-            res = requests.get(link, headers=headers, timeout=10)
+            with timer("page_load", crawler="chungta"):
+                res = requests.get(link, headers=headers, timeout=10)
             article_soup = BeautifulSoup(res.text, "html.parser")
 
             # Get title from original link
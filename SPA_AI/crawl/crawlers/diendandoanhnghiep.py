@@ -36,6 +36,7 @@ import os
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
 
 from database import SupabaseManager, DatabaseConfig, format_datetime_for_db
+from telemetry import instrument_driver
 
 # ============================================
 # CONSTANTS & CONFIGURATION
@@ -174,7 +175,7 @@ def setup_driver():
     options.add_experimental_option('excludeSwitches', ['enable-logging'])
     options.add_experimental_option('useAutomationExtension', False)
     
-    driver = webdriver.Chrome(options=options)
+    driver = instrument_driver(webdriver.Chrome(options=options), "dddn")
     driver.set_page_load_timeout(45)
     return driver
 
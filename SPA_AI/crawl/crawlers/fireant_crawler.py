@@ -24,6 +24,7 @@ sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspa
 
 
 from database import SupabaseManager, DatabaseConfig, format_datetime_for_db
+from telemetry import instrument_driver
 
 # Constants from old config
 FIREANT_BASE_URL = "https://fireant.vn"
@@ -179,7 +180,7 @@ def setup_driver():
     options.add_argument("--log-level=3")
     options.add_experimental_option('excludeSwitches', ['enable-logging'])
     options.add_experimental_option('useAutomationExtension', False)
-    return webdriver.Chrome(options=options)
+    return instrument_driver(webdriver.Chrome(options=options), "fireant")
 
 # NEW: Extract source link in #post_content
 def extract_source_link_from_post(soup):
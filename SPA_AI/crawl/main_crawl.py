@@ -27,6 +27,7 @@ from crawlers.petrotimes import crawl_petrotimes_gas, main_petrotimes
 # Import centralized database system
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from database import SupabaseManager
+from telemetry import observe, count
 
 # Helper function for compatibility
 def get_database_manager():
@@ -100,9 +101,12 @@ class CrawlerController:
             self.log_start(crawler_name)
             result = crawler_func(*args, **kwargs)
             self.log_success(crawler_name)
+            observe("crawler", self.crawlers_status[crawler_name]['duration'].total_seconds(), crawler=crawler_name)
             return result
         except Exception as e:
             self.log_error(crawler_name, e)
+            observe("crawler", self.crawlers_status[crawler_name]['duration'].total_seconds(), crawler=crawler_name)
+            count("crawler_errors", crawler=crawler_name)
             return None
             
     def run_fireant_crawlers(self):
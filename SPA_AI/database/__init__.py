@@ -4,15 +4,18 @@ Centralized database management for SPA VIP system
 """
 
 from .supabase_manager import SupabaseManager, get_database_manager, get_supabase_client
+from .async_supabase_manager import AsyncSupabaseManager, get_async_database_manager
 from .config import DatabaseConfig
 from .schemas import NewsSchema, StockSchema, format_datetime_for_db
 
 __all__ = [
     'SupabaseManager',
+    'AsyncSupabaseManager',
     'DatabaseConfig', 
     'NewsSchema',
     'StockSchema',
     'get_database_manager',
+    'get_async_database_manager',
     'get_supabase_client',
     'format_datetime_for_db'
 ]
@@ -0,0 +1,590 @@
+"""
+Async Supabase Manager
+Asynchronous database operations for SPA VIP system
+
+AsyncSupabaseManager talks to PostgREST (Supabase /rest/v1) directly with a
+pooled httpx.AsyncClient (HTTP/2 when the h2 package is installed), so one
+connection pool is shared by every request of the event loop instead of each
+module creating its own blocking client. A semaphore caps the number of
+requests in flight and identical GET requests that are in flight at the same
+time are coalesced into one. Method names and return values mirror
+SupabaseManager, so independent reads and writes can be gathered:
+
+    async with AsyncSupabaseManager() as db:
+        summaries, latest = await asyncio.gather(
+            db.fetch_unsummarized_articles(limit=50),
+            db.get_latest_article_ids()
+        )
+"""
+
+import asyncio
+import json
+import logging
+import weakref
+from typing import Dict, Any, Callable, List, Optional, Tuple
+
+import httpx
+
+from .config import DatabaseConfig
+from telemetry import timer, count
+from .schemas import NewsSchema, StockSchema, validate_article_data, validate_stock_data
+from .sentiment_counts import (
+    SENTIMENT_LABELS, SENTIMENT_COUNTS_RPC, build_rpc_params, group_sentiment_rows, is_missing_rpc_error,
+    normalize_count_rows, validate_news_table
+)
+from .table_stats import NEWS_TABLE_STATS_RPC, build_table_stats, empty_table_stats, normalize_stats_rows
+from .supabase_manager import SupabaseManager
+from .work_queue import CLAIM_WORK_RPC, COMPLETE_WORK_RPC, default_worker_id, validate_stage
+
+logger = logging.getLogger(__name__)
+
+try:
+    import h2  # noqa: F401  (enables HTTP/2 in httpx)
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+
+def _in_filter(values: List[Any]) -> str:
+    """PostgREST in.(...) value with strings quoted"""
+    return "in.(" + ",".join(json.dumps(v) if isinstance(v, str) else str(v) for v in values) + ")"
+
+
+def _content_range_total(response: httpx.Response) -> int:
+    """Total from a Content-Range header such as '0-9/120' or '*/120'"""
+    total = response.headers.get("content-range", "").rsplit("/", 1)[-1]
+    return int(total) if total.isdigit() else 0
+
+
+class AsyncSupabaseManager:
+    """Asynchronous Supabase (PostgREST) database manager"""
+
+    def __init__(self, max_connections: int = None, max_concurrency: int = None, timeout: float = None):
+        """
+        Initialize the pooled HTTP client
+
+        Args:
+            max_connections: Connection pool size (default ASYNC_DB_MAX_CONNECTIONS)
+            max_concurrency: Requests in flight at once (default ASYNC_DB_MAX_CONCURRENCY)
+            timeout: Request timeout in seconds (default ASYNC_DB_TIMEOUT)
+        """
+        self.config = DatabaseConfig()
+        self.config.validate_config()
+
+        max_connections = max_connections or self.config.ASYNC_DB_MAX_CONNECTIONS
+        self.max_concurrency = max_concurrency or self.config.ASYNC_DB_MAX_CONCURRENCY
+        http2 = self.config.ASYNC_DB_HTTP2 and HTTP2_AVAILABLE
+
+        self.client = httpx.AsyncClient(
+            base_url=f"{self.config.SUPABASE_URL.rstrip('/')}/rest/v1",
+            headers={
+                "apikey": self.config.SUPABASE_KEY,
+                "Authorization": f"Bearer {self.config.SUPABASE_KEY}",
+            },
+            http2=http2,
+            timeout=timeout or self.config.ASYNC_DB_TIMEOUT,
+            limits=httpx.Limits(max_connections=max_connections,
+                                max_keepalive_connections=max_connections)
+        )
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        # (path, params, headers) of GET requests in flight -> their shared task
+        self._inflight: Dict[Tuple, asyncio.Task] = {}
+        self._sentiment_rpc_available = self.config.SENTIMENT_AGGREGATION_MODE == "server"
+        self.worker_id = default_worker_id()
+
+        logger.info(f"Async Supabase client initialized (http2={http2}, "
+                    f"pool={max_connections}, concurrency={self.max_concurrency})")
+
+    async def __aenter__(self) -> 'AsyncSupabaseManager':
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close_connections()
+
+    # ============ REQUESTS ============
+
+    async def _request(self, method: str, path: str, params: Dict[str, Any] = None,
+                       json_body: Any = None, headers: Dict[str, str] = None) -> httpx.Response:
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        async with self._semaphore:
+            response = await self.client.request(method, path, params=params, json=json_body, headers=headers)
+        count("async_db_requests", method=method)
+        response.raise_for_status()
+        return response
+
+    async def _get(self, path: str, params: Dict[str, Any] = None,
+                   headers: Dict[str, str] = None) -> httpx.Response:
+        """GET, sharing the response with identical requests already in flight"""
+        key = (path, tuple(sorted((params or {}).items())), tuple(sorted((headers or {}).items())))
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._request("GET", path, params=params, headers=headers))
+            self._inflight[key] = task
+            task.add_done_callback(lambda done: self._inflight.pop(key, None)
+                                   if self._inflight.get(key) is done else None)
+        else:
+            count("async_db_coalesced")
+        # shield: a cancelled caller must not cancel the request for the others
+        return await asyncio.shield(task)
+
+    async def _select(self, table_name: str, params: Dict[str, Any]) -> List[Dict]:
+        response = await self._get(f"/{table_name}", params)
+        # Coalesced callers share the response: hand each one its own row dicts
+        return [dict(row) for row in response.json()]
+
+    async def _count(self, table_name: str, params: Dict[str, Any] = None) -> int:
+        """count="exact" with head=True: only the Content-Range header is transferred"""
+        params = dict(params or {})
+        params.setdefault("select", "id")
+        params["limit"] = 0
+        response = await self._get(f"/{table_name}", params, headers={"Prefer": "count=exact"})
+        return _content_range_total(response)
+
+    async def _rpc(self, function: str, params: Dict[str, Any]) -> Any:
+        response = await self._request("POST", f"/rpc/{function}", json_body=params)
+        return response.json() if response.content else None
+
+    async def _update(self, table_name: str, values: Dict[str, Any], filters: Dict[str, str]) -> List[Dict]:
+        response = await self._request("PATCH", f"/{table_name}", params=filters, json_body=values,
+                                       headers={"Prefer": "return=representation"})
+        return response.json()
+
+    async def _upsert(self, table_name: str, row: Dict[str, Any], on_conflict: str) -> List[Dict]:
+        response = await self._request(
+            "POST", f"/{table_name}", params={"on_conflict": on_conflict}, json_body=row,
+            headers={"Prefer": "resolution=merge-duplicates,return=representation"}
+        )
+        return response.json()
+
+    # ============ NEWS OPERATIONS ============
+
+    async def insert_article(self, table_name: str, article_data: Dict[str, Any]) -> bool:
+        """Insert article with validation and duplicate check (see SupabaseManager.insert_article)"""
+        try:
+            if not validate_article_data(article_data):
+                logger.warning(f"Invalid article data: {article_data.get('title', '')[:50]}...")
+                return False
+
+            link = article_data.get("link", "")
+            if link and await self.article_exists(table_name, link):
+                logger.info(f"Article already exists: {article_data.get('title', '')[:50]}...")
+                count("articles_duplicate", table=table_name)
+                return False
+
+            article = NewsSchema.from_crawler_data(article_data)
+            if not article.validate():
+                logger.warning(f"Article validation failed: {article.title[:50]}...")
+                return False
+
+            is_general_news = table_name.lower() == "general_news"
+            with timer("db_write", op="insert_article", table=table_name):
+                data = await self._upsert(table_name, article.to_dict(include_industry=is_general_news), "link")
+
+            if data:
+                logger.info(f"Inserted article: {article.title[:50]}...")
+                count("articles_inserted", table=table_name)
+                self._notify_insert(table_name, data[0])
+                return True
+            logger.error(f"Failed to insert article: {article.title[:50]}...")
+            return False
+
+        except Exception as e:
+            logger.error(f"Database error inserting article: {e}")
+            count("db_errors", op="insert_article")
+            return False
+
+    def _notify_insert(self, table_name: str, row: Dict[str, Any]):
+        """Run the process-wide SupabaseManager insert listeners"""
+        for listener in list(SupabaseManager._insert_listeners):
+            try:
+                listener(table_name, row)
+            except Exception as e:
+                logger.error(f"Insert listener failed for {table_name}: {e}")
+
+    async def article_exists(self, table_name: str, link: str) -> bool:
+        """Check if article already exists"""
+        try:
+            rows = await self._select(table_name, {"select": "id", "link": f"eq.{link}", "limit": 1})
+            return len(rows) > 0
+        except Exception as e:
+            logger.error(f"Error checking article existence: {e}")
+            return False
+
+    async def fetch_unsummarized_articles(self, table_name: str = None, limit: int = 100,
+                                          claim: bool = True) -> List[Dict]:
+        """
+        Fetch articles without AI summary (all tables are queried concurrently)
+
+        Claimed from the work queue when USE_WORK_QUEUE is set, otherwise
+        found by scanning for an empty ai_summary.
+
+        Args:
+            table_name: Specific table or None for all tables
+            limit: Maximum number of articles
+            claim: False reads a sample by scanning, without claiming work
+
+        Returns:
+            List of articles
+        """
+        if claim:
+            claimed = await self.claim_pending_articles(
+                "summarize", "id,title,content,link,date", table_name, limit,
+                keep=lambda article: len((article.get("content") or "").strip()) > 50
+            )
+            if claimed is not None:
+                return claimed
+
+        tables = [table_name] if table_name else self.config.get_all_news_tables()
+
+        async def fetch(table: str) -> List[Dict]:
+            with timer("db_fetch", op="unsummarized", table=table):
+                rows = await self._select(table, {
+                    "select": "id,title,content,link,date",
+                    "or": "(ai_summary.is.null,ai_summary.eq.)",
+                    "content": "neq.",
+                    "order": "id.desc",
+                    "limit": limit
+                })
+            articles = []
+            for article in rows:
+                if len((article.get("content") or "").strip()) > 50:
+                    article["table_name"] = table
+                    articles.append(article)
+            logger.info(f"Found {len(rows)} unsummarized articles in {table}")
+            return articles
+
+        results = await asyncio.gather(*(fetch(table) for table in tables), return_exceptions=True)
+        all_articles = []
+        for table, result in zip(tables, results):
+            if isinstance(result, Exception):
+                logger.error(f"Error fetching unsummarized articles from {table}: {result}")
+                count("db_errors", op="unsummarized")
+            else:
+                all_articles.extend(result)
+
+        logger.info(f"Total unsummarized articles found: {len(all_articles)}")
+        return all_articles[:limit]
+
+    async def update_article_summary(self, article_id: str, summary: str, table_name: str) -> bool:
+        """Update article with AI summary"""
+        return await self._update_article(article_id, {"ai_summary": summary}, table_name, "summary")
+
+    async def update_article_industry(self, article_id: str, industry: str, table_name: str) -> bool:
+        """Update article with industry classification"""
+        return await self._update_article(article_id, {"industry": industry}, table_name, "industry")
+
+    async def _update_article(self, article_id: str, values: Dict[str, Any], table_name: str, op: str) -> bool:
+        try:
+            with timer("db_write", op=op, table=table_name):
+                data = await self._update(table_name, values, {"id": f"eq.{article_id}"})
+            if data:
+                logger.info(f"Updated {op} for article {article_id} in {table_name}")
+                return True
+            logger.warning(f"No rows updated for article {article_id} in {table_name}")
+            return False
+        except Exception as e:
+            logger.error(f"Error updating {op} for article {article_id}: {e}")
+            count("db_errors", op=op)
+            return False
+
+    async def fetch_unclassified_articles(self, table_name: str = None, limit: int = 100) -> List[Dict]:
+        """Fetch articles with summaries but without industry classification (General_News only)"""
+        if table_name and table_name != 'General_News':
+            logger.warning("Industry classification only works on General_News table")
+            return []
+
+        claimed = await self.claim_pending_articles(
+            "industry", "id,title,content,ai_summary", "General_News", limit,
+            keep=lambda article: len((article.get("ai_summary") or "").strip()) > 10
+        )
+        if claimed is not None:
+            return claimed
+
+        try:
+            with timer("db_fetch", op="unclassified", table="General_News"):
+                rows = await self._select("General_News", {
+                    "select": "id,title,content,ai_summary",
+                    "ai_summary": "not.is.null",
+                    "and": "(ai_summary.neq.)",
+                    "or": "(industry.is.null,industry.eq.)",
+                    "order": "id.desc",
+                    "limit": limit
+                })
+        except Exception as e:
+            logger.error(f"Error fetching unclassified articles: {e}")
+            return []
+
+        articles = []
+        for article in rows:
+            if len((article.get("ai_summary") or "").strip()) > 10:
+                article["table_name"] = "General_News"
+                articles.append(article)
+        logger.info(f"Total unclassified articles found: {len(articles)}")
+        return articles[:limit]
+
+    # ============ WORK QUEUE ============
+
+    def uses_work_queue(self) -> bool:
+        """Whether pending work is claimed from pipeline_queue (shares SupabaseManager's RPC flag)"""
+        return self.config.USE_WORK_QUEUE and SupabaseManager._work_queue_rpc_available
+
+    async def claim_pending_articles(self, stage: str, columns: str, table_name: str = None, limit: int = 100,
+                                     keep: Callable[[Dict[str, Any]], bool] = None) -> Optional[List[Dict]]:
+        """
+        Claim articles waiting for a stage from the work queue (see SupabaseManager.claim_pending_articles)
+
+        Returns:
+            List of articles (with table_name), or None if the work queue is
+            disabled or not installed and the caller should scan instead
+            (an empty list when a claim fails for another reason)
+        """
+        if not self.uses_work_queue():
+            return None
+        params = {
+            "p_stage": validate_stage(stage),
+            "p_limit": limit,
+            "p_worker": self.worker_id,
+            "p_table": validate_news_table(table_name) if table_name else None,
+            "p_lease_seconds": self.config.WORK_QUEUE_LEASE_SECONDS,
+            "p_max_attempts": self.config.WORK_QUEUE_MAX_ATTEMPTS,
+        }
+        try:
+            with timer("db_fetch", op=f"claim_{stage}", table=table_name):
+                claimed = await self._rpc(CLAIM_WORK_RPC, params) or []
+                ids_by_table: Dict[str, List[int]] = {}
+                for row in claimed:
+                    ids_by_table.setdefault(row["source_table"], []).append(int(row["article_id"]))
+                tables = list(ids_by_table)
+                results = await asyncio.gather(*(
+                    self._select(table, {"select": columns, "id": _in_filter(ids_by_table[table])})
+                    for table in tables
+                ))
+        except Exception as e:
+            if is_missing_rpc_error(e):
+                logger.warning(f"Work queue not installed, scanning tables instead: {e}")
+                SupabaseManager._work_queue_rpc_available = False
+                return None
+            logger.error(f"Error claiming {stage} work: {e}")
+            count("db_errors", op="queue_claim")
+            return []
+
+        exhausted = [row for row in claimed if int(row.get("attempts") or 0) >= self.config.WORK_QUEUE_MAX_ATTEMPTS]
+        if exhausted:
+            count("queue_last_attempt", len(exhausted), stage=stage)
+            logger.warning(f"{len(exhausted)} {stage} items claimed for their last attempt")
+
+        rows_by_key = {}
+        for table, rows in zip(tables, results):
+            for row in rows:
+                row["table_name"] = table
+                rows_by_key[(table, int(row["id"]))] = row
+        articles = [rows_by_key[key] for key in
+                    ((row["source_table"], int(row["article_id"])) for row in claimed) if key in rows_by_key]
+
+        if keep is not None:
+            skipped_by_table: Dict[str, List[int]] = {}
+            for article in articles:
+                if not keep(article):
+                    skipped_by_table.setdefault(article["table_name"], []).append(article["id"])
+            articles = [article for article in articles if keep(article)]
+            for table, ids in skipped_by_table.items():
+                try:
+                    await self._rpc(COMPLETE_WORK_RPC, {"p_stage": stage, "p_table": table, "p_ids": ids})
+                except Exception as e:
+                    logger.error(f"Error completing {stage} work in {table}: {e}")
+                    count("db_errors", op="queue_complete")
+
+        count("queue_claimed", len(articles), stage=stage)
+        logger.info(f"Claimed {len(articles)} articles for {stage} from the work queue")
+        return articles
+
+    # ============ STOCK OPERATIONS ============
+
+    async def insert_stock_data(self, table_name: str, stock_data: Dict[str, Any]) -> bool:
+        """Insert stock price data"""
+        try:
+            if not validate_stock_data(stock_data):
+                logger.warning(f"Invalid stock data for {table_name}")
+                return False
+
+            stock = StockSchema.from_crawler_data(stock_data)
+            if not stock.validate():
+                logger.warning(f"Stock validation failed for {table_name}")
+                return False
+
+            data = await self._upsert(table_name, stock.to_dict(), "date")
+            if data:
+                logger.info(f"Inserted stock data for {table_name} - {stock.date}")
+                return True
+            logger.error(f"Failed to insert stock data for {table_name}")
+            return False
+
+        except Exception as e:
+            logger.error(f"Database error inserting stock data: {e}")
+            return False
+
+    # ============ SENTIMENT AGGREGATION ============
+
+    async def get_sentiment_daily_counts(self, table_name: str, start_date: str = None,
+                                         end_date: str = None, dates: List[str] = None) -> List[Dict[str, Any]]:
+        """Count Positive/Negative/Neutral news per date (see SupabaseManager.get_sentiment_daily_counts)"""
+        if dates is not None:
+            dates = sorted(set(dates))
+            if not dates:
+                return []
+
+        if self._sentiment_rpc_available:
+            try:
+                params = build_rpc_params(table_name, start_date, end_date, dates)
+                return normalize_count_rows(await self._rpc(SENTIMENT_COUNTS_RPC, params) or [])
+            except ValueError:
+                raise
+            except Exception as e:
+                if not is_missing_rpc_error(e):
+                    raise
+                logger.warning(f"{SENTIMENT_COUNTS_RPC} RPC not installed, aggregating on client: {e}")
+                self._sentiment_rpc_available = False
+
+        return group_sentiment_rows(await self._fetch_sentiment_rows(table_name, start_date, end_date, dates))
+
+    async def _fetch_sentiment_rows(self, table_name: str, start_date: str = None, end_date: str = None,
+                                    dates: List[str] = None, page_size: int = 1000) -> List[Dict]:
+        """Download (date, sentiment) rows, one paginated reader per date chunk running concurrently"""
+        date_chunks = [dates[i:i + 100] for i in range(0, len(dates), 100)] if dates else [None]
+
+        async def fetch(chunk: Optional[List[str]]) -> List[Dict]:
+            params = {"select": "date,sentiment", "sentiment": _in_filter(list(SENTIMENT_LABELS)), "order": "id"}
+            date_filters = []
+            if start_date:
+                date_filters.append(f"date.gte.{start_date}")
+            if end_date:
+                date_filters.append(f"date.lte.{end_date}")
+            if chunk:
+                date_filters.append(f"date.{_in_filter(chunk)}")
+            if date_filters:
+                params["and"] = "(" + ",".join(date_filters) + ")"
+
+            rows, offset = [], 0
+            while True:
+                batch = await self._select(table_name, {**params, "offset": offset, "limit": page_size})
+                rows.extend(batch)
+                if len(batch) < page_size:
+                    return rows
+                offset += page_size
+
+        chunks = await asyncio.gather(*(fetch(chunk) for chunk in date_chunks))
+        return [row for rows in chunks for row in rows]
+
+    # ============ STATISTICS ============
+
+    async def get_table_stats(self, max_age: float = None) -> Dict[str, Dict]:
+        """Get statistics for all news tables (shares SupabaseManager's stats cache)"""
+        tables = self.config.get_all_news_tables()
+        cache = SupabaseManager._get_stats_cache()
+        cached = cache.get(tables, max_age)
+        if cached is not None:
+            return cached
+
+        stats = None
+        if SupabaseManager._table_stats_rpc_available:
+            try:
+                with timer("db_fetch", op="table_stats_rpc"):
+                    stats = normalize_stats_rows(await self._rpc(NEWS_TABLE_STATS_RPC, {"p_tables": tables}) or [])
+                for table in tables:
+                    stats.setdefault(table, empty_table_stats())
+            except Exception as e:
+                if is_missing_rpc_error(e):
+                    logger.warning(f"{NEWS_TABLE_STATS_RPC} RPC not installed, counting per table: {e}")
+                    SupabaseManager._table_stats_rpc_available = False
+                else:
+                    # Transient failure: count per table this time, keep using the RPC
+                    logger.warning(f"{NEWS_TABLE_STATS_RPC} RPC failed, counting per table: {e}")
+                    count("db_errors", op="table_stats_rpc")
+
+        if stats is None:
+            with timer("db_fetch", op="table_stats_per_table"):
+                results = await asyncio.gather(*(self._count_table_stats(table) for table in tables))
+            stats = dict(zip(tables, results))
+
+        cache.set(tables, stats)
+        return stats
+
+    async def _count_table_stats(self, table: str) -> Dict[str, Any]:
+        has_industry = table == 'General_News'
+        try:
+            counts = [
+                self._count(table, {"content": "neq."}),
+                self._count(table, {"ai_summary": "not.is.null", "and": "(ai_summary.neq.,content.neq.)"}),
+            ]
+            if has_industry:
+                counts.append(self._count(table, {
+                    "industry": "not.is.null", "ai_summary": "not.is.null", "and": "(industry.neq.,ai_summary.neq.)"
+                }))
+            totals = await asyncio.gather(*counts)
+            classified = totals[2] if has_industry else 0
+            return build_table_stats(totals[0], totals[1], classified, has_industry=has_industry)
+        except Exception as e:
+            logger.error(f"Error getting stats for {table}: {e}")
+            return empty_table_stats()
+
+    async def get_table_count(self, table_name: str) -> int:
+        """Get total count for a table"""
+        try:
+            return await self._count(table_name)
+        except Exception as e:
+            logger.error(f"Error counting table {table_name}: {e}")
+            return 0
+
+    async def get_latest_article_ids(self) -> Dict[str, int]:
+        """Highest article id per news table (all tables queried concurrently)"""
+        tables = self.config.get_all_news_tables()
+
+        async def latest(table: str) -> int:
+            try:
+                rows = await self._select(table, {"select": "id", "order": "id.desc", "limit": 1})
+                return rows[0]['id'] if rows else 0
+            except Exception as e:
+                logger.error(f"Error reading latest id of {table}: {e}")
+                return 0
+
+        return dict(zip(tables, await asyncio.gather(*(latest(table) for table in tables))))
+
+    # ============ UTILITY METHODS ============
+
+    async def test_connection(self) -> bool:
+        """Test database connection"""
+        try:
+            await asyncio.gather(*(
+                self._select(table, {"select": "id", "limit": 1}) for table in self.config.get_all_news_tables()
+            ))
+            logger.info("All database connections working properly")
+            return True
+        except Exception as e:
+            logger.error(f"Database connection test failed: {e}")
+            return False
+
+    async def close_connections(self):
+        """Close the pooled HTTP client"""
+        await self.client.aclose()
+        loop = asyncio.get_running_loop()
+        # Only forget the loop's shared manager if it is this one
+        if _shared_managers.get(loop) is self:
+            del _shared_managers[loop]
+
+
+# ============ FACTORY FUNCTIONS ============
+
+# One manager (and connection pool) per event loop
+_shared_managers: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, AsyncSupabaseManager]" = \
+    weakref.WeakKeyDictionary()
+
+
+def get_async_database_manager() -> AsyncSupabaseManager:
+    """Shared async database manager of the running event loop"""
+    loop = asyncio.get_running_loop()
+    manager = _shared_managers.get(loop)
+    if manager is None or manager.client.is_closed:
+        manager = AsyncSupabaseManager()
+        _shared_managers[loop] = manager
+    return manager
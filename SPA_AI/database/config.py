@@ -33,6 +33,29 @@ class DatabaseConfig:
         "vcb_stock": "VCB_Stock"
     }
     
+    # Sentiment aggregation: "server" uses the sentiment_daily_counts RPC,
+    # "client" downloads (date, sentiment) rows and groups them locally
+    SENTIMENT_AGGREGATION_MODE = os.getenv("SENTIMENT_AGGREGATION_MODE", "server").lower()
+    
+    # get_table_stats: seconds a result is reused, and the file sharing it between processes
+    TABLE_STATS_TTL = float(os.getenv("TABLE_STATS_TTL", "30"))
+    TABLE_STATS_CACHE_FILE = os.getenv(
+        "TABLE_STATS_CACHE_FILE",
+        os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "logs", "table_stats_cache.json")
+    )
+    
+    # Pending work: claim it from the pipeline_queue table (migration 004)
+    # instead of scanning the news tables for NULL / empty columns
+    USE_WORK_QUEUE = os.getenv("USE_WORK_QUEUE", "false").lower() in ("1", "true", "yes")
+    WORK_QUEUE_LEASE_SECONDS = int(os.getenv("WORK_QUEUE_LEASE_SECONDS", "600"))
+    WORK_QUEUE_MAX_ATTEMPTS = int(os.getenv("WORK_QUEUE_MAX_ATTEMPTS", "5"))
+
+    # AsyncSupabaseManager: pooled connections, requests in flight, timeout (s), HTTP/2 if h2 is installed
+    ASYNC_DB_MAX_CONNECTIONS = int(os.getenv("ASYNC_DB_MAX_CONNECTIONS", "20"))
+    ASYNC_DB_MAX_CONCURRENCY = int(os.getenv("ASYNC_DB_MAX_CONCURRENCY", "10"))
+    ASYNC_DB_TIMEOUT = float(os.getenv("ASYNC_DB_TIMEOUT", "30"))
+    ASYNC_DB_HTTP2 = os.getenv("ASYNC_DB_HTTP2", "true").lower() in ("1", "true", "yes")
+
     # Stock Codes
     STOCK_CODES = ["FPT", "GAS", "IMP", "VCB"]
     
@@ -0,0 +1,61 @@
+-- =====================================================================
+-- Server-side sentiment aggregation
+-- Returns one row per news date with Positive / Negative / Neutral counts
+-- so only aggregated rows cross the network instead of every article.
+--
+-- Usage (PostgREST / supabase-py):
+--   client.rpc("sentiment_daily_counts", {
+--       "p_table": "FPT_News",
+--       "p_start": "2020-01-01",   -- optional
+--       "p_end":   null,           -- optional
+--       "p_dates": ["2025-08-01"]  -- optional, restricts to these dates
+--   }).execute()
+-- =====================================================================
+
+CREATE OR REPLACE FUNCTION public.sentiment_daily_counts(
+    p_table TEXT,
+    p_start TEXT DEFAULT NULL,
+    p_end TEXT DEFAULT NULL,
+    p_dates TEXT[] DEFAULT NULL
+)
+RETURNS TABLE (
+    date TEXT,
+    "Positive" INTEGER,
+    "Negative" INTEGER,
+    "Neutral" INTEGER
+)
+LANGUAGE plpgsql
+STABLE
+AS $$
+BEGIN
+    -- Only news tables may be aggregated (table name is interpolated below)
+    IF p_table !~ '^[A-Za-z]+_News$' THEN
+        RAISE EXCEPTION 'sentiment_daily_counts: invalid news table %', p_table;
+    END IF;
+
+    RETURN QUERY EXECUTE format(
+        'SELECT t.date::text AS date,
+                COUNT(*) FILTER (WHERE t.sentiment = ''Positive'')::int AS "Positive",
+                COUNT(*) FILTER (WHERE t.sentiment = ''Negative'')::int AS "Negative",
+                COUNT(*) FILTER (WHERE t.sentiment = ''Neutral'')::int AS "Neutral"
+         FROM public.%I t
+         WHERE t.sentiment IN (''Positive'', ''Negative'', ''Neutral'')
+           AND ($1 IS NULL OR t.date::text >= $1)
+           AND ($2 IS NULL OR t.date::text <= $2)
+           AND ($3 IS NULL OR t.date::text = ANY($3))
+         GROUP BY t.date
+         ORDER BY t.date',
+        p_table
+    )
+    USING p_start, p_end, p_dates;
+END;
+$$;
+
+-- Supports the date filter + group by on every news table
+CREATE INDEX IF NOT EXISTS idx_general_news_date_sentiment ON public."General_News" (date, sentiment);
+CREATE INDEX IF NOT EXISTS idx_fpt_news_date_sentiment ON public."FPT_News" (date, sentiment);
+CREATE INDEX IF NOT EXISTS idx_gas_news_date_sentiment ON public."GAS_News" (date, sentiment);
+CREATE INDEX IF NOT EXISTS idx_imp_news_date_sentiment ON public."IMP_News" (date, sentiment);
+CREATE INDEX IF NOT EXISTS idx_vcb_news_date_sentiment ON public."VCB_News" (date, sentiment);
+
+GRANT EXECUTE ON FUNCTION public.sentiment_daily_counts(TEXT, TEXT, TEXT, TEXT[]) TO anon, authenticated, service_role;
@@ -0,0 +1,18 @@
+-- =====================================================================
+-- Sentiment ledger for incremental stock sentiment counters
+-- One row per (stock table, article link) recording which trading day and
+-- label the article has already been counted under. Lets the incremental
+-- updater apply signed deltas idempotently instead of recounting days.
+-- =====================================================================
+
+CREATE TABLE IF NOT EXISTS public.sentiment_ledger (
+    stock_table TEXT NOT NULL,
+    link TEXT NOT NULL,
+    trading_day TEXT NOT NULL,
+    label TEXT NOT NULL CHECK (label IN ('Positive', 'Negative', 'Neutral')),
+    applied_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+    PRIMARY KEY (stock_table, link)
+);
+
+CREATE INDEX IF NOT EXISTS idx_sentiment_ledger_day
+    ON public.sentiment_ledger (stock_table, trading_day);
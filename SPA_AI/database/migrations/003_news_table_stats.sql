@@ -0,0 +1,72 @@
+-- =====================================================================
+-- Per-table news statistics in one query
+-- Returns one row per news table with total / summarized / classified /
+-- sentiment counts, computed with COUNT(*) FILTER over a single UNION ALL
+-- statement instead of two or three count="exact" requests per table.
+--
+-- Usage (PostgREST / supabase-py):
+--   client.rpc("news_table_stats", {
+--       "p_tables": ["General_News", "FPT_News", "GAS_News", "IMP_News", "VCB_News"]
+--   }).execute()
+-- =====================================================================
+
+CREATE OR REPLACE FUNCTION public.news_table_stats(
+    p_tables TEXT[]
+)
+RETURNS TABLE (
+    table_name TEXT,
+    total INTEGER,
+    summarized INTEGER,
+    classified INTEGER,
+    has_industry BOOLEAN,
+    "Positive" INTEGER,
+    "Negative" INTEGER,
+    "Neutral" INTEGER
+)
+LANGUAGE plpgsql
+STABLE
+AS $$
+DECLARE
+    v_table TEXT;
+    v_has_industry BOOLEAN;
+    v_parts TEXT[] := ARRAY[]::TEXT[];
+BEGIN
+    FOREACH v_table IN ARRAY p_tables LOOP
+        -- Only news tables may be counted (table name is interpolated below)
+        IF v_table !~ '^[A-Za-z]+_News$' THEN
+            RAISE EXCEPTION 'news_table_stats: invalid news table %', v_table;
+        END IF;
+
+        SELECT EXISTS (
+            SELECT 1 FROM information_schema.columns c
+            WHERE c.table_schema = 'public' AND c.table_name = v_table AND c.column_name = 'industry'
+        ) INTO v_has_industry;
+
+        v_parts := v_parts || format(
+            'SELECT %L::text,
+                    COUNT(*) FILTER (WHERE t.content <> '''')::int,
+                    COUNT(*) FILTER (WHERE t.content <> '''' AND t.ai_summary <> '''')::int,
+                    %s,
+                    %L::boolean,
+                    COUNT(*) FILTER (WHERE t.sentiment = ''Positive'')::int,
+                    COUNT(*) FILTER (WHERE t.sentiment = ''Negative'')::int,
+                    COUNT(*) FILTER (WHERE t.sentiment = ''Neutral'')::int
+             FROM public.%I t',
+            v_table,
+            CASE WHEN v_has_industry
+                 THEN 'COUNT(*) FILTER (WHERE t.industry <> '''' AND t.ai_summary <> '''')::int'
+                 ELSE '0' END,
+            v_has_industry,
+            v_table
+        );
+    END LOOP;
+
+    IF array_length(v_parts, 1) IS NULL THEN
+        RETURN;
+    END IF;
+
+    RETURN QUERY EXECUTE array_to_string(v_parts, ' UNION ALL ');
+END;
+$$;
+
+GRANT EXECUTE ON FUNCTION public.news_table_stats(TEXT[]) TO anon, authenticated, service_role;
@@ -0,0 +1,238 @@
+-- =====================================================================
+-- Pending-work queue for the pipeline stages
+-- One row per (stage, news table, article) that still needs work, kept in
+-- sync by triggers on the news tables, so the phases claim their next batch
+-- from a small indexed table instead of scanning the news tables for
+-- NULL / empty ai_summary, sentiment or industry columns.
+--
+-- Stages:
+--   summarize  content present, ai_summary empty
+--   sentiment  ai_summary present, sentiment empty
+--   industry   ai_summary present, industry empty (tables with an industry column)
+--
+-- Usage (PostgREST / supabase-py):
+--   client.rpc("claim_pipeline_work", {
+--       "p_stage": "summarize", "p_limit": 20, "p_worker": "host-1234",
+--       "p_table": null, "p_lease_seconds": 600, "p_max_attempts": 5
+--   }).execute()
+-- Rows leave the queue automatically when the article column is filled in.
+-- =====================================================================
+
+CREATE TABLE IF NOT EXISTS public.pipeline_queue (
+    stage TEXT NOT NULL CHECK (stage IN ('summarize', 'sentiment', 'industry')),
+    source_table TEXT NOT NULL,
+    article_id BIGINT NOT NULL,
+    enqueued_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+    claimed_at TIMESTAMPTZ,
+    claimed_by TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (stage, source_table, article_id)
+);
+
+-- Unclaimed work in FIFO order (the hot path of claim_pipeline_work)
+CREATE INDEX IF NOT EXISTS idx_pipeline_queue_ready
+    ON public.pipeline_queue (stage, enqueued_at)
+    WHERE claimed_at IS NULL;
+
+-- Claimed work, scanned for expired leases
+CREATE INDEX IF NOT EXISTS idx_pipeline_queue_claimed
+    ON public.pipeline_queue (stage, claimed_at)
+    WHERE claimed_at IS NOT NULL;
+
+-- ---------------------------------------------------------------------
+-- Queue maintenance trigger (shared by every news table)
+-- ---------------------------------------------------------------------
+CREATE OR REPLACE FUNCTION public.pipeline_queue_sync()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_row JSONB := to_jsonb(NEW);
+    v_has_content BOOLEAN := COALESCE(v_row->>'content', '') <> '';
+    v_has_summary BOOLEAN := COALESCE(v_row->>'ai_summary', '') <> '';
+BEGIN
+    -- summarize
+    IF v_has_content AND NOT v_has_summary THEN
+        INSERT INTO public.pipeline_queue (stage, source_table, article_id)
+        VALUES ('summarize', TG_TABLE_NAME, NEW.id) ON CONFLICT DO NOTHING;
+    ELSE
+        DELETE FROM public.pipeline_queue
+        WHERE stage = 'summarize' AND source_table = TG_TABLE_NAME AND article_id = NEW.id;
+    END IF;
+
+    -- sentiment
+    IF v_has_summary AND COALESCE(v_row->>'sentiment', '') = '' THEN
+        INSERT INTO public.pipeline_queue (stage, source_table, article_id)
+        VALUES ('sentiment', TG_TABLE_NAME, NEW.id) ON CONFLICT DO NOTHING;
+    ELSE
+        DELETE FROM public.pipeline_queue
+        WHERE stage = 'sentiment' AND source_table = TG_TABLE_NAME AND article_id = NEW.id;
+    END IF;
+
+    -- industry (only tables that have the column)
+    IF v_row ? 'industry' THEN
+        IF v_has_summary AND COALESCE(v_row->>'industry', '') = '' THEN
+            INSERT INTO public.pipeline_queue (stage, source_table, article_id)
+            VALUES ('industry', TG_TABLE_NAME, NEW.id) ON CONFLICT DO NOTHING;
+        ELSE
+            DELETE FROM public.pipeline_queue
+            WHERE stage = 'industry' AND source_table = TG_TABLE_NAME AND article_id = NEW.id;
+        END IF;
+    END IF;
+
+    RETURN NULL;
+END;
+$$;
+
+CREATE OR REPLACE FUNCTION public.pipeline_queue_forget()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    DELETE FROM public.pipeline_queue WHERE source_table = TG_TABLE_NAME AND article_id = OLD.id;
+    RETURN NULL;
+END;
+$$;
+
+-- ---------------------------------------------------------------------
+-- Triggers + backfill from the current NULL / empty state
+-- ---------------------------------------------------------------------
+DO $$
+DECLARE
+    v_table TEXT;
+    v_has_industry BOOLEAN;
+    v_columns TEXT;
+BEGIN
+    FOREACH v_table IN ARRAY ARRAY['General_News', 'FPT_News', 'GAS_News', 'IMP_News', 'VCB_News'] LOOP
+        SELECT EXISTS (
+            SELECT 1 FROM information_schema.columns c
+            WHERE c.table_schema = 'public' AND c.table_name = v_table AND c.column_name = 'industry'
+        ) INTO v_has_industry;
+        v_columns := 'content, ai_summary, sentiment' || CASE WHEN v_has_industry THEN ', industry' ELSE '' END;
+
+        EXECUTE format('DROP TRIGGER IF EXISTS trg_pipeline_queue_sync ON public.%I', v_table);
+        EXECUTE format(
+            'CREATE TRIGGER trg_pipeline_queue_sync
+                 AFTER INSERT OR UPDATE OF %s ON public.%I
+                 FOR EACH ROW EXECUTE FUNCTION public.pipeline_queue_sync()',
+            v_columns, v_table
+        );
+        EXECUTE format('DROP TRIGGER IF EXISTS trg_pipeline_queue_forget ON public.%I', v_table);
+        EXECUTE format(
+            'CREATE TRIGGER trg_pipeline_queue_forget
+                 AFTER DELETE ON public.%I
+                 FOR EACH ROW EXECUTE FUNCTION public.pipeline_queue_forget()',
+            v_table
+        );
+
+        -- Backfill
+        EXECUTE format(
+            'INSERT INTO public.pipeline_queue (stage, source_table, article_id)
+             SELECT ''summarize'', %L, t.id FROM public.%I t
+             WHERE COALESCE(t.content, '''') <> '''' AND COALESCE(t.ai_summary, '''') = ''''
+             ON CONFLICT DO NOTHING',
+            v_table, v_table
+        );
+        EXECUTE format(
+            'INSERT INTO public.pipeline_queue (stage, source_table, article_id)
+             SELECT ''sentiment'', %L, t.id FROM public.%I t
+             WHERE COALESCE(t.ai_summary, '''') <> '''' AND COALESCE(t.sentiment, '''') = ''''
+             ON CONFLICT DO NOTHING',
+            v_table, v_table
+        );
+        IF v_has_industry THEN
+            EXECUTE format(
+                'INSERT INTO public.pipeline_queue (stage, source_table, article_id)
+                 SELECT ''industry'', %L, t.id FROM public.%I t
+                 WHERE COALESCE(t.ai_summary, '''') <> '''' AND COALESCE(t.industry, '''') = ''''
+                 ON CONFLICT DO NOTHING',
+                v_table, v_table
+            );
+        END IF;
+    END LOOP;
+END;
+$$;
+
+-- ---------------------------------------------------------------------
+-- Claiming (FOR UPDATE SKIP LOCKED: concurrent workers never get the same row)
+-- ---------------------------------------------------------------------
+CREATE OR REPLACE FUNCTION public.claim_pipeline_work(
+    p_stage TEXT,
+    p_limit INTEGER,
+    p_worker TEXT,
+    p_table TEXT DEFAULT NULL,
+    p_lease_seconds INTEGER DEFAULT 600,
+    p_max_attempts INTEGER DEFAULT 5
+)
+RETURNS TABLE (
+    source_table TEXT,
+    article_id BIGINT,
+    attempts INTEGER
+)
+LANGUAGE sql
+VOLATILE
+AS $$
+    WITH ready AS (
+        SELECT q.stage, q.source_table, q.article_id
+        FROM public.pipeline_queue q
+        WHERE q.stage = p_stage
+          AND (p_table IS NULL OR q.source_table = p_table)
+          AND q.attempts < p_max_attempts
+          AND (q.claimed_at IS NULL
+               OR q.claimed_at < now() - make_interval(secs => p_lease_seconds))
+        ORDER BY q.enqueued_at
+        LIMIT p_limit
+        FOR UPDATE SKIP LOCKED
+    )
+    UPDATE public.pipeline_queue q
+    SET claimed_at = now(),
+        claimed_by = p_worker,
+        attempts = q.attempts + 1
+    FROM ready
+    WHERE q.stage = ready.stage
+      AND q.source_table = ready.source_table
+      AND q.article_id = ready.article_id
+    RETURNING q.source_table, q.article_id, q.attempts;
+$$;
+
+-- Give claimed work back (e.g. the worker failed before writing a result)
+CREATE OR REPLACE FUNCTION public.release_pipeline_work(
+    p_stage TEXT,
+    p_table TEXT,
+    p_ids BIGINT[]
+)
+RETURNS INTEGER
+LANGUAGE sql
+VOLATILE
+AS $$
+    WITH released AS (
+        UPDATE public.pipeline_queue
+        SET claimed_at = NULL, claimed_by = NULL
+        WHERE stage = p_stage AND source_table = p_table AND article_id = ANY(p_ids)
+        RETURNING 1
+    )
+    SELECT COUNT(*)::int FROM released;
+$$;
+
+-- Drop work that no longer applies (e.g. the article was skipped as too short)
+CREATE OR REPLACE FUNCTION public.complete_pipeline_work(
+    p_stage TEXT,
+    p_table TEXT,
+    p_ids BIGINT[]
+)
+RETURNS INTEGER
+LANGUAGE sql
+VOLATILE
+AS $$
+    WITH done AS (
+        DELETE FROM public.pipeline_queue
+        WHERE stage = p_stage AND source_table = p_table AND article_id = ANY(p_ids)
+        RETURNING 1
+    )
+    SELECT COUNT(*)::int FROM done;
+$$;
+
+GRANT SELECT, INSERT, UPDATE, DELETE ON public.pipeline_queue TO service_role;
+GRANT EXECUTE ON FUNCTION public.claim_pipeline_work(TEXT, INTEGER, TEXT, TEXT, INTEGER, INTEGER) TO service_role;
+GRANT EXECUTE ON FUNCTION public.release_pipeline_work(TEXT, TEXT, BIGINT[]) TO service_role;
+GRANT EXECUTE ON FUNCTION public.complete_pipeline_work(TEXT, TEXT, BIGINT[]) TO service_role;
@@ -0,0 +1,65 @@
+-- =====================================================================
+-- Atomic counter deltas + ledger entries for incremental sentiment
+-- Applies signed Positive/Negative/Neutral deltas to a stock table and
+-- upserts the matching sentiment_ledger rows in one transaction, so a
+-- crash or failed request can never leave counters changed without the
+-- ledger recording it (which would apply the same deltas again).
+--
+-- Usage (PostgREST / supabase-py):
+--   client.rpc("apply_sentiment_deltas", {
+--       "p_stock_table": "FPT_Stock",
+--       "p_deltas": [{"date": "2025-08-12", "Positive": 1, "Negative": -1, "Neutral": 0}],
+--       "p_ledger": [{"link": "...", "trading_day": "2025-08-12", "label": "Positive"}]
+--   }).execute()
+-- Returns the number of stock rows updated.
+-- =====================================================================
+
+CREATE OR REPLACE FUNCTION public.apply_sentiment_deltas(
+    p_stock_table TEXT,
+    p_deltas JSONB,
+    p_ledger JSONB
+)
+RETURNS INTEGER
+LANGUAGE plpgsql
+VOLATILE
+AS $$
+DECLARE
+    v_delta JSONB;
+    v_rows INTEGER;
+    v_updated INTEGER := 0;
+BEGIN
+    -- Only stock tables may be updated (table name is interpolated below)
+    IF p_stock_table !~ '^[A-Za-z]+_Stock$' THEN
+        RAISE EXCEPTION 'apply_sentiment_deltas: invalid stock table %', p_stock_table;
+    END IF;
+
+    FOR v_delta IN SELECT * FROM jsonb_array_elements(COALESCE(p_deltas, '[]'::jsonb)) LOOP
+        EXECUTE format(
+            'UPDATE public.%I
+             SET "Positive" = GREATEST(0, COALESCE("Positive", 0) + %s),
+                 "Negative" = GREATEST(0, COALESCE("Negative", 0) + %s),
+                 "Neutral" = GREATEST(0, COALESCE("Neutral", 0) + %s)
+             WHERE date = %L',
+            p_stock_table,
+            COALESCE((v_delta->>'Positive')::int, 0),
+            COALESCE((v_delta->>'Negative')::int, 0),
+            COALESCE((v_delta->>'Neutral')::int, 0),
+            v_delta->>'date'
+        );
+        GET DIAGNOSTICS v_rows = ROW_COUNT;
+        v_updated := v_updated + v_rows;
+    END LOOP;
+
+    INSERT INTO public.sentiment_ledger (stock_table, link, trading_day, label)
+    SELECT p_stock_table, e->>'link', e->>'trading_day', e->>'label'
+    FROM jsonb_array_elements(COALESCE(p_ledger, '[]'::jsonb)) e
+    ON CONFLICT (stock_table, link) DO UPDATE
+        SET trading_day = EXCLUDED.trading_day,
+            label = EXCLUDED.label,
+            applied_at = now();
+
+    RETURN v_updated;
+END;
+$$;
+
+GRANT EXECUTE ON FUNCTION public.apply_sentiment_deltas(TEXT, JSONB, JSONB) TO service_role;
@@ -0,0 +1,43 @@
+-- =====================================================================
+-- Release pipeline work without spending an attempt
+-- claim_pipeline_work counts every claim as an attempt, so claims that are
+-- given back unused (sampled, duplicated or past a seeding limit) used to
+-- bring an article closer to p_max_attempts without ever being processed.
+-- With p_refund_attempt the release also takes that attempt back; failed
+-- batches keep releasing without it, so an article that keeps failing
+-- still stops being handed out.
+--
+-- Usage (PostgREST / supabase-py):
+--   client.rpc("release_pipeline_work", {
+--       "p_stage": "summarize", "p_table": "FPT_News", "p_ids": [1, 2],
+--       "p_refund_attempt": true
+--   }).execute()
+-- Requires migrations/004_pipeline_queue.sql.
+-- =====================================================================
+
+-- Replaces the three-argument version (a second overload would make calls ambiguous)
+DROP FUNCTION IF EXISTS public.release_pipeline_work(TEXT, TEXT, BIGINT[]);
+
+CREATE OR REPLACE FUNCTION public.release_pipeline_work(
+    p_stage TEXT,
+    p_table TEXT,
+    p_ids BIGINT[],
+    p_refund_attempt BOOLEAN DEFAULT FALSE
+)
+RETURNS INTEGER
+LANGUAGE sql
+VOLATILE
+AS $$
+    WITH released AS (
+        UPDATE public.pipeline_queue
+        SET claimed_at = NULL,
+            claimed_by = NULL,
+            attempts = CASE WHEN p_refund_attempt THEN GREATEST(0, attempts - 1) ELSE attempts END
+        WHERE stage = p_stage AND source_table = p_table AND article_id = ANY(p_ids)
+          AND claimed_at IS NOT NULL
+        RETURNING 1
+    )
+    SELECT COUNT(*)::int FROM released;
+$$;
+
+GRANT EXECUTE ON FUNCTION public.release_pipeline_work(TEXT, TEXT, BIGINT[], BOOLEAN) TO service_role;
@@ -0,0 +1,139 @@
+"""
+Sentiment Counts
+Date × Positive/Negative/Neutral aggregation of news sentiment
+
+The aggregation runs inside the database (see
+migrations/001_sentiment_daily_counts.sql) so only one row per date crosses
+the network. SQLiteSentimentCounts runs the same GROUP BY against a local
+SQLite database and is used as a stand-in for Postgres in tests;
+group_sentiment_rows is the client-side fallback when the RPC is not
+installed (is_missing_rpc_error).
+"""
+
+import re
+import sqlite3
+from typing import Dict, Any, List, Iterable, Optional
+
+SENTIMENT_LABELS = ("Positive", "Negative", "Neutral")
+SENTIMENT_COUNTS_RPC = "sentiment_daily_counts"
+
+_NEWS_TABLE_PATTERN = re.compile(r"^[A-Za-z]+_News$")
+
+# PostgREST "function not found in the schema cache" / Postgres undefined_function
+MISSING_RPC_CODES = ("PGRST202", "42883")
+
+
+def is_missing_rpc_error(error: Exception) -> bool:
+    """
+    Whether an RPC call failed because the function is not installed
+
+    Timeouts, 5xx responses and other transient errors return False, so a
+    single failed call never disables an RPC for the rest of the process.
+    """
+    if str(getattr(error, "code", "")) in MISSING_RPC_CODES:
+        return True
+    # httpx.HTTPStatusError (AsyncSupabaseManager): POST /rpc/<name> answers 404
+    response = getattr(error, "response", None)
+    return getattr(response, "status_code", None) == 404
+
+
+def validate_news_table(table_name: str) -> str:
+    """Reject anything that is not a *_News table name (it is interpolated into SQL)"""
+    if not _NEWS_TABLE_PATTERN.match(table_name or ""):
+        raise ValueError(f"Invalid news table: {table_name}")
+    return table_name
+
+
+def group_sentiment_rows(rows: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Count sentiment labels per date on the client
+
+    Args:
+        rows: Rows with 'date' and 'sentiment' keys
+
+    Returns:
+        List of {'date', 'Positive', 'Negative', 'Neutral'} sorted by date
+    """
+    counts: Dict[str, Dict[str, Any]] = {}
+    for row in rows:
+        sentiment = row.get("sentiment")
+        if sentiment not in SENTIMENT_LABELS:
+            continue
+        date = str(row.get("date"))
+        if date not in counts:
+            counts[date] = {"date": date, "Positive": 0, "Negative": 0, "Neutral": 0}
+        counts[date][sentiment] += 1
+    return [counts[date] for date in sorted(counts)]
+
+
+def normalize_count_rows(rows: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Coerce RPC / SQL rows to {'date': str, label: int} dictionaries"""
+    return [
+        {
+            "date": str(row["date"]),
+            "Positive": int(row.get("Positive") or 0),
+            "Negative": int(row.get("Negative") or 0),
+            "Neutral": int(row.get("Neutral") or 0),
+        }
+        for row in rows
+    ]
+
+
+def build_rpc_params(table_name: str, start_date: str = None, end_date: str = None,
+                     dates: Optional[Iterable[str]] = None) -> Dict[str, Any]:
+    """Build parameters for the sentiment_daily_counts RPC"""
+    return {
+        "p_table": validate_news_table(table_name),
+        "p_start": start_date,
+        "p_end": end_date,
+        "p_dates": sorted(dates) if dates is not None else None,
+    }
+
+
+class SQLiteSentimentCounts:
+    """
+    Local SQLite stand-in for the sentiment_daily_counts RPC
+
+    Usage:
+        backend = SQLiteSentimentCounts(sqlite3.connect(":memory:"))
+        rows = backend.daily_counts("FPT_News", start_date="2020-01-01")
+    """
+
+    def __init__(self, connection: sqlite3.Connection):
+        self.connection = connection
+
+    def daily_counts(self, table_name: str, start_date: str = None, end_date: str = None,
+                     dates: Optional[Iterable[str]] = None) -> List[Dict[str, Any]]:
+        """
+        Same contract as SupabaseManager.get_sentiment_daily_counts
+
+        Returns:
+            List of {'date', 'Positive', 'Negative', 'Neutral'} sorted by date
+        """
+        table = validate_news_table(table_name)
+        sql = (
+            'SELECT CAST(date AS TEXT) AS date, '
+            'SUM(CASE WHEN sentiment = \'Positive\' THEN 1 ELSE 0 END) AS "Positive", '
+            'SUM(CASE WHEN sentiment = \'Negative\' THEN 1 ELSE 0 END) AS "Negative", '
+            'SUM(CASE WHEN sentiment = \'Neutral\' THEN 1 ELSE 0 END) AS "Neutral" '
+            f'FROM "{table}" '
+            "WHERE sentiment IN ('Positive', 'Negative', 'Neutral')"
+        )
+        params: List[Any] = []
+        if start_date:
+            sql += " AND CAST(date AS TEXT) >= ?"
+            params.append(start_date)
+        if end_date:
+            sql += " AND CAST(date AS TEXT) <= ?"
+            params.append(end_date)
+        if dates is not None:
+            date_list = sorted(dates)
+            if not date_list:
+                return []
+            sql += f" AND CAST(date AS TEXT) IN ({', '.join('?' for _ in date_list)})"
+            params.extend(date_list)
+        sql += " GROUP BY date ORDER BY date"
+
+        cursor = self.connection.execute(sql, params)
+        columns = [column[0] for column in cursor.description]
+        return normalize_count_rows(dict(zip(columns, row)) for row in cursor.fetchall())
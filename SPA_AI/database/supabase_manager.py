@@ -6,17 +6,37 @@ Centralized database operations for SPA VIP system
 import sys
 from supabase import create_client, Client
 from datetime import datetime
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, List, Optional, Callable
 import logging
 
 from .config import DatabaseConfig
+from telemetry import timer, count
 from .schemas import NewsSchema, StockSchema, validate_article_data, validate_stock_data
+from .sentiment_counts import (
+    SENTIMENT_COUNTS_RPC, build_rpc_params, is_missing_rpc_error, group_sentiment_rows, normalize_count_rows
+)
+from .table_stats import (
+    NEWS_TABLE_STATS_RPC, TableStatsCache, build_table_stats, empty_table_stats, normalize_stats_rows
+)
+from .work_queue import WorkQueue
 
 logger = logging.getLogger(__name__)
 
 class SupabaseManager:
     """Centralized Supabase database manager"""
     
+    # Process-wide callbacks (table_name, inserted_row) run after each successful
+    # insert_article, on any instance (crawlers create their own managers)
+    _insert_listeners: List[Callable[[str, Dict[str, Any]], None]] = []
+    
+    # Shared by every instance: cached get_table_stats results and whether
+    # the news_table_stats RPC is installed
+    _stats_cache: Optional[TableStatsCache] = None
+    _table_stats_rpc_available = True
+    
+    # Set to False once the pipeline_queue RPCs are found missing
+    _work_queue_rpc_available = True
+    
     def __init__(self):
         """Initialize Supabase client"""
         self.config = DatabaseConfig()
@@ -27,6 +47,15 @@ class SupabaseManager:
             self.config.SUPABASE_KEY
         )
         
+        # Set to False once the sentiment_daily_counts RPC is found missing
+        self._sentiment_rpc_available = self.config.SENTIMENT_AGGREGATION_MODE == "server"
+        
+        self.work_queue = WorkQueue(
+            self.client,
+            lease_seconds=self.config.WORK_QUEUE_LEASE_SECONDS,
+            max_attempts=self.config.WORK_QUEUE_MAX_ATTEMPTS
+        )
+        
         logger.info("Supabase client initialized successfully")
     
     def get_client(self) -> Client:
@@ -68,6 +97,7 @@ class SupabaseManager:
             link = article_data.get("link", "")
             if link and self.article_exists(table_name, link):
                 logger.info(f"Article already exists: {article_data.get('title', '')[:50]}...")
+                count("articles_duplicate", table=table_name)
                 return False
             
             # Create schema object
@@ -78,13 +108,16 @@ class SupabaseManager:
             
             # Insert to database
             is_general_news = table_name.lower() == "general_news"
-            result = self.client.table(table_name).upsert(
-                article.to_dict(include_industry=is_general_news),
-                on_conflict="link"
-            ).execute()
+            with timer("db_write", op="insert_article", table=table_name):
+                result = self.client.table(table_name).upsert(
+                    article.to_dict(include_industry=is_general_news),
+                    on_conflict="link"
+                ).execute()
             
             if result.data:
                 logger.info(f"Inserted article: {article.title[:50]}...")
+                count("articles_inserted", table=table_name)
+                self._notify_insert(table_name, result.data[0])
                 return True
             else:
                 logger.error(f"Failed to insert article: {article.title[:50]}...")
@@ -92,8 +125,28 @@ class SupabaseManager:
                 
         except Exception as e:
             logger.error(f"Database error inserting article: {e}")
+            count("db_errors", op="insert_article")
             return False
     
+    @classmethod
+    def add_insert_listener(cls, listener: Callable[[str, Dict[str, Any]], None]):
+        """Call listener(table_name, row) after every article inserted in this process"""
+        if listener not in cls._insert_listeners:
+            cls._insert_listeners.append(listener)
+    
+    @classmethod
+    def remove_insert_listener(cls, listener: Callable[[str, Dict[str, Any]], None]):
+        if listener in cls._insert_listeners:
+            cls._insert_listeners.remove(listener)
+    
+    def _notify_insert(self, table_name: str, row: Dict[str, Any]):
+        for listener in list(self._insert_listeners):
+            try:
+                listener(table_name, row)
+            except Exception as e:
+                # A failing consumer must never fail the crawler's insert
+                logger.error(f"Insert listener failed for {table_name}: {e}")
+    
     def article_exists(self, table_name: str, link: str) -> bool:
         """Check if article already exists"""
         try:
@@ -106,17 +159,30 @@ class SupabaseManager:
             logger.error(f"Error checking article existence: {e}")
             return False
     
-    def fetch_unsummarized_articles(self, table_name: str = None, limit: int = 100) -> List[Dict]:
+    def fetch_unsummarized_articles(self, table_name: str = None, limit: int = 100,
+                                    claim: bool = True) -> List[Dict]:
         """
         Fetch articles without AI summary
         
+        Claimed from the work queue when USE_WORK_QUEUE is set, otherwise
+        found by scanning for an empty ai_summary.
+        
         Args:
             table_name: Specific table or None for all tables
             limit: Maximum number of articles
+            claim: False reads a sample by scanning, without claiming work
             
         Returns:
             List of articles
         """
+        if claim:
+            claimed = self.claim_pending_articles(
+                "summarize", "id, title, content, link, date", table_name, limit,
+                keep=lambda article: len((article.get("content") or "").strip()) > 50
+            )
+            if claimed is not None:
+                return claimed
+        
         try:
             all_articles = []
             tables_to_query = [table_name] if table_name else self.config.get_all_news_tables()
@@ -125,13 +191,14 @@ class SupabaseManager:
                 logger.info(f"Querying table: {table}")
                 
                 query = self.client.table(table)\
-                    .select("id, title, content")\
+                    .select("id, title, content, link, date")\
                     .or_("ai_summary.is.null,ai_summary.eq.")\
                     .neq("content", "")\
                     .order("id", desc=True)\
                     .limit(limit)
                 
-                result = query.execute()
+                with timer("db_fetch", op="unsummarized", table=table):
+                    result = query.execute()
                 
                 for article in result.data:
                     if article.get("content") and len(article.get("content", "").strip()) > 50:
@@ -145,15 +212,17 @@ class SupabaseManager:
             
         except Exception as e:
             logger.error(f"Error fetching unsummarized articles: {e}")
+            count("db_errors", op="unsummarized")
             return []
     
     def update_article_summary(self, article_id: str, summary: str, table_name: str) -> bool:
         """Update article with AI summary"""
         try:
-            response = self.client.table(table_name)\
-                .update({"ai_summary": summary})\
-                .eq("id", article_id)\
-                .execute()
+            with timer("db_write", op="summary", table=table_name):
+                response = self.client.table(table_name)\
+                    .update({"ai_summary": summary})\
+                    .eq("id", article_id)\
+                    .execute()
             
             if response.data:
                 logger.info(f"Updated summary for article {article_id} in {table_name}")
@@ -164,15 +233,17 @@ class SupabaseManager:
                 
         except Exception as e:
             logger.error(f"Error updating summary for article {article_id}: {e}")
+            count("db_errors", op="summary")
             return False
     
     def update_article_industry(self, article_id: str, industry: str, table_name: str) -> bool:
         """Update article with industry classification"""
         try:
-            response = self.client.table(table_name)\
-                .update({"industry": industry})\
-                .eq("id", article_id)\
-                .execute()
+            with timer("db_write", op="industry", table=table_name):
+                response = self.client.table(table_name)\
+                    .update({"industry": industry})\
+                    .eq("id", article_id)\
+                    .execute()
             
             if response.data:
                 logger.info(f"Updated industry for article {article_id} in {table_name}: {industry}")
@@ -183,12 +254,16 @@ class SupabaseManager:
                 
         except Exception as e:
             logger.error(f"Error updating industry for article {article_id}: {e}")
+            count("db_errors", op="industry")
             return False
     
     def fetch_unclassified_articles(self, table_name: str = None, limit: int = 100) -> List[Dict]:
         """
         Fetch articles with summaries but without industry classification (General_News only)
         
+        Claimed from the work queue when USE_WORK_QUEUE is set, otherwise
+        found by scanning for an empty industry.
+        
         Args:
             table_name: Should be General_News or None (defaults to General_News)
             limit: Maximum number of articles
@@ -205,6 +280,13 @@ class SupabaseManager:
                 logger.warning("Industry classification only works on General_News table")
                 return []
             
+            claimed = self.claim_pending_articles(
+                "industry", "id, title, content, ai_summary", tables_to_query[0], limit,
+                keep=lambda article: len((article.get("ai_summary") or "").strip()) > 10
+            )
+            if claimed is not None:
+                return claimed
+            
             for table in tables_to_query:
                 logger.info(f"Querying table for industry classification: {table}")
                 
@@ -216,7 +298,8 @@ class SupabaseManager:
                     .order("id", desc=True)\
                     .limit(limit)
                 
-                result = query.execute()
+                with timer("db_fetch", op="unclassified", table=table):
+                    result = query.execute()
                 
                 for article in result.data:
                     if article.get("ai_summary") and len(article.get("ai_summary", "").strip()) > 10:
@@ -232,6 +315,97 @@ class SupabaseManager:
             logger.error(f"Error fetching unclassified articles: {e}")
             return []
     
+    # ============ WORK QUEUE ============
+    
+    def uses_work_queue(self) -> bool:
+        """Whether pending work is claimed from pipeline_queue instead of scanned for"""
+        return self.config.USE_WORK_QUEUE and SupabaseManager._work_queue_rpc_available
+    
+    def claim_pending_articles(self, stage: str, columns: str, table_name: str = None, limit: int = 100,
+                               keep: Callable[[Dict[str, Any]], bool] = None) -> Optional[List[Dict]]:
+        """
+        Claim articles waiting for a stage from the work queue
+        
+        Claimed articles rejected by keep (e.g. content too short to
+        summarize) are completed, so they are not handed out again until the
+        article changes.
+        
+        Args:
+            stage: 'summarize', 'sentiment' or 'industry'
+            columns: Columns to select (must include id)
+            table_name: Specific table or None for all tables
+            limit: Maximum number of articles
+            keep: Optional filter on the claimed rows
+            
+        Returns:
+            List of articles (with table_name), or None if the work queue is
+            disabled or not installed and the caller should scan instead
+            (an empty list when a claim fails for another reason)
+        """
+        if not self.uses_work_queue():
+            return None
+        try:
+            with timer("db_fetch", op=f"claim_{stage}", table=table_name):
+                articles = self.work_queue.claim_articles(stage, columns, limit, table_name)
+        except Exception as e:
+            if is_missing_rpc_error(e):
+                logger.warning(f"Work queue not installed, scanning tables instead: {e}")
+                SupabaseManager._work_queue_rpc_available = False
+                return None
+            # Stay on the queue: the next claim retries, without falling back to table scans
+            logger.error(f"Error claiming {stage} work: {e}")
+            count("db_errors", op="queue_claim")
+            return []
+        
+        if keep is not None:
+            skipped = [article for article in articles if not keep(article)]
+            articles = [article for article in articles if keep(article)]
+            skipped_by_table: Dict[str, List[int]] = {}
+            for article in skipped:
+                skipped_by_table.setdefault(article["table_name"], []).append(article["id"])
+            for table, ids in skipped_by_table.items():
+                self.complete_pending_work(stage, table, ids)
+        
+        count("queue_claimed", len(articles), stage=stage)
+        logger.info(f"Claimed {len(articles)} articles for {stage} from the work queue")
+        return articles
+    
+    def complete_pending_work(self, stage: str, table_name: str, ids: List[int]) -> int:
+        """Remove work items that will not be processed"""
+        try:
+            return self.work_queue.complete(stage, table_name, ids)
+        except Exception as e:
+            logger.error(f"Error completing {stage} work in {table_name}: {e}")
+            count("db_errors", op="queue_complete")
+            return 0
+    
+    def release_pending_work(self, stage: str, table_name: str, ids: List[int],
+                             refund_attempt: bool = False) -> int:
+        """Hand claimed work back to the queue (e.g. after a failed batch)"""
+        try:
+            return self.work_queue.release(stage, table_name, ids, refund_attempt)
+        except Exception as e:
+            logger.error(f"Error releasing {stage} work in {table_name}: {e}")
+            count("db_errors", op="queue_release")
+            return 0
+    
+    def release_claimed_articles(self, stage: str, articles: List[Dict], refund_attempt: bool = False) -> int:
+        """
+        Release the claims of articles whose processing failed (no-op without the work queue)
+        
+        refund_attempt also takes back the attempt the claim counted, for
+        claims that were never processed (needs migrations/006).
+        """
+        if not articles or not self.uses_work_queue():
+            return 0
+        ids_by_table: Dict[str, List[int]] = {}
+        for article in articles:
+            ids_by_table.setdefault(article["table_name"], []).append(article["id"])
+        released = sum(self.release_pending_work(stage, table, ids, refund_attempt)
+                       for table, ids in ids_by_table.items())
+        count("queue_released", released, stage=stage)
+        return released
+    
     # ============ STOCK OPERATIONS ============
     
     def insert_stock_data(self, table_name: str, stock_data: Dict[str, Any]) -> bool:
@@ -265,23 +439,150 @@ class SupabaseManager:
             logger.error(f"Database error inserting stock data: {e}")
             return False
     
+    # ============ SENTIMENT AGGREGATION ============
+    
+    def get_sentiment_daily_counts(self, table_name: str, start_date: str = None,
+                                   end_date: str = None, dates: List[str] = None) -> List[Dict[str, Any]]:
+        """
+        Count Positive/Negative/Neutral news per date
+        
+        Runs the group-by in Postgres via the sentiment_daily_counts RPC so only
+        aggregated rows are transferred. Falls back to downloading
+        (date, sentiment) rows and grouping locally if the RPC is not installed.
+        
+        Args:
+            table_name: News table name (e.g., 'FPT_News')
+            start_date: Inclusive lower bound 'YYYY-MM-DD' (optional)
+            end_date: Inclusive upper bound 'YYYY-MM-DD' (optional)
+            dates: Restrict to these dates (optional)
+            
+        Returns:
+            List of {'date', 'Positive', 'Negative', 'Neutral'} sorted by date
+        """
+        if dates is not None:
+            dates = sorted(set(dates))
+            if not dates:
+                return []
+        
+        if self._sentiment_rpc_available:
+            try:
+                params = build_rpc_params(table_name, start_date, end_date, dates)
+                result = self.client.rpc(SENTIMENT_COUNTS_RPC, params).execute()
+                return normalize_count_rows(result.data or [])
+            except ValueError:
+                raise
+            except Exception as e:
+                if not is_missing_rpc_error(e):
+                    raise
+                logger.warning(f"{SENTIMENT_COUNTS_RPC} RPC not installed, aggregating on client: {e}")
+                self._sentiment_rpc_available = False
+        
+        return group_sentiment_rows(self._fetch_sentiment_rows(table_name, start_date, end_date, dates))
+    
+    def _fetch_sentiment_rows(self, table_name: str, start_date: str = None,
+                              end_date: str = None, dates: List[str] = None,
+                              page_size: int = 1000) -> List[Dict]:
+        """Download (date, sentiment) rows for client-side aggregation (paginated)"""
+        date_chunks = [dates[i:i + 100] for i in range(0, len(dates), 100)] if dates else [None]
+        rows = []
+        
+        for chunk in date_chunks:
+            offset = 0
+            while True:
+                query = self.client.table(table_name)\
+                    .select("date, sentiment")\
+                    .in_("sentiment", ["Positive", "Negative", "Neutral"])
+                if start_date:
+                    query = query.gte("date", start_date)
+                if end_date:
+                    query = query.lte("date", end_date)
+                if chunk:
+                    query = query.in_("date", chunk)
+                
+                result = query.order("id").range(offset, offset + page_size - 1).execute()
+                batch = result.data or []
+                rows.extend(batch)
+                if len(batch) < page_size:
+                    break
+                offset += page_size
+        
+        return rows
+    
     # ============ STATISTICS ============
     
-    def get_table_stats(self) -> Dict[str, Dict]:
-        """Get comprehensive statistics for all news tables"""
+    def get_table_stats(self, max_age: float = None) -> Dict[str, Dict]:
+        """
+        Get comprehensive statistics for all news tables
+        
+        All tables are counted by one news_table_stats RPC call (falling back
+        to per-table count queries if it is not installed) and the result is
+        reused for TABLE_STATS_TTL seconds, also by other processes.
+        
+        Args:
+            max_age: Accept cached stats up to this many seconds old
+                     (default TABLE_STATS_TTL, 0 forces a fresh count)
+            
+        Returns:
+            Dict mapping table name -> stats (total, summarized, unsummarized,
+            completion_rate, classified, unclassified, classification_rate and,
+            from the RPC, sentiment counts)
+        """
+        tables = self.config.get_all_news_tables()
+        cache = self._get_stats_cache()
+        cached = cache.get(tables, max_age)
+        if cached is not None:
+            return cached
+        
+        stats = None
+        if self._table_stats_rpc_available:
+            try:
+                with timer("db_fetch", op="table_stats_rpc"):
+                    result = self.client.rpc(NEWS_TABLE_STATS_RPC, {"p_tables": tables}).execute()
+                stats = normalize_stats_rows(result.data or [])
+                for table in tables:
+                    stats.setdefault(table, empty_table_stats())
+            except Exception as e:
+                if is_missing_rpc_error(e):
+                    logger.warning(f"{NEWS_TABLE_STATS_RPC} RPC not installed, counting per table: {e}")
+                    SupabaseManager._table_stats_rpc_available = False
+                else:
+                    # Transient failure: count per table this time, keep using the RPC
+                    logger.warning(f"{NEWS_TABLE_STATS_RPC} RPC failed, counting per table: {e}")
+                    count("db_errors", op="table_stats_rpc")
+        
+        if stats is None:
+            with timer("db_fetch", op="table_stats_per_table"):
+                stats = self._count_table_stats_per_table(tables)
+        
+        cache.set(tables, stats)
+        return stats
+    
+    @classmethod
+    def _get_stats_cache(cls) -> TableStatsCache:
+        if cls._stats_cache is None:
+            cls._stats_cache = TableStatsCache(DatabaseConfig.TABLE_STATS_TTL, DatabaseConfig.TABLE_STATS_CACHE_FILE)
+        return cls._stats_cache
+    
+    @classmethod
+    def invalidate_table_stats(cls):
+        """Drop cached table stats (e.g. after a bulk import)"""
+        cls._get_stats_cache().invalidate()
+    
+    def _count_table_stats_per_table(self, tables: List[str]) -> Dict[str, Dict]:
+        """Fallback: two or three head-only count="exact" queries per table"""
         stats = {}
         
-        for table in self.config.get_all_news_tables():
+        for table in tables:
             try:
                 # Count total articles with valid content
                 total_result = self.client.table(table)\
-                    .select("*", count="exact")\
+                    .select("id", count="exact", head=True)\
                     .neq("content", "")\
                     .execute()
                 
                 # Count articles with summaries
                 summarized_result = self.client.table(table)\
-                    .select("*", count="exact")\
+                    .select("id", count="exact", head=True)\
                     .filter("ai_summary", "not.is", "null")\
                     .neq("ai_summary", "")\
                     .neq("content", "")\
@@ -290,7 +591,7 @@ class SupabaseManager:
                 # Count articles with industry classification (only for General_News)
                 if table == 'General_News':
                     classified_result = self.client.table(table)\
-                        .select("*", count="exact")\
+                        .select("id", count="exact", head=True)\
                         .filter("industry", "not.is", "null")\
                         .neq("industry", "")\
                         .filter("ai_summary", "not.is", "null")\
@@ -303,27 +604,13 @@ class SupabaseManager:
                 total_count = total_result.count or 0
                 summarized_count = summarized_result.count or 0
                 
-                stats[table] = {
-                    "total": total_count,
-                    "summarized": summarized_count,
-                    "unsummarized": max(0, total_count - summarized_count),
-                    "completion_rate": (summarized_count / total_count * 100) if total_count > 0 else 100,
-                    "classified": classified_count,
-                    "unclassified": max(0, summarized_count - classified_count) if table == 'General_News' else 0,
-                    "classification_rate": (classified_count / summarized_count * 100) if summarized_count > 0 and table == 'General_News' else 0
-                }
+                stats[table] = build_table_stats(
+                    total_count, summarized_count, classified_count, has_industry=table == 'General_News'
+                )
                 
             except Exception as e:
                 logger.error(f"Error getting stats for {table}: {e}")
-                stats[table] = {
-                    "total": 0, 
-                    "summarized": 0, 
-                    "unsummarized": 0, 
-                    "completion_rate": 0,
-                    "classified": 0,
-                    "unclassified": 0,
-                    "classification_rate": 0
-                }
+                stats[table] = empty_table_stats()
         
         return stats
     
@@ -337,7 +624,23 @@ class SupabaseManager:
         except Exception as e:
             logger.error(f"Error counting table {table_name}: {e}")
             return 0
-    
+
+    def get_latest_article_ids(self) -> Dict[str, int]:
+        """Highest article id per news table (cheap probe for newly crawled rows)"""
+        latest = {}
+        for table in self.config.get_all_news_tables():
+            try:
+                result = self.client.table(table)\
+                    .select("id")\
+                    .order("id", desc=True)\
+                    .limit(1)\
+                    .execute()
+                latest[table] = result.data[0]['id'] if result.data else 0
+            except Exception as e:
+                logger.error(f"Error reading latest id of {table}: {e}")
+                latest[table] = 0
+        return latest
+
     # ============ UTILITY METHODS ============
     
     def test_connection(self) -> bool:
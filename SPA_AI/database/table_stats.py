@@ -0,0 +1,188 @@
+"""
+Table Stats
+Per-table total / summarized / classified / sentiment counts of the news tables
+
+The counts for every table are computed by one aggregate query (see
+migrations/003_news_table_stats.sql) instead of two or three count="exact"
+requests per table. SQLiteTableStats runs the same query against a local
+SQLite database as a stand-in for Postgres in tests. TableStatsCache keeps
+the result for a short TTL in memory and in a small JSON file, so status
+checks from several processes or terminals share one database round trip.
+"""
+
+import os
+import json
+import time
+import sqlite3
+import threading
+from typing import Dict, Any, Iterable, List, Optional
+
+from .sentiment_counts import SENTIMENT_LABELS, validate_news_table
+
+NEWS_TABLE_STATS_RPC = "news_table_stats"
+
+
+def build_table_stats(total: int, summarized: int, classified: int = 0, has_industry: bool = False,
+                      sentiment: Dict[str, int] = None) -> Dict[str, Any]:
+    """
+    Build the stats dictionary returned by SupabaseManager.get_table_stats
+
+    Args:
+        total: Articles with content
+        summarized: Articles with content and an AI summary
+        classified: Summarized articles with an industry (tables with an industry column)
+        has_industry: Whether the table has industry classification
+        sentiment: Optional {'Positive', 'Negative', 'Neutral'} counts (keys omitted if None)
+    """
+    stats = {
+        "total": total,
+        "summarized": summarized,
+        "unsummarized": max(0, total - summarized),
+        "completion_rate": (summarized / total * 100) if total > 0 else 100,
+        "classified": classified,
+        "unclassified": max(0, summarized - classified) if has_industry else 0,
+        "classification_rate": (classified / summarized * 100) if summarized > 0 and has_industry else 0
+    }
+    if sentiment is not None:
+        counts = {label: int(sentiment.get(label) or 0) for label in SENTIMENT_LABELS}
+        stats["sentiment"] = counts
+        stats["sentiment_labelled"] = sum(counts.values())
+        stats["sentiment_pending"] = max(0, summarized - stats["sentiment_labelled"])
+    return stats
+
+
+def empty_table_stats() -> Dict[str, Any]:
+    stats = build_table_stats(0, 0)
+    stats["completion_rate"] = 0
+    return stats
+
+
+def normalize_stats_rows(rows: Iterable[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    """Convert RPC / SQL rows into {table_name: stats}"""
+    stats = {}
+    for row in rows:
+        stats[row["table_name"]] = build_table_stats(
+            int(row.get("total") or 0),
+            int(row.get("summarized") or 0),
+            int(row.get("classified") or 0),
+            bool(row.get("has_industry")),
+            {label: row.get(label) for label in SENTIMENT_LABELS}
+        )
+    return stats
+
+
+class SQLiteTableStats:
+    """
+    Local SQLite stand-in for the news_table_stats RPC
+
+    Usage:
+        backend = SQLiteTableStats(sqlite3.connect(":memory:"))
+        stats = backend.table_stats(["General_News", "FPT_News"])
+    """
+
+    def __init__(self, connection: sqlite3.Connection):
+        self.connection = connection
+
+    def _has_column(self, table: str, column: str) -> bool:
+        return any(row[1] == column for row in self.connection.execute(f'PRAGMA table_info("{table}")'))
+
+    def table_stats(self, tables: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Same contract as SupabaseManager.get_table_stats, in one UNION ALL query"""
+        parts = []
+        for table in tables:
+            validate_news_table(table)
+            has_industry = self._has_column(table, "industry")
+            classified = (
+                "SUM(CASE WHEN industry <> '' AND ai_summary <> '' THEN 1 ELSE 0 END)"
+                if has_industry else "0"
+            )
+            parts.append(
+                f"SELECT '{table}' AS table_name, "
+                "SUM(CASE WHEN content <> '' THEN 1 ELSE 0 END) AS total, "
+                "SUM(CASE WHEN content <> '' AND ai_summary <> '' THEN 1 ELSE 0 END) AS summarized, "
+                f"{classified} AS classified, "
+                f"{1 if has_industry else 0} AS has_industry, "
+                "SUM(CASE WHEN sentiment = 'Positive' THEN 1 ELSE 0 END) AS \"Positive\", "
+                "SUM(CASE WHEN sentiment = 'Negative' THEN 1 ELSE 0 END) AS \"Negative\", "
+                "SUM(CASE WHEN sentiment = 'Neutral' THEN 1 ELSE 0 END) AS \"Neutral\" "
+                f'FROM "{table}"'
+            )
+        if not parts:
+            return {}
+
+        cursor = self.connection.execute(" UNION ALL ".join(parts))
+        columns = [column[0] for column in cursor.description]
+        return normalize_stats_rows(dict(zip(columns, row)) for row in cursor.fetchall())
+
+
+class TableStatsCache:
+    """
+    Short-lived cache of get_table_stats results
+
+    Entries live in memory for the process and are mirrored to a JSON file
+    (if a path is given) so a new process can reuse recent stats.
+    """
+
+    def __init__(self, ttl_seconds: float = 30, path: Optional[str] = None):
+        self.ttl_seconds = ttl_seconds
+        self.path = path
+        self._lock = threading.Lock()
+        self._entries: Dict[str, Dict[str, Any]] = {}
+
+    @staticmethod
+    def _key(tables: Iterable[str]) -> str:
+        return ",".join(sorted(tables))
+
+    def get(self, tables: Iterable[str], max_age: float = None) -> Optional[Dict[str, Dict[str, Any]]]:
+        """Cached stats no older than max_age (defaults to the TTL), else None"""
+        max_age = self.ttl_seconds if max_age is None else max_age
+        if max_age <= 0:
+            return None
+        key = self._key(tables)
+        with self._lock:
+            entries = [self._entries.get(key), self._read_file().get(key)]
+        entries = [entry for entry in entries if entry]
+        # Another process may have refreshed the shared file more recently
+        entry = max(entries, key=lambda e: e["saved_at"]) if entries else None
+        if entry and time.time() - entry["saved_at"] <= max_age:
+            return entry["stats"]
+        return None
+
+    def set(self, tables: Iterable[str], stats: Dict[str, Dict[str, Any]]):
+        key = self._key(tables)
+        entry = {"saved_at": time.time(), "stats": stats}
+        with self._lock:
+            self._entries[key] = entry
+            self._write_file(key, entry)
+
+    def invalidate(self):
+        with self._lock:
+            self._entries.clear()
+            if self.path:
+                try:
+                    os.remove(self.path)
+                except OSError:
+                    pass
+
+    def _read_file(self) -> Dict[str, Any]:
+        if not self.path:
+            return {}
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _write_file(self, key: str, entry: Dict[str, Any]):
+        if not self.path:
+            return
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            entries = self._read_file()
+            entries[key] = entry
+            tmp_path = f"{self.path}.{os.getpid()}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(entries, f)
+            os.replace(tmp_path, self.path)
+        except OSError:
+            pass
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Sentiment Counts Test
+Check the client-side fallback against the SQLite stand-in of sentiment_daily_counts
+"""
+
+import sys
+import os
+import sqlite3
+import logging
+
+# Add parent path to import database package
+parent_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, parent_path)
+
+from database.sentiment_counts import (
+    SQLiteSentimentCounts, group_sentiment_rows, normalize_count_rows, build_rpc_params
+)
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+SAMPLE_ROWS = [
+    ("2025-08-11", "Positive"),
+    ("2025-08-11", "Negative"),
+    ("2025-08-11", "Positive"),
+    ("2025-08-12", "Neutral"),
+    ("2025-08-12", None),
+    ("2025-08-12", ""),
+    ("2025-08-13", "Negative"),
+    ("2019-12-31", "Positive"),
+]
+
+
+def _sample_backend():
+    connection = sqlite3.connect(":memory:")
+    connection.execute('CREATE TABLE "FPT_News" (id INTEGER PRIMARY KEY, date TEXT, sentiment TEXT)')
+    connection.executemany('INSERT INTO "FPT_News" (date, sentiment) VALUES (?, ?)', SAMPLE_ROWS)
+    return SQLiteSentimentCounts(connection)
+
+
+def _sample_dicts():
+    return [{"date": date, "sentiment": sentiment} for date, sentiment in SAMPLE_ROWS]
+
+
+def test_sql_aggregate_matches_client_grouping():
+    """The GROUP BY and the client fallback return the same rows"""
+    backend = _sample_backend()
+    assert backend.daily_counts("FPT_News") == group_sentiment_rows(_sample_dicts())
+    assert backend.daily_counts("FPT_News") == [
+        {"date": "2019-12-31", "Positive": 1, "Negative": 0, "Neutral": 0},
+        {"date": "2025-08-11", "Positive": 2, "Negative": 1, "Neutral": 0},
+        {"date": "2025-08-12", "Positive": 0, "Negative": 0, "Neutral": 1},
+        {"date": "2025-08-13", "Positive": 0, "Negative": 1, "Neutral": 0},
+    ]
+
+
+def test_date_filters():
+    """start_date / end_date / dates restrict the rows like the RPC parameters"""
+    backend = _sample_backend()
+    rows = _sample_dicts()
+    since_2020 = [row for row in rows if row["date"] >= "2020-01-01"]
+    assert backend.daily_counts("FPT_News", start_date="2020-01-01") == group_sentiment_rows(since_2020)
+    assert [row["date"] for row in backend.daily_counts("FPT_News", end_date="2025-08-11")] == \
+        ["2019-12-31", "2025-08-11"]
+    assert [row["date"] for row in backend.daily_counts("FPT_News", dates=["2025-08-13", "2025-08-12"])] == \
+        ["2025-08-12", "2025-08-13"]
+    assert backend.daily_counts("FPT_News", dates=[]) == []
+
+
+def test_normalize_count_rows():
+    """RPC rows (NULL counts, non-string dates) are coerced like the SQLite rows"""
+    assert normalize_count_rows([{"date": 20250811, "Positive": "2", "Negative": None}]) == [
+        {"date": "20250811", "Positive": 2, "Negative": 0, "Neutral": 0}
+    ]
+
+
+def test_table_name_is_validated():
+    """Only *_News tables reach the interpolated SQL"""
+    backend = _sample_backend()
+    for bad_name in ('FPT_Stock', 'FPT_News"; DROP TABLE x; --'):
+        try:
+            backend.daily_counts(bad_name)
+        except ValueError:
+            pass
+        else:
+            raise AssertionError(f"{bad_name} was accepted")
+    assert build_rpc_params("FPT_News", dates={"2025-08-12", "2025-08-11"})["p_dates"] == ["2025-08-11", "2025-08-12"]
+
+
+if __name__ == "__main__":
+    tests = [test_sql_aggregate_matches_client_grouping, test_date_filters,
+             test_normalize_count_rows, test_table_name_is_validated]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            logger.info(f"{test.__name__}: passed")
+        except AssertionError as e:
+            failed += 1
+            logger.error(f"{test.__name__}: FAILED {e}")
+    sys.exit(1 if failed else 0)
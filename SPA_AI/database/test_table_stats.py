@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Table Stats Test
+Check the stats built from the SQLite stand-in of news_table_stats
+"""
+
+import sys
+import os
+import sqlite3
+import logging
+
+# Add parent path to import database package
+parent_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, parent_path)
+
+from database.table_stats import (
+    SQLiteTableStats, build_table_stats, empty_table_stats, normalize_stats_rows
+)
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# (content, ai_summary, industry, sentiment); '' and NULL both mean "missing"
+GENERAL_ROWS = [
+    ("article", "summary", "Finance", "Positive"),
+    ("article", "summary", "", "Negative"),
+    ("article", "summary", None, None),
+    ("article", "", "Energy", None),
+    ("article", None, None, None),
+    ("", "summary", "Technology", "Neutral"),
+    (None, None, None, None),
+]
+FPT_ROWS = [
+    ("article", "summary", "Positive"),
+    ("article", "summary", "Positive"),
+    ("article", "", None),
+    ("article", "summary", ""),
+    ("", None, None),
+]
+
+
+def _sample_backend():
+    connection = sqlite3.connect(":memory:")
+    connection.execute('CREATE TABLE "General_News" '
+                       '(id INTEGER PRIMARY KEY, content TEXT, ai_summary TEXT, industry TEXT, sentiment TEXT)')
+    connection.execute('CREATE TABLE "FPT_News" '
+                       '(id INTEGER PRIMARY KEY, content TEXT, ai_summary TEXT, sentiment TEXT)')
+    connection.executemany('INSERT INTO "General_News" (content, ai_summary, industry, sentiment) '
+                           'VALUES (?, ?, ?, ?)', GENERAL_ROWS)
+    connection.executemany('INSERT INTO "FPT_News" (content, ai_summary, sentiment) VALUES (?, ?, ?)', FPT_ROWS)
+    connection.execute('CREATE TABLE "VCB_News" (id INTEGER PRIMARY KEY, content TEXT, ai_summary TEXT, sentiment TEXT)')
+    return SQLiteTableStats(connection)
+
+
+def test_table_with_industry_column():
+    """Empty strings and NULLs are both left out; an industry counts once the row has a summary"""
+    stats = _sample_backend().table_stats(["General_News"])["General_News"]
+    assert stats == build_table_stats(
+        total=5, summarized=3, classified=2, has_industry=True,
+        sentiment={"Positive": 1, "Negative": 1, "Neutral": 1}
+    )
+    assert stats["unclassified"] == 1
+    # The row without content still carries a label, so pending is clamped at 0
+    assert stats["sentiment_labelled"] == 3 and stats["sentiment_pending"] == 0
+
+
+def test_table_without_industry_column():
+    """Tables without an industry column report no classification work"""
+    stats = _sample_backend().table_stats(["FPT_News"])["FPT_News"]
+    assert stats == build_table_stats(
+        total=4, summarized=3, classified=0, has_industry=False,
+        sentiment={"Positive": 2, "Negative": 0, "Neutral": 0}
+    )
+    assert stats["unclassified"] == 0 and stats["classification_rate"] == 0
+    assert stats["sentiment_pending"] == 1
+    assert round(stats["completion_rate"], 2) == 75.0
+
+
+def test_empty_tables():
+    """An empty table counts as fully processed; a missing RPC row uses empty_table_stats"""
+    stats = _sample_backend().table_stats(["General_News", "FPT_News", "VCB_News"])
+    assert sorted(stats) == ["FPT_News", "General_News", "VCB_News"]
+    assert stats["VCB_News"]["total"] == 0 and stats["VCB_News"]["completion_rate"] == 100
+    assert empty_table_stats()["completion_rate"] == 0
+    assert "sentiment" not in empty_table_stats()
+    assert _sample_backend().table_stats([]) == {}
+
+
+def test_normalize_stats_rows():
+    """RPC rows (NULL counts, numeric strings) are coerced like the SQLite rows"""
+    stats = normalize_stats_rows([{
+        "table_name": "GAS_News", "total": "4", "summarized": 2, "classified": None,
+        "has_industry": False, "Positive": "1", "Negative": None, "Neutral": 1
+    }])
+    assert stats == {"GAS_News": build_table_stats(
+        4, 2, 0, False, {"Positive": 1, "Negative": 0, "Neutral": 1}
+    )}
+    assert stats["GAS_News"]["completion_rate"] == 50.0
+
+
+def test_table_name_is_validated():
+    """Only *_News tables reach the interpolated SQL"""
+    backend = _sample_backend()
+    for bad_name in ('FPT_Stock', "FPT_News' UNION SELECT 1 --"):
+        try:
+            backend.table_stats([bad_name])
+        except ValueError:
+            pass
+        else:
+            raise AssertionError(f"{bad_name} was accepted")
+
+
+if __name__ == "__main__":
+    tests = [test_table_with_industry_column, test_table_without_industry_column, test_empty_tables,
+             test_normalize_stats_rows, test_table_name_is_validated]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            logger.info(f"{test.__name__}: passed")
+        except AssertionError as e:
+            failed += 1
+            logger.error(f"{test.__name__}: FAILED {e}")
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,138 @@
+"""
+Work Queue
+Pending summarize / sentiment / industry work of the news tables
+
+Triggers on the news tables (see migrations/004_pipeline_queue.sql) keep one
+pipeline_queue row per article and stage that still needs work, so a phase
+claims its next batch from a small partially indexed table instead of
+scanning the news tables with OR predicates on NULL / empty columns.
+claim_pipeline_work hands out rows with FOR UPDATE SKIP LOCKED and a lease:
+concurrent workers never get the same article, and work claimed by a worker
+that died is handed out again once the lease expires. An item is handed
+out at most max_attempts times; its last claim is logged and counted, since
+it stays in the queue unprocessed if that attempt fails too. Claims given
+back unused are released with refund_attempt (migrations/006), so they do
+not count towards max_attempts.
+"""
+
+import os
+import socket
+import logging
+from typing import Dict, Any, Iterable, List, Tuple
+
+from telemetry import count
+from .sentiment_counts import validate_news_table
+
+logger = logging.getLogger(__name__)
+
+CLAIM_WORK_RPC = "claim_pipeline_work"
+RELEASE_WORK_RPC = "release_pipeline_work"
+COMPLETE_WORK_RPC = "complete_pipeline_work"
+
+STAGES = ("summarize", "sentiment", "industry")
+
+
+def default_worker_id() -> str:
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+
+def validate_stage(stage: str) -> str:
+    if stage not in STAGES:
+        raise ValueError(f"Invalid pipeline stage: {stage}")
+    return stage
+
+
+def pending_stages(row: Dict[str, Any]) -> List[str]:
+    """Stages an article row still needs (same rules as the pipeline_queue_sync trigger)"""
+    has_content = bool(row.get("content") or "")
+    has_summary = bool(row.get("ai_summary") or "")
+    stages = []
+    if has_content and not has_summary:
+        stages.append("summarize")
+    if has_summary and not row.get("sentiment"):
+        stages.append("sentiment")
+    if "industry" in row and has_summary and not row.get("industry"):
+        stages.append("industry")
+    return stages
+
+
+class WorkQueue:
+    """
+    Client of the pipeline_queue RPCs
+
+    Usage:
+        queue = WorkQueue(client)
+        articles = queue.claim_articles("summarize", "id, content", limit=20)
+    """
+
+    def __init__(self, client, worker_id: str = None, lease_seconds: int = 600, max_attempts: int = 5):
+        self.client = client
+        self.worker_id = worker_id or default_worker_id()
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+
+    def claim(self, stage: str, limit: int, table_name: str = None) -> List[Tuple[str, int]]:
+        """Claim up to limit (table, article id) pairs for stage"""
+        params = {
+            "p_stage": validate_stage(stage),
+            "p_limit": limit,
+            "p_worker": self.worker_id,
+            "p_table": validate_news_table(table_name) if table_name else None,
+            "p_lease_seconds": self.lease_seconds,
+            "p_max_attempts": self.max_attempts,
+        }
+        result = self.client.rpc(CLAIM_WORK_RPC, params).execute()
+        rows = result.data or []
+        exhausted = [row for row in rows if int(row.get("attempts") or 0) >= self.max_attempts]
+        if exhausted:
+            count("queue_last_attempt", len(exhausted), stage=stage)
+            logger.warning(f"{len(exhausted)} {stage} items claimed for their last attempt "
+                           f"(max_attempts={self.max_attempts}): "
+                           + ", ".join(f"{row['source_table']}#{row['article_id']}" for row in exhausted[:10]))
+        return [(row["source_table"], int(row["article_id"])) for row in rows]
+
+    def claim_articles(self, stage: str, columns: str, limit: int, table_name: str = None) -> List[Dict[str, Any]]:
+        """
+        Claim work for stage and load the claimed articles
+
+        Args:
+            stage: 'summarize', 'sentiment' or 'industry'
+            columns: Columns to select from the news table (must include id)
+            limit: Maximum number of articles
+            table_name: Only claim work of this table
+
+        Returns:
+            Article rows with an added 'table_name' key, oldest work first
+        """
+        claimed = self.claim(stage, limit, table_name)
+        ids_by_table: Dict[str, List[int]] = {}
+        for table, article_id in claimed:
+            ids_by_table.setdefault(table, []).append(article_id)
+
+        rows_by_key = {}
+        for table, ids in ids_by_table.items():
+            result = self.client.table(table).select(columns).in_("id", ids).execute()
+            for row in result.data or []:
+                row["table_name"] = table
+                rows_by_key[(table, int(row["id"]))] = row
+        return [rows_by_key[key] for key in claimed if key in rows_by_key]
+
+    def release(self, stage: str, table_name: str, ids: Iterable[int], refund_attempt: bool = False) -> int:
+        """Hand claimed work back before its lease expires (refund_attempt: the claim was not used)"""
+        # Only sent when set, so failed batches still release on databases without migration 006
+        extra = {"p_refund_attempt": True} if refund_attempt else None
+        return self._call(RELEASE_WORK_RPC, stage, table_name, ids, extra)
+
+    def complete(self, stage: str, table_name: str, ids: Iterable[int]) -> int:
+        """Drop work that will not be done (results written to the article leave the queue by themselves)"""
+        return self._call(COMPLETE_WORK_RPC, stage, table_name, ids)
+
+    def _call(self, rpc: str, stage: str, table_name: str, ids: Iterable[int],
+              extra: Dict[str, Any] = None) -> int:
+        ids = [int(article_id) for article_id in ids]
+        if not ids:
+            return 0
+        params = {"p_stage": validate_stage(stage), "p_table": validate_news_table(table_name), "p_ids": ids}
+        params.update(extra or {})
+        result = self.client.rpc(rpc, params).execute()
+        return int(result.data or 0)
@@ -0,0 +1,352 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+ARTICLE DATAFLOW
+Per-article execution of summarization, sentiment and industry classification
+
+In the phased pipeline summarization waits for every crawler and sentiment
+waits for summarization to drain every table. In dataflow mode each article
+moves through the stages on its own:
+
+    insert (crawler) -> summarize -> sentiment
+                                  -> industry (General_News only)
+
+Stages run on their own threads and are connected by bounded queues, so a
+fast producer blocks (backpressure) instead of buffering unbounded work.
+Each stage takes whatever is waiting in its queue, up to its batch size,
+which keeps model forward passes batched without waiting for a full batch.
+drain() is the completion barrier: it returns once every article accepted so
+far has left the last stage, and only then do the per-stock aggregation and
+the forecast run.
+
+Usage:
+    python main.py --dataflow
+
+Author: SPA VIP Team
+Date: August 12, 2025
+"""
+
+import time
+import queue
+import logging
+import threading
+from typing import Any, Callable, Dict, List, Set
+
+from database import SupabaseManager, DatabaseConfig
+
+logger = logging.getLogger(__name__)
+
+# Shuts a stage down once everything queued before it has been processed
+_STOP = object()
+
+
+class Stage(threading.Thread):
+    """
+    One processing stage: bounded input queue, micro-batching worker thread
+
+    The handler receives a list of items and returns the items to forward;
+    each output is put on every downstream stage whose route accepts it.
+    on_failure receives the batch when the handler raises. An article
+    (table_name, id) is accepted once per run: later puts of it are dropped,
+    whether they come from the crawler, the backlog seeder or upstream.
+    """
+
+    def __init__(self, name: str, handler: Callable[[List[Dict]], List[Dict]],
+                 batch_size: int = 8, queue_size: int = 100,
+                 on_failure: Callable[[List[Dict]], Any] = None):
+        super().__init__(name=f"stage-{name}", daemon=True)
+        self.stage_name = name
+        self.handler = handler
+        self.on_failure = on_failure
+        self.batch_size = batch_size
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.routes = []
+        self._accepted = set()
+        self._accepted_lock = threading.Lock()
+
+        self.received = 0
+        self.duplicates = 0
+        self.processed = 0
+        self.failed = 0
+        self.batches = 0
+        self.busy_seconds = 0.0
+
+    def connect(self, stage: 'Stage', accepts: Callable[[Dict], bool] = None):
+        """Forward outputs to stage (optionally only those accepted by the predicate)"""
+        self.routes.append((stage, accepts))
+
+    def put(self, item: Dict) -> bool:
+        """Enqueue an item, blocking while the queue is full (False if it was already accepted)"""
+        key = (item['table_name'], item['id'])
+        with self._accepted_lock:
+            if key in self._accepted:
+                self.duplicates += 1
+                return False
+            self._accepted.add(key)
+            self.received += 1
+        self.queue.put(item)
+        return True
+
+    def close(self):
+        """Stop after everything already queued has been processed"""
+        self.queue.put(_STOP)
+
+    def run(self):
+        stopping = False
+        while not stopping:
+            item = self.queue.get()
+            if item is _STOP:
+                break
+            batch = [item]
+            while len(batch) < self.batch_size:
+                try:
+                    item = self.queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+            self._process(batch)
+
+    def _process(self, batch: List[Dict]):
+        start = time.time()
+        try:
+            outputs = self.handler(batch) or []
+        except Exception as e:
+            logger.error(f"[{self.stage_name}] batch of {len(batch)} failed: {e}")
+            self.failed += len(batch)
+            if self.on_failure is not None:
+                self.on_failure(batch)
+            return
+        finally:
+            self.busy_seconds += time.time() - start
+            self.batches += 1
+
+        self.processed += len(batch)
+        for output in outputs:
+            for stage, accepts in self.routes:
+                if accepts is None or accepts(output):
+                    stage.put(output)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'stage': self.stage_name,
+            'received': self.received,
+            'duplicates': self.duplicates,
+            'processed': self.processed,
+            'failed': self.failed,
+            'batches': self.batches,
+            'busy_seconds': round(self.busy_seconds, 1),
+            'queued': self.queue.qsize()
+        }
+
+
+class ArticleDataflow:
+    """
+    Summarize -> sentiment / industry dataflow fed by article inserts
+
+    Usage:
+        flow = ArticleDataflow()
+        flow.start()
+        SupabaseManager.add_insert_listener(flow.on_insert)
+        ... run crawlers ...
+        SupabaseManager.remove_insert_listener(flow.on_insert)
+        flow.drain()
+        flow.stock_updates  # {stock_code: {dates}} for the aggregation
+    """
+
+    def __init__(self, use_map_reduce: bool = True, queue_size: int = 100,
+                 summarize_batch: int = 8, classify_batch: int = 32):
+        self.use_map_reduce = use_map_reduce
+        self.general_table = DatabaseConfig.get_table_name(is_general=True)
+
+        # Failed batches hand their work-queue claims back (no-op without USE_WORK_QUEUE)
+        self.summarize_stage = Stage(
+            "summarize", self._summarize, summarize_batch, queue_size,
+            on_failure=lambda batch: self.summary_db.release_claimed_articles("summarize", batch)
+        )
+        self.sentiment_stage = Stage(
+            "sentiment", self._classify_sentiment, classify_batch, queue_size,
+            on_failure=lambda batch: self.sentiment_db.release_claimed_articles("sentiment", batch)
+        )
+        self.industry_stage = Stage(
+            "industry", self._classify_industry, classify_batch, queue_size,
+            on_failure=lambda batch: self.industry_db.release_claimed_articles("industry", batch)
+        )
+        self.summarize_stage.connect(self.sentiment_stage)
+        self.summarize_stage.connect(self.industry_stage,
+                                     lambda item: item['table_name'] == self.general_table)
+        self.stages = [self.summarize_stage, self.sentiment_stage, self.industry_stage]
+
+        # Stock code -> dates with newly labelled articles (input of the aggregation)
+        self.stock_updates: Dict[str, Set[str]] = {}
+        self.latencies: List[float] = []
+        self._lock = threading.Lock()
+        self._seeders: List[threading.Thread] = []
+        self.started_at = None
+
+    # ============ LIFECYCLE ============
+
+    def start(self):
+        """Load models and start the stage threads"""
+        from summarization.main_summarization import load_summarizer
+        from sentiment.predict_sentiment_db import get_sentiment_model
+        from industry.pipeline.classification_pipeline import load_industry_classifier
+
+        # Warm the models; stage handlers fetch them from the registry on each batch
+        load_summarizer(self.use_map_reduce)
+        get_sentiment_model()
+        load_industry_classifier()
+
+        # One client per stage thread
+        self.summary_db = SupabaseManager()
+        self.sentiment_db = SupabaseManager()
+        self.industry_db = SupabaseManager()
+
+        self.started_at = time.time()
+        for stage in self.stages:
+            stage.start()
+        logger.info("Article dataflow started")
+
+    def seed_backlog(self, limit: int = 1000):
+        """Feed articles that were already waiting for a summary, a sentiment or an industry label"""
+        def seed():
+            from sentiment.predict_sentiment_db import iter_unlabelled_articles
+
+            db = SupabaseManager()
+
+            def feed(stage: Stage, items: List[Dict]):
+                # Claimed rows that do not enter the stage go back to the work queue, attempt unused
+                skipped = [item for item in items if not stage.put(item)]
+                db.release_claimed_articles(stage.stage_name, skipped, refund_attempt=True)
+
+            feed(self.summarize_stage, [self._item(article['table_name'], article)
+                                        for article in db.fetch_unsummarized_articles(limit=limit)])
+            # Summarized but never labelled (e.g. the run that summarized them stopped early)
+            for table_name in DatabaseConfig.get_all_news_tables():
+                seeded = 0
+                for batch in iter_unlabelled_articles(db, table_name, batch_size=min(limit, 256)):
+                    items = [self._item(table_name, article) for article in batch]
+                    feed(self.sentiment_stage, items[:limit - seeded])
+                    db.release_claimed_articles("sentiment", items[limit - seeded:], refund_attempt=True)
+                    seeded += len(batch)
+                    if seeded >= limit:
+                        break
+            feed(self.industry_stage, [self._item(article['table_name'], article)
+                                       for article in db.fetch_unclassified_articles(limit=limit)])
+
+        seeder = threading.Thread(target=seed, name="dataflow-seed", daemon=True)
+        seeder.start()
+        self._seeders.append(seeder)
+
+    def on_insert(self, table_name: str, row: Dict[str, Any]):
+        """SupabaseManager insert listener: new article enters the dataflow"""
+        if row.get('id') and (row.get('content') or '').strip():
+            self.summarize_stage.put(self._item(table_name, row))
+
+    def drain(self):
+        """Completion barrier: wait until every accepted article has been processed"""
+        for seeder in self._seeders:
+            seeder.join()
+        # Close upstream first so its last outputs reach the downstream queues
+        self.summarize_stage.close()
+        self.summarize_stage.join()
+        for stage in (self.sentiment_stage, self.industry_stage):
+            stage.close()
+        for stage in (self.sentiment_stage, self.industry_stage):
+            stage.join()
+        logger.info("Article dataflow drained")
+
+    @staticmethod
+    def _item(table_name: str, row: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            'table_name': table_name,
+            'id': row['id'],
+            'content': row.get('content', ''),
+            'ai_summary': row.get('ai_summary'),
+            'date': row.get('date'),
+            'entered_at': time.time()
+        }
+
+    # ============ STAGE HANDLERS ============
+
+    def _summarize(self, batch: List[Dict]) -> List[Dict]:
+        from summarization.main_summarization import load_summarizer
+
+        summaries = load_summarizer(self.use_map_reduce).summarize_batch([item['content'] for item in batch])
+        outputs, failed = [], []
+        for item, summary in zip(batch, summaries):
+            if summary and self.summary_db.update_article_summary(item['id'], summary, item['table_name']):
+                item['ai_summary'] = summary
+                outputs.append(item)
+            else:
+                failed.append(item)
+        self.summary_db.release_claimed_articles("summarize", failed)
+        return outputs
+
+    def _classify_sentiment(self, batch: List[Dict]) -> List[Dict]:
+        from sentiment.predict_sentiment_db import classify_texts, bulk_update_sentiment_labels
+
+        batch = [item for item in batch if (item.get('ai_summary') or '').strip()]
+        if not batch:
+            return []
+        labels = classify_texts([item['ai_summary'] for item in batch])
+
+        by_table: Dict[str, List] = {}
+        for item, label in zip(batch, labels):
+            by_table.setdefault(item['table_name'], []).append((item, label))
+
+        for table_name, labelled in by_table.items():
+            written = bulk_update_sentiment_labels(
+                self.sentiment_db, table_name,
+                [(item['id'], label) for item, label in labelled],
+                key_column="id"
+            )
+            self.sentiment_db.release_claimed_articles(
+                "sentiment", [item for item, _ in labelled if written.get(item['id']) is None]
+            )
+            stock_code = table_name.replace("_News", "") if table_name != self.general_table else None
+            with self._lock:
+                for item, _ in labelled:
+                    if not written.get(item['id']):
+                        continue
+                    if stock_code and item.get('date'):
+                        self.stock_updates.setdefault(stock_code, set()).add(str(item['date']))
+                    self.latencies.append(time.time() - item['entered_at'])
+        return []
+
+    def _classify_industry(self, batch: List[Dict]) -> List[Dict]:
+        from industry.pipeline.classification_pipeline import load_industry_classifier
+
+        batch = [item for item in batch if len((item.get('ai_summary') or '').strip()) >= 10]
+        if not batch:
+            return []
+        predictions = load_industry_classifier().predict_batch([item['ai_summary'] for item in batch])
+        failed = [item for item, (industry, _) in zip(batch, predictions)
+                  if not self.industry_db.update_article_industry(item['id'], industry, item['table_name'])]
+        self.industry_db.release_claimed_articles("industry", failed)
+        return []
+
+    # ============ STATS ============
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            latencies = sorted(self.latencies)
+        return {
+            'stages': [stage.stats() for stage in self.stages],
+            'articles_completed': len(latencies),
+            'latency_p50': round(latencies[len(latencies) // 2], 1) if latencies else None,
+            'latency_max': round(latencies[-1], 1) if latencies else None,
+            'stocks_updated': sorted(self.stock_updates)
+        }
+
+    def log_stats(self):
+        stats = self.stats()
+        logger.info("DATAFLOW STATISTICS:")
+        for stage in stats['stages']:
+            logger.info(f"   {stage['stage']:<10} processed={stage['processed']} failed={stage['failed']} "
+                        f"duplicates={stage['duplicates']} "
+                        f"batches={stage['batches']} busy={stage['busy_seconds']}s")
+        logger.info(f"   Articles insert -> sentiment: {stats['articles_completed']} "
+                    f"(p50 {stats['latency_p50']}s, max {stats['latency_max']}s)")
@@ -4,6 +4,8 @@ import logging
 from transformers import AutoModel, AutoTokenizer
 import os
 
+from telemetry import timer
+
 class IndustryClassifier(nn.Module):
     def __init__(self, n_classes=5):
         super(IndustryClassifier, self).__init__()
@@ -37,15 +39,16 @@ class PhoBERTClassifier:
 
     def predict(self, text):
         try:
-            inputs = self.tokenizer(
-                text,
-                return_tensors="pt",
-                padding=True,
-                truncation=True,
-                max_length=256
-            )
-            inputs = {k: v.to(self.device) for k, v in inputs.items()}
-            with torch.no_grad():
+            with timer("tokenize", model="industry"):
+                inputs = self.tokenizer(
+                    text,
+                    return_tensors="pt",
+                    padding=True,
+                    truncation=True,
+                    max_length=256
+                )
+                inputs = {k: v.to(self.device) for k, v in inputs.items()}
+            with torch.no_grad(), timer("model_forward", model="industry"):
                 outputs = self.model(input_ids=inputs["input_ids"], attention_mask=inputs["attention_mask"])
                 probs = torch.softmax(outputs, dim=1)
                 pred_idx = torch.argmax(probs, dim=1).item()
@@ -53,3 +56,23 @@ class PhoBERTClassifier:
         except Exception as e:
             logging.error(f"Prediction error: {str(e)}")
             return "Unknown", [0]*len(self.labels)
+
+    def predict_batch(self, texts):
+        """Classify several texts in one forward pass; returns a (label, probs) pair per text"""
+        try:
+            with timer("tokenize", model="industry"):
+                inputs = self.tokenizer(
+                    texts,
+                    return_tensors="pt",
+                    padding=True,
+                    truncation=True,
+                    max_length=256
+                )
+                inputs = {k: v.to(self.device) for k, v in inputs.items()}
+            with torch.no_grad(), timer("model_forward", model="industry"):
+                outputs = self.model(input_ids=inputs["input_ids"], attention_mask=inputs["attention_mask"])
+                probs = torch.softmax(outputs, dim=1).cpu().numpy()
+            return [(self.labels[row.argmax()], row) for row in probs]
+        except Exception as e:
+            logging.error(f"Batch prediction error: {str(e)}")
+            return [("Unknown", [0]*len(self.labels)) for _ in texts]
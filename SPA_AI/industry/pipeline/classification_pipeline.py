@@ -5,6 +5,14 @@ from typing import Dict, Any, List, Optional
 from industry.models.phobert_classifier import PhoBERTClassifier
 from industry.utils.database import PostgresConnector
 from industry.config import Config
+from model_registry import get_registry, file_model_key
+
+def load_industry_classifier() -> PhoBERTClassifier:
+    """Industry classifier shared through the model registry (loaded once per process)"""
+    return get_registry().get_or_load(
+        file_model_key("industry_phobert", Config.MODEL_INDUSTRY_PATH),
+        lambda: PhoBERTClassifier(Config.MODEL_INDUSTRY_PATH, Config.INDUSTRY_LABELS)
+    )
 
 class IndustryClassificationPipeline:
     """
@@ -12,16 +20,19 @@ class IndustryClassificationPipeline:
     Classifies news articles into industry categories using PhoBERT
     """
     
+    @property
+    def industry_classifier(self) -> PhoBERTClassifier:
+        """Fetched from the model registry on every use, so an evicted model is really freed"""
+        return load_industry_classifier()
+
     def __init__(self):
         """Initialize the industry classification pipeline"""
         try:
             logging.info("Initializing Industry Classification Pipeline...")
             
             # Initialize industry classifier
-            self.industry_classifier = PhoBERTClassifier(
-                Config.MODEL_INDUSTRY_PATH,
-                Config.INDUSTRY_LABELS
-            )
+            # Loaded once per process and kept warm across pipeline cycles
+            load_industry_classifier()
             
             # Initialize database connector
             self.db = PostgresConnector()
@@ -56,6 +67,8 @@ class IndustryClassificationPipeline:
                 return 0
             
             processed_count = 0
+            # Articles not classified and written; their work-queue claims are handed back
+            failed = []
             
             for article in articles:
                 try:
@@ -97,11 +110,15 @@ class IndustryClassificationPipeline:
                         logging.info(f"Classified article {article['id']}: {industry} (confidence: {max_confidence:.3f})")
                     else:
                         logging.error(f"Failed to update article {article['id']}")
+                        failed.append(article)
                         
                 except Exception as e:
                     logging.error(f"Error processing article {article.get('id', 'unknown')}: {str(e)}")
+                    failed.append(article)
                     continue
             
+            self.db.db_manager.release_claimed_articles("industry", failed)
+            
             logging.info(f"Successfully processed {processed_count}/{len(articles)} articles")
             return processed_count
             
@@ -52,6 +52,10 @@ class PostgresConnector:
                 logging.warning("Industry classification only works on General_News table")
                 return []
 
+            # Claim from the pipeline_queue table when enabled (no NULL-column scan)
+            if self.db_manager.uses_work_queue():
+                return self.db_manager.fetch_unclassified_articles(tables_to_query[0], limit)
+
             for table in tables_to_query:
                 logging.debug(f"Querying table: {table}")
 
@@ -133,24 +137,10 @@ class PostgresConnector:
             # Only process General_News table
             table = 'General_News'
             try:
-                # Count total articles with summaries
-                total_result = self.db_manager.client.table(table)\
-                    .select("*", count="exact")\
-                    .filter("ai_summary", "not.is", "null")\
-                    .neq("ai_summary", "")\
-                    .execute()
-
-                # Count articles with industry classification
-                classified_result = self.db_manager.client.table(table)\
-                    .select("*", count="exact")\
-                    .filter("industry", "not.is", "null")\
-                    .neq("industry", "")\
-                    .filter("ai_summary", "not.is", "null")\
-                    .neq("ai_summary", "")\
-                    .execute()
-
-                total_count = total_result.count or 0
-                classified_count = classified_result.count or 0
+                # Single-query table stats of the database manager, counted fresh (not from the TTL cache)
+                table_stats = self.db_manager.get_table_stats(max_age=0).get(table, {})
+                total_count = table_stats.get("summarized", 0)
+                classified_count = table_stats.get("classified", 0)
 
                 stats[table] = {
                     "total_with_summary": total_count,
@@ -32,6 +32,8 @@ sys.path.insert(0, industry_path)
 
 # Import database manager
 from database import SupabaseManager, DatabaseConfig
+from model_registry import get_registry
+from telemetry import telemetry, timed, configure_from_env
 
 # Create logs directory if it does not exist
 os.makedirs('logs', exist_ok=True)
@@ -49,6 +51,9 @@ logging.basicConfig(
 
 logger = logging.getLogger(__name__)
 
+# Structured timings/counters: JSON lines with TELEMETRY_JSONL, /metrics with TELEMETRY_PORT
+configure_from_env()
+
 class SPAVIPPipeline:
     """
     Integrated pipeline for SPA VIP system
@@ -58,6 +63,7 @@ class SPAVIPPipeline:
     def __init__(self):
         """Initialize the integrated pipeline"""
         self.start_time = None
+        self.interrupted = False
         self.db_manager = None
         self.crawl_results = {}
         self.summarization_results = {}
@@ -109,6 +115,9 @@ class SPAVIPPipeline:
         logger.info(f"Industry Classified: {total_classified:,}")
         logger.info(f"Pending Summary: {total_pending:,}")
         logger.info(f"Pending Classification: {total_unclassified:,}")
+        if all('sentiment_pending' in table_stats for table_stats in stats.values()):
+            total_sentiment_pending = sum(table_stats['sentiment_pending'] for table_stats in stats.values())
+            logger.info(f"Pending Sentiment: {total_sentiment_pending:,}")
         logger.info(f"Summary Rate: {overall_completion:.1f}%")
         logger.info(f"Classification Rate: {overall_classification:.1f}%")
         logger.info("")
@@ -127,6 +136,7 @@ class SPAVIPPipeline:
         
         logger.info("="*80)
     
+    @timed("phase", phase="crawling")
     def run_crawling_phase(self, crawler_options: Dict[str, Any] = None):
         """
         Execute crawling phase
@@ -173,6 +183,7 @@ class SPAVIPPipeline:
             logger.error(f"Crawling phase failed: {e}")
             raise
     
+    @timed("phase", phase="summarization")
     def run_summarization_phase(self, summarization_options: Dict[str, Any] = None):
         """
         Execute AI summarization phase with Map-Reduce support
@@ -242,6 +253,7 @@ class SPAVIPPipeline:
             logger.error(f"Summarization phase failed: {e}")
             raise
     
+    @timed("phase", phase="sentiment")
     def run_sentiment_phase(self, sentiment_options: Dict[str, Any] = None):
         """
         Execute sentiment analysis phase
@@ -253,6 +265,9 @@ class SPAVIPPipeline:
                 - recalculate_all_stock: Whether to recalculate all stock sentiment stats (default: False)
                 - optimized_update: Whether to use optimized update (only affected trading days) (default: False)
                 - 30day_aggregate: Whether to use 30-day aggregation (weekend/holiday aggregation) (default: True)
+                - incremental_update: Apply per-article counter deltas backed by the sentiment ledger (default: False)
+                - stock_workers: Number of stocks aggregated concurrently (default: 4)
+                - use_processes: Use a process pool instead of threads (default: False)
         """
         logger.info("\nPHASE 3: SENTIMENT ANALYSIS")
         logger.info("="*50)
@@ -266,11 +281,69 @@ class SPAVIPPipeline:
             recalculate_all_stock = sentiment_options.get('recalculate_all_stock', False) if sentiment_options else False
             optimized_update = sentiment_options.get('optimized_update', False) if sentiment_options else False
             use_30day_aggregate = sentiment_options.get('30day_aggregate', True) if sentiment_options else True
+            incremental_update = sentiment_options.get('incremental_update', False) if sentiment_options else False
+            stock_workers = sentiment_options.get('stock_workers', 4) if sentiment_options else 4
+            use_processes = sentiment_options.get('use_processes', False) if sentiment_options else False
+            stock_results = []
             
-            if use_30day_aggregate and not recalculate_all_stock:
+            if incremental_update and not recalculate_all_stock:
+                # Apply signed deltas for newly labelled articles only
+                logger.info("Using INCREMENTAL sentiment update mode")
+                from sentiment.parallel_aggregation import run_parallel_stock_aggregation
+                from sentiment.predict_sentiment_db import get_database_manager, predict_and_update_sentiment
+                from database import DatabaseConfig
+                
+                if tables is None:
+                    # Default: process all stock news tables
+                    config = DatabaseConfig()
+                    tables = [config.get_table_name(stock_code=code) for code in ["FPT", "GAS", "IMP", "VCB"]]
+                    tables.append(config.get_table_name(is_general=True))
+                
+                db_manager = get_database_manager()
+                total_updated_dates = set()
+                
+                # Phase 1: Predict sentiment for new records, keeping the labelled articles
+                stock_updates = {}
+                stock_articles = {}
+                for table_name in tables:
+                    logger.info(f"Processing table: {table_name}")
+                    try:
+                        labelled_articles = []
+                        updated_dates = predict_and_update_sentiment(db_manager, table_name, labelled_articles)
+                        total_updated_dates.update(updated_dates)
+                        
+                        if table_name.endswith("_News") and table_name != "General_News":
+                            stock_code = table_name.replace("_News", "")
+                            stock_updates[stock_code] = updated_dates
+                            stock_articles[stock_code] = labelled_articles
+                        
+                        logger.info(f"Completed processing {table_name}")
+                    except Exception as e:
+                        logger.error(f"Error processing {table_name}: {e}")
+                
+                # Phase 2: Apply counter deltas to stock tables
+                if update_stock:
+                    logger.info("Phase 2: INCREMENTAL Stock Table Updates")
+                    
+                    stock_jobs = {}
+                    for stock_code, articles in stock_articles.items():
+                        if articles:
+                            stock_jobs[stock_code] = stock_updates[stock_code]
+                        else:
+                            logger.info(f"Skipping {stock_code} - no new predictions")
+                    
+                    stock_results = run_parallel_stock_aggregation(
+                        stock_jobs, mode="incremental", max_workers=stock_workers,
+                        use_processes=use_processes, stock_articles=stock_articles
+                    )
+                
+                db_manager.close_connections()
+                processed_dates = total_updated_dates
+                
+            elif use_30day_aggregate and not recalculate_all_stock:
                 # Use 30-day sentiment aggregation logic (default)
                 logger.info("Using 30-DAY SENTIMENT AGGREGATION mode (default)")
-                from sentiment.reset_aggregate_sentiment_30days import reset_and_aggregate_sentiment_30days
+                from sentiment.parallel_aggregation import run_parallel_stock_aggregation
                 from sentiment.predict_sentiment_db import get_database_manager, predict_and_update_sentiment
                 from database import DatabaseConfig
                 
@@ -304,16 +377,16 @@ class SPAVIPPipeline:
                 if update_stock:
                     logger.info("Phase 2: 30-DAY SENTIMENT AGGREGATION")
                     
+                    stock_jobs = {}
                     for stock_code in ["FPT", "GAS", "IMP", "VCB"]:
                         if stock_code in stock_updates and stock_updates[stock_code]:
-                            logger.info(f"Processing 30-day aggregation for {stock_code}")
-                            try:
-                                reset_and_aggregate_sentiment_30days(stock_code)
-                                logger.info(f"Completed 30-day aggregation for {stock_code}")
-                            except Exception as e:
-                                logger.error(f"Error 30-day aggregation {stock_code}: {e}")
+                            stock_jobs[stock_code] = stock_updates[stock_code]
                         else:
                             logger.info(f"Skipping {stock_code} - no new predictions")
+                    
+                    stock_results = run_parallel_stock_aggregation(
+                        stock_jobs, mode="30day", max_workers=stock_workers, use_processes=use_processes
+                    )
                 
                 db_manager.close_connections()
                 processed_dates = total_updated_dates
@@ -321,7 +394,7 @@ class SPAVIPPipeline:
             elif optimized_update:
                 # Use optimized sentiment update logic
                 logger.info("Using OPTIMIZED sentiment update mode")
-                from sentiment.optimized_sentiment_update import optimized_process_sentiment_to_stock
+                from sentiment.parallel_aggregation import run_parallel_stock_aggregation
                 from sentiment.predict_sentiment_db import get_database_manager, predict_and_update_sentiment
                 from database import DatabaseConfig
                 
@@ -358,14 +431,16 @@ class SPAVIPPipeline:
                     logger.info("Ensuring stock sentiment columns are not NULL...")
                     ensure_all_stock_sentiment_not_null(db_manager)
                     
+                    stock_jobs = {}
                     for stock_code, updated_dates in stock_updates.items():
                         if updated_dates:
-                            try:
-                                optimized_process_sentiment_to_stock(db_manager, stock_code, updated_dates)
-                            except Exception as e:
-                                logger.error(f"Error optimized processing {stock_code}: {e}")
+                            stock_jobs[stock_code] = updated_dates
                         else:
                             logger.info(f"Skipping {stock_code} - no new predictions")
+                    
+                    stock_results = run_parallel_stock_aggregation(
+                        stock_jobs, mode="optimized", max_workers=stock_workers, use_processes=use_processes
+                    )
                 
                 db_manager.close_connections()
                 processed_dates = total_updated_dates
@@ -375,18 +450,27 @@ class SPAVIPPipeline:
                 
                 if tables:
                     logger.info(f"Processing specific tables: {tables}")
-                    processed_dates = run_sentiment_analysis_pipeline(tables, update_stock, recalculate_all_stock)
                 else:
                     logger.info("Processing all news tables")
-                    processed_dates = run_sentiment_analysis_pipeline(None, update_stock, recalculate_all_stock)
+                processed_dates, stock_results = run_sentiment_analysis_pipeline(
+                    tables, update_stock, recalculate_all_stock,
+                    stock_workers=stock_workers,
+                    use_processes=use_processes,
+                    return_stock_results=True
+                )
             
             phase_time = time.time() - phase_start
             self.sentiment_results = {
                 'status': 'success',
                 'duration': phase_time,
-                'dates_processed': len(processed_dates) if processed_dates else 0
+                'dates_processed': len(processed_dates) if processed_dates else 0,
+                'stock_results': stock_results
             }
             
+            for result in stock_results:
+                if result['status'] != 'success':
+                    logger.error(f"Sentiment aggregation failed for {result['stock_code']}: {result['error']}")
+            
             logger.info(f"Sentiment analysis phase completed in {phase_time/60:.1f} minutes")
             
         except Exception as e:
@@ -399,6 +483,7 @@ class SPAVIPPipeline:
             logger.error(f"Sentiment analysis phase failed: {e}")
             raise
     
+    @timed("phase", phase="timeseries")
     def run_timeseries_phase(self, timeseries_options: Dict[str, Any] = None):
         """
         Execute timeseries prediction phase
@@ -455,6 +540,7 @@ class SPAVIPPipeline:
             logger.error(f"Timeseries prediction phase failed: {e}")
             raise
     
+    @timed("phase", phase="industry")
     def run_industry_phase(self, industry_options: Dict[str, Any] = None):
         """
         Execute industry classification phase
@@ -580,12 +666,123 @@ class SPAVIPPipeline:
             
         except KeyboardInterrupt:
             logger.warning("Pipeline interrupted by user")
+            self.interrupted = True
             self._print_pipeline_summary()
         except Exception as e:
             logger.error(f"Pipeline failed with error: {e}")
             self._print_pipeline_summary()
             raise
     
+    def run_dataflow_pipeline(self, options: Dict[str, Any] = None):
+        """
+        Execute the pipeline in dataflow mode (see dataflow.py)
+        
+        Articles are summarized and classified while the crawlers are still
+        running; the stock aggregation and forecast wait for the dataflow to
+        drain.
+        
+        Args:
+            options: Pipeline execution options (same keys as run_full_pipeline)
+        """
+        from dataflow import ArticleDataflow
+        from sentiment.parallel_aggregation import run_parallel_stock_aggregation
+        
+        options = options or {}
+        summarization_options = options.get('summarization', {})
+        sentiment_options = options.get('sentiment', {})
+        self.start_time = time.time()
+        
+        logger.info("\n" + "="*20)
+        logger.info("STARTING SPA VIP DATAFLOW PIPELINE")
+        logger.info("="*20)
+        
+        flow = ArticleDataflow(use_map_reduce=summarization_options.get('use_map_reduce', True))
+        flow.start()
+        flow.seed_backlog()
+        SupabaseManager.add_insert_listener(flow.on_insert)
+        try:
+            # Phase 1 feeds the dataflow through the insert listener
+            self.run_crawling_phase(options.get('crawl', {}))
+        except Exception as e:
+            logger.error(f"Crawling failed, finishing articles already in the dataflow: {e}")
+        finally:
+            SupabaseManager.remove_insert_listener(flow.on_insert)
+            # Completion barrier before the per-stock work
+            flow.drain()
+        
+        flow.log_stats()
+        stages = {stage['stage']: stage for stage in flow.stats()['stages']}
+        dataflow_time = time.time() - self.start_time
+        self.summarization_results = {
+            'status': 'success',
+            'duration': dataflow_time,
+            'articles_processed': stages['summarize']['processed']
+        }
+        self.industry_results = {
+            'status': 'success',
+            'duration': dataflow_time,
+            'articles_processed': stages['industry']['processed']
+        }
+        
+        # Phase 3b: 30-day aggregation for stocks with newly labelled articles
+        stock_results = []
+        if sentiment_options.get('update_stock', True) and flow.stock_updates:
+            logger.info("30-DAY SENTIMENT AGGREGATION for: " + ", ".join(sorted(flow.stock_updates)))
+            stock_results = run_parallel_stock_aggregation(
+                flow.stock_updates, mode="30day",
+                max_workers=sentiment_options.get('stock_workers', 4),
+                use_processes=sentiment_options.get('use_processes', False)
+            )
+        self.sentiment_results = {
+            'status': 'success',
+            'duration': time.time() - self.start_time,
+            'dates_processed': len(set().union(*flow.stock_updates.values())) if flow.stock_updates else 0,
+            'stock_results': stock_results
+        }
+        
+        # Phase 4: Timeseries Prediction
+        try:
+            self.run_timeseries_phase(options.get('timeseries', {}))
+        except Exception:
+            pass  # Already recorded in timeseries_results
+        
+        self._print_pipeline_summary()
+    
+    def run_continuous(self, options: Dict[str, Any] = None, interval_minutes: float = 60):
+        """
+        Run the full pipeline repeatedly in this process
+        
+        Models stay loaded in the model registry between cycles, so only the
+        first cycle pays the model loading cost. Idle models are evicted
+        between cycles (MODEL_IDLE_SECONDS).
+        
+        Args:
+            options: Pipeline execution options (same as run_full_pipeline)
+            interval_minutes: Pause between the end of one cycle and the start of the next
+        """
+        registry = get_registry()
+        self.interrupted = False
+        cycle = 0
+        
+        while not self.interrupted:
+            cycle += 1
+            logger.info(f"CONTINUOUS MODE: starting cycle {cycle}")
+            try:
+                self.run_full_pipeline(options or {})
+            except Exception as e:
+                # Keep the process (and its warm models) alive for the next cycle
+                logger.error(f"Cycle {cycle} failed: {e}")
+            
+            evicted = registry.evict_idle()
+            if evicted:
+                logger.info(f"Evicted idle models: {', '.join(evicted)}")
+            registry.log_stats()
+            
+            if self.interrupted:
+                break
+            logger.info(f"Next cycle in {interval_minutes:.0f} minutes (Ctrl+C to stop)")
+            time.sleep(interval_minutes * 60)
+    
     def _print_pipeline_summary(self):
         """Print comprehensive pipeline summary"""
         total_time = time.time() - self.start_time if self.start_time else 0
@@ -627,6 +824,16 @@ class SPAVIPPipeline:
             if self.sentiment_results['status'] == 'success':
                 dates_processed = self.sentiment_results.get('dates_processed', 0)
                 logger.info(f"   Dates processed: {dates_processed}")
+                
+                stock_results = self.sentiment_results.get('stock_results', [])
+                if stock_results:
+                    successful_stocks = sum(1 for result in stock_results if result['status'] == 'success')
+                    logger.info(f"   Stock aggregation: {successful_stocks}/{len(stock_results)} successful")
+                    for result in stock_results:
+                        if result['status'] == 'success':
+                            logger.info(f"      {result['stock_code']}: {result['updated_count']} records ({result['duration']:.1f}s)")
+                        else:
+                            logger.info(f"      {result['stock_code']}: FAILED - {result['error']}")
         
         # Timeseries results
         if self.timeseries_results:
@@ -650,6 +857,17 @@ class SPAVIPPipeline:
                 articles_processed = self.industry_results.get('articles_processed', 0)
                 logger.info(f"   Articles classified: {articles_processed}")
         
+        # Loaded models
+        model_stats = get_registry().stats()
+        if model_stats['models']:
+            logger.info(f"MODELS: {model_stats['loaded_count']} loaded (~{model_stats['total_memory_mb']} MB), "
+                        f"total load time {model_stats['total_load_seconds']:.1f}s")
+        
+        # Stage timings and counters
+        logger.info("")
+        telemetry.log_summary(logger)
+        telemetry.write_prometheus('logs/metrics.prom')
+        
         logger.info("")
         logger.info("FINAL STATUS:")
         self.show_system_status()
@@ -675,6 +893,20 @@ Examples:
   python main.py --analyze-texts        # Analyze database text lengths
   python main.py --summarize-only --no-map-reduce  # Disable Map-Reduce
   python main.py --full --no-map-reduce # Full pipeline without Map-Reduce
+  
+  # Warm model server (models loaded once, reused every cycle):
+  python main.py --continuous --interval 30
+  
+  # Resident scheduler (each phase on its own cadence, woken by new upstream rows):
+  python main.py --scheduler
+  
+  # Dataflow mode (each article is summarized/classified as soon as it is crawled):
+  python main.py --dataflow
+  
+  # Profiling / metrics:
+  python main.py --profile              # cProfile dump in logs/profile_*.prof
+  python main.py --metrics-port 9108    # Prometheus text on :9108/metrics
+  py-spy record -o logs/flame.svg -- python main.py   # sampling profile
         """
     )
     
@@ -728,6 +960,12 @@ Examples:
                        help='Use optimized sentiment update (only affected trading days)')
     parser.add_argument('--30day-aggregate', action='store_true',
                        help='Use 30-day sentiment aggregation (weekend/holiday aggregation)')
+    parser.add_argument('--incremental-update', action='store_true',
+                       help='Apply per-article sentiment deltas to stock tables (requires seeded sentiment ledger)')
+    parser.add_argument('--sent-workers', type=int, default=4,
+                       help='Number of stocks aggregated concurrently (1 = serial, default: 4)')
+    parser.add_argument('--sent-processes', action='store_true',
+                       help='Use a process pool instead of threads for stock aggregation')
     
     # Timeseries options
     parser.add_argument('--ts-stocks', nargs='+',
@@ -743,8 +981,31 @@ Examples:
     parser.add_argument('--ind-process-all', action='store_true',
                        help='Process ALL pending industry classifications in batches')
     
+    # Continuous mode
+    parser.add_argument('--continuous', action='store_true',
+                       help='Run the full pipeline repeatedly, keeping models loaded between cycles')
+    parser.add_argument('--interval', type=float, default=60,
+                       help='Minutes between cycles in --continuous mode (default: 60)')
+    parser.add_argument('--dataflow', action='store_true',
+                       help='Summarize and classify each article as soon as it is inserted (see dataflow.py)')
+    parser.add_argument('--profile', action='store_true',
+                       help='Run under cProfile and write logs/profile_<time>.prof (+ .txt summary)')
+    parser.add_argument('--metrics-port', type=int,
+                       help='Serve Prometheus metrics on this port while running (same as TELEMETRY_PORT)')
+    parser.add_argument('--scheduler', action='store_true',
+                       help='Run every phase in its own loop, triggered by new upstream rows (see scheduler.py)')
+    
     args = parser.parse_args()
     
+    if args.metrics_port:
+        telemetry.start_http_server(args.metrics_port)
+    
+    profiler = None
+    if args.profile:
+        import cProfile
+        profiler = cProfile.Profile()
+        profiler.enable()
+    
     # Initialize pipeline
     pipeline = SPAVIPPipeline()
     
@@ -789,6 +1050,11 @@ Examples:
                 sentiment_options['optimized_update'] = True
             if args.__dict__.get('30day_aggregate'):  # Access hyphenated argument
                 sentiment_options['30day_aggregate'] = True
+            if args.incremental_update:
+                sentiment_options['incremental_update'] = True
+            sentiment_options['stock_workers'] = args.sent_workers
+            if args.sent_processes:
+                sentiment_options['use_processes'] = True
             pipeline.run_sentiment_phase(sentiment_options)
             
         elif args.timeseries_only:
@@ -843,6 +1109,12 @@ Examples:
                 sent_opts['recalculate_all_stock'] = True
             if args.optimized_update:
                 sent_opts['optimized_update'] = True
+            if args.incremental_update:
+                sent_opts['incremental_update'] = True
+            if args.sent_workers != 4:
+                sent_opts['stock_workers'] = args.sent_workers
+            if args.sent_processes:
+                sent_opts['use_processes'] = True
             if sent_opts:
                 options['sentiment'] = sent_opts
             
@@ -854,8 +1126,29 @@ Examples:
                 ind_opts['batch_size'] = args.ind_batch_size
             if ind_opts:
                 options['industry'] = ind_opts
-                
-            pipeline.run_full_pipeline(options)
+            
+            if args.scheduler:
+                from scheduler import PipelineScheduler
+                PipelineScheduler(pipeline, options).run_forever()
+            elif args.dataflow:
+                pipeline.run_dataflow_pipeline(options)
+            elif args.continuous:
+                pipeline.run_continuous(options, args.interval)
+            else:
+                pipeline.run_full_pipeline(options)
+            
+        elif args.dataflow:
+            # Overlapping phases: per-article dataflow, barrier before aggregation
+            pipeline.run_dataflow_pipeline({})
+            
+        elif args.scheduler:
+            # Resident scheduler: phases run independently and wake each other
+            from scheduler import PipelineScheduler
+            PipelineScheduler(pipeline).run_forever()
+            
+        elif args.continuous:
+            # Warm model server: full pipeline with default options, every --interval minutes
+            pipeline.run_continuous({}, args.interval)
             
         else:
             # Default behavior: run full pipeline automatically
@@ -878,6 +1171,26 @@ Examples:
     except Exception as e:
         logger.error(f"System error: {e}")
         raise
+    finally:
+        if profiler:
+            _dump_profile(profiler)
+        telemetry.close()
+
+def _dump_profile(profiler):
+    """Write cProfile stats (.prof for snakeviz/pstats) and a text summary"""
+    import io
+    import pstats
+    
+    profiler.disable()
+    base = f'logs/profile_{datetime.now().strftime("%Y%m%d_%H%M%S")}'
+    profiler.dump_stats(f'{base}.prof')
+    
+    stream = io.StringIO()
+    stats = pstats.Stats(profiler, stream=stream).sort_stats('cumulative')
+    stats.print_stats(60)
+    with open(f'{base}.txt', 'w', encoding='utf-8') as f:
+        f.write(stream.getvalue())
+    logger.info(f"Profile written to {base}.prof (summary: {base}.txt)")
 
 if __name__ == "__main__":
     main()
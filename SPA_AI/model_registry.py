@@ -0,0 +1,301 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+MODEL REGISTRY
+Process-wide cache of loaded AI models
+
+Every phase asks the registry for its model instead of loading it itself, so
+each model is loaded once per process and stays warm across repeated
+pipeline cycles (python main.py --continuous). The registry records load
+time, estimated memory and usage per model, and can evict models that have
+been idle too long or that push the total over a memory budget. Eviction
+only drops the registry's reference, so long-lived objects must not keep the
+model in an attribute: they call get_or_load (or the phase's load_* helper)
+each time they use it, which is a dictionary lookup once the model is warm.
+
+Configuration (environment):
+    MODEL_MEMORY_BUDGET_MB   Evict least recently used models above this size (0 = no budget)
+    MODEL_IDLE_SECONDS       Evict models unused for this long (0 = never)
+
+Usage:
+    from model_registry import get_registry
+    summarizer = get_registry().get_or_load("summarizer", lambda: NewsSummarizer())
+
+Author: SPA VIP Team
+Date: August 12, 2025
+"""
+
+import os
+import gc
+import time
+import logging
+import threading
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+def estimate_model_memory_mb(obj: Any) -> Optional[float]:
+    """
+    Estimate the parameter memory of a loaded model
+
+    Understands torch modules, Keras models and wrapper objects exposing a
+    .model attribute (or tuples such as (model, tokenizer, labels)).
+
+    Returns:
+        Size in MB, or None if it cannot be estimated
+    """
+    if isinstance(obj, (tuple, list)):
+        sizes = [estimate_model_memory_mb(item) for item in obj]
+        sizes = [size for size in sizes if size is not None]
+        return sum(sizes) if sizes else None
+
+    # torch.nn.Module
+    if hasattr(obj, "parameters") and callable(obj.parameters):
+        try:
+            total = sum(p.numel() * p.element_size() for p in obj.parameters())
+            total += sum(b.numel() * b.element_size() for b in obj.buffers()) if hasattr(obj, "buffers") else 0
+            return total / (1024 * 1024)
+        except Exception:
+            pass
+
+    # Keras model (float32 weights)
+    if hasattr(obj, "count_params") and callable(obj.count_params):
+        try:
+            return obj.count_params() * 4 / (1024 * 1024)
+        except Exception:
+            pass
+
+    # Wrapper classes (NewsSummarizer, PhoBERTClassifier, ...)
+    inner = getattr(obj, "model", None)
+    if inner is not None and inner is not obj:
+        return estimate_model_memory_mb(inner)
+    return None
+
+
+def _process_rss_mb() -> Optional[float]:
+    """Resident memory of this process (psutil if installed)"""
+    try:
+        import psutil
+        return psutil.Process(os.getpid()).memory_info().rss / (1024 * 1024)
+    except Exception:
+        return None
+
+
+class ModelEntry:
+    """One registered model and its statistics"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.model = None
+        self.load_seconds = 0.0
+        self.memory_mb = None
+        self.rss_delta_mb = None
+        self.loaded_at = None
+        self.last_used = None
+        self.load_count = 0
+        self.hits = 0
+        self.lock = threading.Lock()
+
+    @property
+    def loaded(self) -> bool:
+        return self.model is not None
+
+    def to_dict(self) -> Dict[str, Any]:
+        now = time.time()
+        return {
+            'name': self.name,
+            'loaded': self.loaded,
+            'load_seconds': round(self.load_seconds, 2),
+            'memory_mb': round(self.memory_mb, 1) if self.memory_mb is not None else None,
+            'rss_delta_mb': round(self.rss_delta_mb, 1) if self.rss_delta_mb is not None else None,
+            'load_count': self.load_count,
+            'hits': self.hits,
+            'idle_seconds': round(now - self.last_used, 1) if self.last_used else None
+        }
+
+
+class ModelRegistry:
+    """
+    Thread-safe load-once registry of models
+
+    Usage:
+        registry = ModelRegistry(memory_budget_mb=4096, idle_seconds=3600)
+        model = registry.get_or_load("sentiment_phobert", load_sentiment_model)
+        registry.evict_idle()
+        print(registry.stats())
+    """
+
+    def __init__(self, memory_budget_mb: float = 0, idle_seconds: float = 0):
+        self.memory_budget_mb = memory_budget_mb
+        self.idle_seconds = idle_seconds
+        self._entries: Dict[str, ModelEntry] = {}
+        self._lock = threading.Lock()
+
+    def _entry(self, name: str) -> ModelEntry:
+        with self._lock:
+            if name not in self._entries:
+                self._entries[name] = ModelEntry(name)
+            return self._entries[name]
+
+    def get_or_load(self, name: str, loader: Callable[[], Any]) -> Any:
+        """
+        Return the loaded model, calling loader() the first time (or after eviction)
+
+        Args:
+            name: Registry key (include anything that changes the model, e.g. its path)
+            loader: Zero-argument callable returning the model
+
+        Returns:
+            The model object returned by loader
+        """
+        entry = self._entry(name)
+        with entry.lock:
+            if entry.model is None:
+                logger.info(f"Loading model '{name}'...")
+                rss_before = _process_rss_mb()
+                start = time.time()
+                entry.model = loader()
+                entry.load_seconds = time.time() - start
+                rss_after = _process_rss_mb()
+                entry.memory_mb = estimate_model_memory_mb(entry.model)
+                entry.rss_delta_mb = (rss_after - rss_before) if rss_before is not None and rss_after is not None else None
+                entry.loaded_at = time.time()
+                entry.load_count += 1
+                logger.info(f"Model '{name}' loaded in {entry.load_seconds:.1f}s"
+                            + (f" (~{entry.memory_mb:.0f} MB)" if entry.memory_mb is not None else ""))
+            else:
+                entry.hits += 1
+            entry.last_used = time.time()
+            model = entry.model
+
+        if self.memory_budget_mb:
+            self.enforce_budget(keep=name)
+        return model
+
+    def is_loaded(self, name: str) -> bool:
+        with self._lock:
+            entry = self._entries.get(name)
+        return entry is not None and entry.loaded
+
+    def evict(self, name: str) -> bool:
+        """Drop a model so its memory can be reclaimed once callers release it"""
+        with self._lock:
+            entry = self._entries.get(name)
+        if entry is None or not entry.loaded:
+            return False
+        with entry.lock:
+            entry.model = None
+        logger.info(f"Evicted model '{name}'")
+        self._release_memory()
+        return True
+
+    def evict_other_versions(self, base: str, keep: str) -> List[str]:
+        """Evict loaded models whose key starts with base, except keep (older versions of one file)"""
+        with self._lock:
+            stale = [name for name, entry in self._entries.items()
+                     if entry.loaded and name.startswith(base) and name != keep]
+        return [name for name in stale if self.evict(name)]
+
+    def evict_idle(self, idle_seconds: float = None) -> List[str]:
+        """Evict models unused for idle_seconds (defaults to the registry setting)"""
+        idle_seconds = self.idle_seconds if idle_seconds is None else idle_seconds
+        if not idle_seconds:
+            return []
+        now = time.time()
+        with self._lock:
+            idle = [entry.name for entry in self._entries.values()
+                    if entry.loaded and entry.last_used and now - entry.last_used >= idle_seconds]
+        return [name for name in idle if self.evict(name)]
+
+    def enforce_budget(self, keep: str = None) -> List[str]:
+        """Evict least recently used models until the estimated total fits the budget"""
+        if not self.memory_budget_mb:
+            return []
+        evicted = []
+        while self.total_memory_mb() > self.memory_budget_mb:
+            with self._lock:
+                candidates = sorted(
+                    (entry for entry in self._entries.values() if entry.loaded and entry.name != keep),
+                    key=lambda entry: entry.last_used or 0
+                )
+            if not candidates:
+                break
+            if self.evict(candidates[0].name):
+                evicted.append(candidates[0].name)
+        return evicted
+
+    def total_memory_mb(self) -> float:
+        with self._lock:
+            return sum(entry.memory_mb or entry.rss_delta_mb or 0
+                       for entry in self._entries.values() if entry.loaded)
+
+    def clear(self):
+        """Evict every model"""
+        with self._lock:
+            names = [name for name, entry in self._entries.items() if entry.loaded]
+        for name in names:
+            self.evict(name)
+
+    def stats(self) -> Dict[str, Any]:
+        """Per-model load time, memory and usage, plus totals"""
+        with self._lock:
+            models = [entry.to_dict() for entry in self._entries.values()]
+        return {
+            'models': models,
+            'loaded_count': sum(1 for model in models if model['loaded']),
+            'total_memory_mb': round(self.total_memory_mb(), 1),
+            'memory_budget_mb': self.memory_budget_mb or None,
+            'total_load_seconds': round(sum(model['load_seconds'] * model['load_count'] for model in models), 2)
+        }
+
+    def log_stats(self):
+        stats = self.stats()
+        logger.info(f"MODEL REGISTRY: {stats['loaded_count']} loaded, ~{stats['total_memory_mb']} MB")
+        for model in stats['models']:
+            logger.info(f"  {model['name']}: loaded={model['loaded']} load={model['load_seconds']}s "
+                        f"mem={model['memory_mb']}MB loads={model['load_count']} hits={model['hits']}")
+
+    @staticmethod
+    def _release_memory():
+        gc.collect()
+        try:
+            import torch
+            if torch.cuda.is_available():
+                torch.cuda.empty_cache()
+        except ImportError:
+            pass
+
+
+def file_model_key(prefix: str, model_path: str) -> str:
+    """
+    Registry key of a model file; includes its mtime so a retrained file is reloaded
+
+    Models loaded from an older version of the same file are evicted when a
+    new mtime is seen, so a retrain does not keep both copies in memory.
+    """
+    path = os.path.abspath(model_path)
+    try:
+        version = int(os.path.getmtime(path))
+    except OSError:
+        version = 0
+    base = f"{prefix}:{path}@"
+    key = f"{base}{version}"
+    get_registry().evict_other_versions(base, key)
+    return key
+
+
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def get_registry() -> ModelRegistry:
+    """Process-wide registry configured from MODEL_MEMORY_BUDGET_MB / MODEL_IDLE_SECONDS"""
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            _registry = ModelRegistry(
+                memory_budget_mb=float(os.getenv("MODEL_MEMORY_BUDGET_MB", "0")),
+                idle_seconds=float(os.getenv("MODEL_IDLE_SECONDS", "0"))
+            )
+        return _registry
@@ -0,0 +1,249 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+PIPELINE SCHEDULER
+Resident, event-driven scheduling of the SPA VIP pipeline phases
+
+Instead of one sequential crawl -> summarize -> sentiment -> timeseries ->
+industry run, every phase runs in its own loop with its own cadence. When a
+phase produces new rows it wakes its downstream phases immediately:
+
+    crawling       --(new articles)-->  summarization
+    summarization  --(new summaries)--> sentiment, industry
+    sentiment      --(new labels)-->    timeseries
+
+A phase that is woken while it is running runs again as soon as it finishes,
+so bursts of upstream work are coalesced into one extra run. Models stay
+loaded in the model registry for the lifetime of the process.
+
+Configuration (environment, minutes):
+    SCHEDULER_CRAWL_MINUTES          default 15
+    SCHEDULER_SUMMARIZATION_MINUTES  default 30
+    SCHEDULER_SENTIMENT_MINUTES      default 30
+    SCHEDULER_INDUSTRY_MINUTES       default 30
+    SCHEDULER_TIMESERIES_MINUTES     default 360
+
+Usage:
+    python main.py --scheduler
+
+Author: SPA VIP Team
+Date: August 12, 2025
+"""
+
+import os
+import time
+import logging
+import threading
+from typing import Any, Callable, Dict, List
+
+from model_registry import get_registry
+
+logger = logging.getLogger(__name__)
+
+# Fallback cadence per phase (minutes); upstream wake-ups run a phase earlier
+DEFAULT_CADENCES = {
+    'crawling': 15,
+    'summarization': 30,
+    'sentiment': 30,
+    'industry': 30,
+    'timeseries': 360
+}
+
+# Which phases are woken when a phase produces new rows
+PHASE_DOWNSTREAM = {
+    'crawling': ['summarization'],
+    'summarization': ['sentiment', 'industry'],
+    'sentiment': ['timeseries'],
+    'industry': [],
+    'timeseries': []
+}
+
+
+def load_cadences() -> Dict[str, float]:
+    """Phase cadences in minutes, overridable with SCHEDULER_<PHASE>_MINUTES"""
+    return {
+        phase: float(os.getenv(f"SCHEDULER_{phase.upper()}_MINUTES", default))
+        for phase, default in DEFAULT_CADENCES.items()
+    }
+
+
+class PhaseLoop(threading.Thread):
+    """
+    One pipeline phase running on its own thread
+
+    The loop runs the phase, then sleeps until its cadence elapses or an
+    upstream phase calls wake(). The phase callable returns the number of
+    rows it produced; a positive count wakes the downstream loops.
+    """
+
+    def __init__(self, name: str, run_phase: Callable[[], int], cadence_minutes: float,
+                 stop_event: threading.Event):
+        super().__init__(name=f"phase-{name}", daemon=True)
+        self.phase = name
+        self.run_phase = run_phase
+        self.cadence_seconds = cadence_minutes * 60
+        self.stop_event = stop_event
+        self.downstream: List['PhaseLoop'] = []
+        self._wake_event = threading.Event()
+        self._wake_reason = None
+
+        self.runs = 0
+        self.failures = 0
+        self.wakeups = 0
+        self.rows_produced = 0
+        self.last_run_at = None
+        self.last_duration = 0.0
+        self.last_error = None
+
+    def wake(self, reason: str):
+        """Ask the loop to run as soon as it is idle"""
+        self._wake_reason = reason
+        self._wake_event.set()
+
+    def run(self):
+        reason = 'startup'
+        while not self.stop_event.is_set():
+            self._run_once(reason)
+
+            woken = self._wake_event.wait(timeout=self.cadence_seconds)
+            if self.stop_event.is_set():
+                break
+            self._wake_event.clear()
+            if woken:
+                self.wakeups += 1
+                reason = self._wake_reason or 'wake'
+            else:
+                reason = 'cadence'
+
+    def _run_once(self, reason: str):
+        logger.info(f"[{self.phase}] running ({reason})")
+        start = time.time()
+        try:
+            produced = self.run_phase() or 0
+            self.last_error = None
+        except Exception as e:
+            # Phase already logged the failure; retry on the next cadence
+            self.failures += 1
+            self.last_error = str(e)
+            produced = 0
+        self.runs += 1
+        self.last_run_at = time.time()
+        self.last_duration = self.last_run_at - start
+        self.rows_produced += produced
+
+        logger.info(f"[{self.phase}] finished in {self.last_duration:.1f}s, produced {produced} rows")
+        if produced > 0:
+            for loop in self.downstream:
+                loop.wake(f"{produced} new rows from {self.phase}")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'phase': self.phase,
+            'runs': self.runs,
+            'failures': self.failures,
+            'wakeups': self.wakeups,
+            'rows_produced': self.rows_produced,
+            'last_duration': round(self.last_duration, 1),
+            'seconds_since_run': round(time.time() - self.last_run_at, 1) if self.last_run_at else None,
+            'last_error': self.last_error
+        }
+
+
+class PipelineScheduler:
+    """
+    Runs every phase of an SPAVIPPipeline as an independent PhaseLoop
+
+    Usage:
+        scheduler = PipelineScheduler(SPAVIPPipeline(), options)
+        scheduler.run_forever()
+    """
+
+    def __init__(self, pipeline, options: Dict[str, Any] = None, cadences: Dict[str, float] = None,
+                 status_minutes: float = 10):
+        self.pipeline = pipeline
+        self.options = options or {}
+        self.cadences = cadences or load_cadences()
+        self.status_seconds = status_minutes * 60
+        self.stop_event = threading.Event()
+
+        phase_runners = {
+            'crawling': self._run_crawling,
+            'summarization': self._run_summarization,
+            'sentiment': self._run_sentiment,
+            'industry': self._run_industry,
+            'timeseries': self._run_timeseries
+        }
+        self.loops = {
+            phase: PhaseLoop(phase, runner, self.cadences[phase], self.stop_event)
+            for phase, runner in phase_runners.items()
+        }
+        for phase, downstream in PHASE_DOWNSTREAM.items():
+            self.loops[phase].downstream = [self.loops[name] for name in downstream]
+
+    # ============ PHASE ADAPTERS ============
+
+    def _run_crawling(self) -> int:
+        before = self.pipeline.db_manager.get_latest_article_ids()
+        self.pipeline.run_crawling_phase(self.options.get('crawl', {}))
+        after = self.pipeline.db_manager.get_latest_article_ids()
+        return sum(max(0, after.get(table, 0) - before.get(table, 0)) for table in after)
+
+    def _run_summarization(self) -> int:
+        self.pipeline.run_summarization_phase(self.options.get('summarization', {}))
+        return self.pipeline.summarization_results.get('articles_processed', 0)
+
+    def _run_sentiment(self) -> int:
+        self.pipeline.run_sentiment_phase(self.options.get('sentiment', {}))
+        return self.pipeline.sentiment_results.get('dates_processed', 0)
+
+    def _run_industry(self) -> int:
+        self.pipeline.run_industry_phase(self.options.get('industry', {}))
+        return self.pipeline.industry_results.get('articles_processed', 0)
+
+    def _run_timeseries(self) -> int:
+        self.pipeline.run_timeseries_phase(self.options.get('timeseries', {}))
+        return self.pipeline.timeseries_results.get('predictions_made', 0)
+
+    # ============ LIFECYCLE ============
+
+    def start(self):
+        logger.info("STARTING SPA VIP SCHEDULER")
+        for phase, loop in self.loops.items():
+            logger.info(f"   {phase}: every {self.cadences[phase]:.0f} min, wakes {PHASE_DOWNSTREAM[phase] or '-'}")
+            loop.start()
+
+    def stop(self, timeout: float = 30):
+        """Signal every loop to stop and wait for running phases to finish"""
+        logger.info("Stopping scheduler (waiting for running phases)...")
+        self.stop_event.set()
+        for loop in self.loops.values():
+            loop.wake('stop')
+        for loop in self.loops.values():
+            loop.join(timeout)
+
+    def stats(self) -> List[Dict[str, Any]]:
+        return [loop.stats() for loop in self.loops.values()]
+
+    def log_status(self):
+        logger.info("SCHEDULER STATUS:")
+        for stats in self.stats():
+            logger.info(f"   {stats['phase']:<14} runs={stats['runs']} failures={stats['failures']} "
+                        f"wakeups={stats['wakeups']} rows={stats['rows_produced']} "
+                        f"last={stats['last_duration']}s ago={stats['seconds_since_run']}s")
+        registry = get_registry()
+        evicted = registry.evict_idle()
+        if evicted:
+            logger.info(f"Evicted idle models: {', '.join(evicted)}")
+        registry.log_stats()
+
+    def run_forever(self):
+        """Start all loops and block until Ctrl+C"""
+        self.start()
+        try:
+            while not self.stop_event.wait(self.status_seconds):
+                self.log_status()
+        except KeyboardInterrupt:
+            logger.info("Scheduler interrupted by user")
+        finally:
+            self.stop()
+            self.log_status()
@@ -0,0 +1,310 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+INCREMENTAL SENTIMENT UPDATE
+Apply signed deltas to stock sentiment counters
+
+Instead of resetting affected trading days and recounting every article on
+them, each newly labelled (or relabelled) article moves exactly one count:
++1 on its (trading day, label) and -1 on whatever the ledger says it was
+counted under before. The sentiment_ledger table (database/migrations/
+002_sentiment_ledger.sql) records applied entries, so re-running the same
+articles is a no-op. The counter deltas and the ledger entries are written
+by one apply_sentiment_deltas RPC (migrations/005_apply_sentiment_deltas.sql),
+i.e. in one transaction: they are applied together or not at all.
+
+The ledger must be seeded once after a full recalculation
+(seed_sentiment_ledger), otherwise articles counted before the ledger
+existed would be counted again when their label changes.
+
+Author: SPA VIP Team
+Date: August 12, 2025
+"""
+
+import sys
+import os
+from bisect import bisect_left
+from collections import defaultdict
+from typing import Dict, List, Any, Optional, Set
+
+# Add paths for imports
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+sys.path.insert(0, parent_dir)
+
+from database.sentiment_counts import is_missing_rpc_error
+
+LEDGER_TABLE = "sentiment_ledger"
+APPLY_DELTAS_RPC = "apply_sentiment_deltas"
+SENTIMENT_LABELS = ("Positive", "Negative", "Neutral")
+CHUNK_SIZE = 100  # Keep IN (...) filters short enough for the URL
+PAGE_SIZE = 1000
+
+
+def load_trading_days(db_manager, stock_table: str, start_date: str) -> List[str]:
+    """
+    Days of the stock table from start_date onwards, sorted
+
+    Every stock row counts as a trading day, forecast rows without a
+    close_price included: the same rule aggregate_sentiment_for_trading_days
+    (full and 30-day recalculation) uses, so the ledger, the deltas and the
+    recalculated counters always agree on the day an article is counted under.
+
+    Args:
+        db_manager: Database manager instance
+        stock_table: Stock table name (e.g., 'FPT_Stock')
+        start_date: Earliest date needed 'YYYY-MM-DD'
+
+    Returns:
+        Sorted list of trading day strings
+    """
+    trading_days = []
+    offset = 0
+    while True:
+        response = db_manager.client.table(stock_table).select("date")\
+            .gte("date", start_date)\
+            .order("date")\
+            .range(offset, offset + PAGE_SIZE - 1)\
+            .execute()
+        batch = response.data or []
+        trading_days.extend(str(row["date"]) for row in batch)
+        if len(batch) < PAGE_SIZE:
+            break
+        offset += PAGE_SIZE
+    return trading_days
+
+
+def map_to_trading_day(news_date: str, trading_days: List[str]) -> Optional[str]:
+    """
+    Trading day a news date is counted under
+
+    Same day if it is a trading day, otherwise the next trading day; news
+    newer than the last trading day goes to the last trading day.
+    """
+    if not trading_days:
+        return None
+    index = bisect_left(trading_days, news_date)
+    if index < len(trading_days):
+        return trading_days[index]
+    return trading_days[-1]
+
+
+def _fetch_ledger(db_manager, stock_table: str, links: List[str]) -> Dict[str, Dict[str, Any]]:
+    """Ledger entries for the given article links"""
+    entries = {}
+    for i in range(0, len(links), CHUNK_SIZE):
+        chunk = links[i:i + CHUNK_SIZE]
+        response = db_manager.client.table(LEDGER_TABLE)\
+            .select("link, trading_day, label")\
+            .eq("stock_table", stock_table)\
+            .in_("link", chunk)\
+            .execute()
+        for row in response.data or []:
+            entries[row["link"]] = row
+    return entries
+
+
+def _fetch_stock_days(db_manager, stock_table: str, days: List[str]) -> Set[str]:
+    """Which of the given days have a row in the stock table"""
+    existing = set()
+    for i in range(0, len(days), CHUNK_SIZE):
+        chunk = days[i:i + CHUNK_SIZE]
+        response = db_manager.client.table(stock_table)\
+            .select("date")\
+            .in_("date", chunk)\
+            .execute()
+        existing.update(str(row["date"]) for row in response.data or [])
+    return existing
+
+
+def compute_sentiment_deltas(articles: List[Dict[str, Any]], ledger: Dict[str, Dict[str, Any]],
+                             trading_days: List[str], stock_days: Optional[Set[str]] = None):
+    """
+    Signed counter deltas and ledger rows for a batch of labelled articles
+
+    An article is applied as a whole or skipped as a whole: if its new day or
+    the day the ledger counted it under has no stock row (stock_days), neither
+    its decrement nor its increment nor its ledger entry is produced.
+
+    Args:
+        articles: Dicts with 'link', 'date' and 'sentiment'
+        ledger: Existing ledger entries keyed by link
+        trading_days: Sorted trading days
+        stock_days: Days that have a stock row (None = all)
+
+    Returns:
+        Tuple (deltas: {day: {label: delta}}, ledger_rows: [{link, trading_day, label}])
+    """
+    deltas = defaultdict(lambda: defaultdict(int))
+    ledger_rows = {}
+
+    for article in articles:
+        link = article.get("link")
+        label = article.get("sentiment")
+        news_date = str(article.get("date") or "")
+        if not link or label not in SENTIMENT_LABELS or not news_date:
+            continue
+
+        trading_day = map_to_trading_day(news_date, trading_days)
+        if trading_day is None:
+            continue
+
+        previous = ledger_rows.get(link) or ledger.get(link)
+        if previous and previous["trading_day"] == trading_day and previous["label"] == label:
+            continue  # Already counted exactly like this
+        if stock_days is not None and (
+            trading_day not in stock_days or (previous and previous["trading_day"] not in stock_days)
+        ):
+            continue  # Counted again once both rows exist
+
+        if previous:
+            deltas[previous["trading_day"]][previous["label"]] -= 1
+        deltas[trading_day][label] += 1
+        ledger_rows[link] = {"link": link, "trading_day": trading_day, "label": label}
+
+    # Drop days whose deltas cancel out
+    deltas = {
+        day: {label: delta for label, delta in day_deltas.items() if delta}
+        for day, day_deltas in deltas.items()
+    }
+    deltas = {day: day_deltas for day, day_deltas in deltas.items() if day_deltas}
+    return deltas, list(ledger_rows.values())
+
+
+def apply_incremental_sentiment(db_manager, stock_code: str, articles: List[Dict[str, Any]]) -> int:
+    """
+    Apply newly labelled articles to the stock table as counter deltas
+
+    Args:
+        db_manager: Database manager instance
+        stock_code: Stock code (e.g., 'FPT')
+        articles: Dicts with 'link', 'date' and 'sentiment' (from predict_and_update_sentiment)
+
+    Returns:
+        Number of stock rows updated
+    """
+    stock_table = f"{stock_code}_Stock"
+
+    if not articles:
+        print(f"No labelled articles for {stock_code}")
+        return 0
+
+    print(f"\nIncremental sentiment update for {stock_code}: {len(articles)} articles")
+
+    links = sorted({article["link"] for article in articles if article.get("link")})
+    ledger = _fetch_ledger(db_manager, stock_table, links)
+
+    # Trading days needed: from the earliest new or previously counted date
+    candidate_dates = [str(article["date"]) for article in articles if article.get("date")]
+    candidate_dates += [entry["trading_day"] for entry in ledger.values()]
+    if not candidate_dates:
+        return 0
+    trading_days = load_trading_days(db_manager, stock_table, min(candidate_dates))
+
+    # Every day an article would be counted under or removed from
+    days = {map_to_trading_day(str(article["date"]), trading_days) for article in articles if article.get("date")}
+    days.update(entry["trading_day"] for entry in ledger.values())
+    days.discard(None)
+    stock_days = _fetch_stock_days(db_manager, stock_table, sorted(days))
+    for day in sorted(days - stock_days):
+        print(f"No stock row for {day} in {stock_table}, skipping its articles")
+
+    deltas, ledger_rows = compute_sentiment_deltas(articles, ledger, trading_days, stock_days)
+    if not ledger_rows:
+        print(f"No counter changes for {stock_code} (already applied)")
+        return 0
+
+    for day in sorted(deltas):
+        print(f"{day}: " + ", ".join(f"{label} {delta:+d}" for label, delta in sorted(deltas[day].items())))
+
+    # Counters and ledger in one transaction: a failure applies neither
+    try:
+        response = db_manager.client.rpc(APPLY_DELTAS_RPC, {
+            "p_stock_table": stock_table,
+            "p_deltas": [dict(day_deltas, date=day) for day, day_deltas in sorted(deltas.items())],
+            "p_ledger": ledger_rows
+        }).execute()
+    except Exception as e:
+        if is_missing_rpc_error(e):
+            raise RuntimeError(
+                f"{APPLY_DELTAS_RPC} RPC is not installed; apply "
+                "database/migrations/005_apply_sentiment_deltas.sql"
+            ) from e
+        raise
+    updated = int(response.data or 0)
+
+    print(f"Updated {updated} rows in {stock_table} ({len(ledger_rows)} ledger entries)")
+    return updated
+
+
+def seed_sentiment_ledger(db_manager, stock_code: str, start_date: str = "2020-01-01") -> int:
+    """
+    Record every labelled article in the ledger without touching counters
+
+    Run once after a full recalculation (--recalculate-all-stock) so the
+    ledger matches what the stock table already counts; both map news
+    dates with the same trading-day rule (see load_trading_days).
+
+    Args:
+        db_manager: Database manager instance
+        stock_code: Stock code (e.g., 'FPT')
+        start_date: Earliest news date included in the counters
+
+    Returns:
+        Number of ledger entries written
+    """
+    news_table = f"{stock_code}_News"
+    stock_table = f"{stock_code}_Stock"
+
+    trading_days = load_trading_days(db_manager, stock_table, start_date)
+    if not trading_days:
+        print(f"No trading days in {stock_table}")
+        return 0
+
+    written = 0
+    offset = 0
+    while True:
+        response = db_manager.client.table(news_table)\
+            .select("link, date, sentiment")\
+            .gte("date", start_date)\
+            .in_("sentiment", list(SENTIMENT_LABELS))\
+            .order("id")\
+            .range(offset, offset + PAGE_SIZE - 1)\
+            .execute()
+        batch = response.data or []
+
+        ledger_rows = {}
+        for article in batch:
+            trading_day = map_to_trading_day(str(article["date"]), trading_days)
+            if article.get("link") and trading_day:
+                ledger_rows[article["link"]] = {
+                    "stock_table": stock_table,
+                    "link": article["link"],
+                    "trading_day": trading_day,
+                    "label": article["sentiment"]
+                }
+        if ledger_rows:
+            db_manager.client.table(LEDGER_TABLE).upsert(
+                list(ledger_rows.values()), on_conflict="stock_table,link"
+            ).execute()
+            written += len(ledger_rows)
+
+        if len(batch) < PAGE_SIZE:
+            break
+        offset += PAGE_SIZE
+
+    print(f"Seeded {written} ledger entries for {stock_table}")
+    return written
+
+
+def main():
+    """Seed the ledger for all stocks"""
+    from database import SupabaseManager
+
+    db_manager = SupabaseManager()
+    for stock_code in ["FPT", "GAS", "IMP", "VCB"]:
+        seed_sentiment_ledger(db_manager, stock_code)
+
+
+if __name__ == "__main__":
+    main()
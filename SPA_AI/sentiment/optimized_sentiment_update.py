@@ -193,55 +193,28 @@ def get_daily_sentiment_stats(db_manager, news_table: str, trading_day_mapping:
     """
     Get sentiment stats for each specific day (for low-activity stocks)
     """
-    all_sentiment_data = []
-    
+    # Map every news date to the trading day it belongs to
+    news_to_trading_day = {}
     for trading_day, news_dates in trading_day_mapping.items():
         print(f"Processing daily stats for {trading_day} with {len(news_dates)} news dates")
-        
-        try:
-            # Retrieve sentiment for specific news dates (split to avoid query errors)
-            news_date_chunks = [news_dates[i:i+10] for i in range(0, len(news_dates), 10)]
-            chunk_data = []
-            
-            for chunk in news_date_chunks:
-                if len(chunk) == 1:
-                    # Single condition - no need for OR
-                    response = db_manager.client.table(news_table).select("date, sentiment").neq("sentiment", None).neq("sentiment", "").eq("date", chunk[0]).execute()
-                else:
-                    # Multiple conditions - use IN filter instead of OR
-                    response = db_manager.client.table(news_table).select("date, sentiment").neq("sentiment", None).neq("sentiment", "").in_("date", chunk).execute()
-                
-                if response.data:
-                    chunk_data.extend(response.data)
-            
-            if chunk_data:
-                # Assign all sentiment to this trading day
-                for record in chunk_data:
-                    record['trading_day'] = trading_day
-                all_sentiment_data.extend(chunk_data)
-                print(f"Found {len(chunk_data)} sentiment records for {trading_day}")
-            else:
-                print(f"No sentiment data for {trading_day}")
-                
-        except Exception as e:
-            print(f"Error getting sentiment for {trading_day}: {e}")
+        for news_date in news_dates:
+            news_to_trading_day.setdefault(news_date, trading_day)
     
-    if not all_sentiment_data:
+    try:
+        # One server-side aggregation for all news dates
+        daily_counts = db_manager.get_sentiment_daily_counts(news_table, dates=list(news_to_trading_day))
+    except Exception as e:
+        print(f"Error getting daily sentiment counts: {e}")
         return pd.DataFrame()
     
-    # Create DataFrame and group by trading_day
-    sentiment_df = pd.DataFrame(all_sentiment_data)
-    
-    # Add trading_day mapping column
-    sentiment_df['trading_day'] = sentiment_df['date'].apply(
-        lambda date: next((td for td, nd_list in trading_day_mapping.items() if date in nd_list), date)
-    )
+    if not daily_counts:
+        print(f"No sentiment data for affected trading days")
+        return pd.DataFrame()
     
-    # Group by trading_day and count sentiment
-    sentiment_stats = sentiment_df.groupby('trading_day')['sentiment'].value_counts().unstack(fill_value=0)
-    sentiment_stats = sentiment_stats.reindex(columns=['Positive', 'Negative', 'Neutral'], fill_value=0)
-    sentiment_stats = sentiment_stats.reset_index()
-    sentiment_stats.rename(columns={'trading_day': 'date'}, inplace=True)
+    # Sum per-date counts into their trading day
+    counts_df = pd.DataFrame(daily_counts)
+    counts_df['date'] = counts_df['date'].map(lambda date: news_to_trading_day.get(date, date))
+    sentiment_stats = counts_df.groupby('date')[['Positive', 'Negative', 'Neutral']].sum().reset_index()
 
     print(f"Daily sentiment stats completed: {len(sentiment_stats)} trading days")
     return sentiment_stats
@@ -286,32 +259,14 @@ def get_aggregated_sentiment_stats(db_manager, news_table: str, trading_day_mapp
         
         print(f"Checking aggregated sentiment for {len(relevant_dates)} dates in range")
         
-        # Query sentiment data for relevant dates (split into chunks to avoid long OR)
-        all_sentiment_data = []
-        date_chunks = [list(relevant_dates)[i:i+20] for i in range(0, len(relevant_dates), 20)]
-        
-        for chunk in date_chunks:
-            try:
-                if len(chunk) == 1:
-                    response = db_manager.client.table(news_table).select("date, sentiment").neq("sentiment", None).neq("sentiment", "").eq("date", chunk[0]).execute()
-                else:
-                    response = db_manager.client.table(news_table).select("date, sentiment").neq("sentiment", None).neq("sentiment", "").in_("date", chunk).execute()
-                
-                if response.data:
-                    all_sentiment_data.extend(response.data)
-                    print(f"Found {len(response.data)} sentiment records in chunk")
-            except Exception as e:
-                print(f"Error querying chunk: {e}")
+        # Aggregate sentiment for relevant dates on the server (one row per date)
+        daily_counts = db_manager.get_sentiment_daily_counts(news_table, dates=list(relevant_dates))
         
-        if not all_sentiment_data:
+        if not daily_counts:
             print(f"No sentiment data found for relevant dates")
             return pd.DataFrame()
         
-        # Compute sentiment stats by date from all data
-        sentiment_df = pd.DataFrame(all_sentiment_data)
-        sentiment_stats = sentiment_df.groupby('date')['sentiment'].value_counts().unstack(fill_value=0)
-        sentiment_stats = sentiment_stats.reindex(columns=['Positive', 'Negative', 'Neutral'], fill_value=0)
-        sentiment_stats = sentiment_stats.reset_index()
+        sentiment_stats = pd.DataFrame(daily_counts, columns=['date', 'Positive', 'Negative', 'Neutral'])
         
         print(f"Aggregated sentiment stats completed: {len(sentiment_stats)} dates")
         return sentiment_stats
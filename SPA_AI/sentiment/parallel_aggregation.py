@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+PARALLEL SENTIMENT AGGREGATION
+Run per-stock sentiment → stock table aggregation concurrently
+
+Every stock only reads its own *_News table and writes its own *_Stock table,
+and the work is dominated by network round trips, so the stocks can be
+aggregated side by side with a bounded pool. Each worker opens its own
+database manager; results and errors are collected per stock.
+
+Author: SPA VIP Team
+Date: August 12, 2025
+"""
+
+import sys
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
+from typing import Dict, List, Set, Any
+
+# Add paths for imports
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+sys.path.insert(0, parent_dir)
+
+from database import SupabaseManager
+
+AGGREGATION_MODES = ("30day", "optimized", "standard", "incremental")
+
+
+def aggregate_stock_sentiment(mode: str, stock_code: str, updated_dates: Set[str] = None,
+                              recalculate_all: bool = False,
+                              articles: List[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    Aggregate sentiment into one stock table (top-level so it can run in a process pool)
+
+    Args:
+        mode: '30day', 'optimized', 'standard' or 'incremental'
+        stock_code: Stock code (e.g., 'FPT')
+        updated_dates: Dates with new predictions
+        recalculate_all: Full recalculation (standard mode only)
+        articles: Newly labelled articles (incremental mode only)
+
+    Returns:
+        Dict with stock_code, status, updated_count, duration and error
+    """
+    start = time.time()
+    result = {
+        'stock_code': stock_code,
+        'mode': mode,
+        'status': 'success',
+        'updated_count': 0,
+        'error': None
+    }
+
+    db_manager = None
+    try:
+        db_manager = SupabaseManager()
+        if mode == "30day":
+            from sentiment.reset_aggregate_sentiment_30days import aggregate_sentiment_30days
+            updated_count = aggregate_sentiment_30days(db_manager, stock_code)
+            if updated_count < 0:
+                result['status'] = 'error'
+                result['error'] = 'No sentiment or trading data in window'
+            else:
+                result['updated_count'] = updated_count
+        else:
+            if mode == "optimized":
+                from sentiment.optimized_sentiment_update import optimized_process_sentiment_to_stock
+                updated_count = optimized_process_sentiment_to_stock(db_manager, stock_code, set(updated_dates or ()))
+            elif mode == "incremental":
+                from sentiment.incremental_sentiment_update import apply_incremental_sentiment
+                updated_count = apply_incremental_sentiment(db_manager, stock_code, articles or [])
+            elif mode == "standard":
+                from sentiment.predict_sentiment_db import process_sentiment_to_stock
+                updated_count = process_sentiment_to_stock(db_manager, stock_code, set(updated_dates or ()), recalculate_all)
+            else:
+                raise ValueError(f"Unknown aggregation mode: {mode}")
+            result['updated_count'] = updated_count or 0
+
+    except Exception as e:
+        result['status'] = 'error'
+        result['error'] = str(e)
+    finally:
+        if db_manager is not None:
+            try:
+                db_manager.close_connections()
+            except Exception:
+                pass
+
+    result['duration'] = time.time() - start
+    return result
+
+
+def run_parallel_stock_aggregation(stock_updates: Dict[str, Set[str]], mode: str = "standard",
+                                   max_workers: int = 4, use_processes: bool = False,
+                                   recalculate_all: bool = False,
+                                   stock_articles: Dict[str, List[Dict[str, Any]]] = None) -> List[Dict[str, Any]]:
+    """
+    Aggregate sentiment for several stocks with a bounded pool
+
+    Args:
+        stock_updates: Dict mapping stock code → set of updated dates
+        mode: Aggregation mode (see AGGREGATION_MODES)
+        max_workers: Pool size (1 runs serially in the calling thread)
+        use_processes: Use a process pool instead of threads
+        recalculate_all: Full recalculation (standard mode only)
+        stock_articles: Dict mapping stock code → labelled articles (incremental mode only)
+
+    Returns:
+        List of per-stock result dictionaries (in stock_updates order)
+    """
+    if mode not in AGGREGATION_MODES:
+        raise ValueError(f"Unknown aggregation mode: {mode}")
+
+    stock_codes = list(stock_updates.keys())
+    if not stock_codes:
+        return []
+
+    max_workers = max(1, min(max_workers, len(stock_codes)))
+    print(f"Aggregating sentiment for {stock_codes} ({mode} mode, {max_workers} workers)")
+
+    stock_articles = stock_articles or {}
+
+    if max_workers == 1:
+        results = [
+            aggregate_stock_sentiment(mode, code, stock_updates[code], recalculate_all, stock_articles.get(code))
+            for code in stock_codes
+        ]
+    else:
+        executor_class = ProcessPoolExecutor if use_processes else ThreadPoolExecutor
+        results_by_code = {}
+        with executor_class(max_workers=max_workers) as executor:
+            futures = {
+                executor.submit(
+                    aggregate_stock_sentiment, mode, code, stock_updates[code], recalculate_all, stock_articles.get(code)
+                ): code
+                for code in stock_codes
+            }
+            for future in as_completed(futures):
+                code = futures[future]
+                try:
+                    results_by_code[code] = future.result()
+                except Exception as e:
+                    # Worker crashed before it could report (e.g. pickling or pool failure)
+                    results_by_code[code] = {
+                        'stock_code': code,
+                        'mode': mode,
+                        'status': 'error',
+                        'updated_count': 0,
+                        'error': str(e),
+                        'duration': 0.0
+                    }
+        results = [results_by_code[code] for code in stock_codes]
+
+    for result in results:
+        if result['status'] == 'success':
+            print(f"{result['stock_code']}: updated {result['updated_count']} records ({result['duration']:.1f}s)")
+        else:
+            print(f"{result['stock_code']}: FAILED - {result['error']}")
+
+    return results
@@ -6,6 +6,7 @@ from tqdm import tqdm
 import time
 import sys
 import os
+import json
 
 # Add paths for centralized database import
 current_dir = os.path.dirname(os.path.abspath(__file__))
@@ -14,6 +15,8 @@ sys.path.insert(0, parent_dir)
 
 # Import centralized database system
 from database import SupabaseManager, DatabaseConfig
+from model_registry import get_registry
+from telemetry import timer, count
 
 
 # ====================== 1. Define model ======================
@@ -48,8 +51,11 @@ def load_sentiment_model():
     
     return model, tokenizer, id2label
 
-# Initialize model globally (will be loaded when needed)
-model, tokenizer, id2label = None, None, None
+SENTIMENT_MODEL_NAME = "sentiment_phobert"
+
+def get_sentiment_model():
+    """(model, tokenizer, id2label), loaded once per process through the model registry"""
+    return get_registry().get_or_load(SENTIMENT_MODEL_NAME, load_sentiment_model)
 
 # ====================== 3. Database Manager ======================
 def get_database_manager():
@@ -75,17 +81,141 @@ def update_sentiment_in_db(db_manager, table_name, link, sentiment):
         print(f"Error updating sentiment: {e}")
         return False
 
+def bulk_update_sentiment_labels(db_manager, table_name, labels, key_column="id", chunk_size=None):
+    """
+    Write many sentiment labels with a few requests
+    
+    Pairs are grouped by label and each group is updated with in_() over
+    chunks of keys. Rows that already carry the label are filtered out in
+    the same request, so only rows that really changed are returned.
+    
+    Args:
+        db_manager: Database manager instance
+        table_name: News table name
+        labels: Iterable of (key, label) pairs, key being an id or a link
+        key_column: 'id' or 'link'
+        chunk_size: Keys per request (defaults to 500 ids / 50 links to keep URLs short)
+        
+    Returns:
+        Dict mapping key -> True if the row changed, False if it already had the
+        label, None if the request writing it failed
+    """
+    if chunk_size is None:
+        chunk_size = 500 if key_column == "id" else 50
+    
+    keys_by_label = {}
+    for key, label in labels:
+        keys_by_label.setdefault(label, []).append(key)
+    
+    results = {key: False for keys in keys_by_label.values() for key in keys}
+    request_count = 0
+    for label, keys in keys_by_label.items():
+        for i in range(0, len(keys), chunk_size):
+            chunk = keys[i:i + chunk_size]
+            try:
+                with timer("db_write", op="sentiment_labels", table=table_name):
+                    response = db_manager.client.table(table_name).update({
+                        "sentiment": label
+                    }).in_(key_column, chunk).or_(f"sentiment.is.null,sentiment.neq.{label}").execute()
+                request_count += 1
+                for row in response.data or []:
+                    if row.get(key_column) is not None:
+                        results[type(chunk[0])(row[key_column])] = True
+            except Exception as e:
+                print(f"Error updating {len(chunk)} '{label}' labels in {table_name}: {e}")
+                count("db_errors", op="sentiment_labels")
+                for key in chunk:
+                    results[key] = None
+    
+    changed = sum(1 for value in results.values() if value)
+    print(f"Bulk label write: {changed}/{len(results)} rows changed in {table_name} ({request_count} requests)")
+    return results
+
 # ====================== 5. Read data from DB ======================
+UNLABELLED_COLUMNS = "id, link, ai_summary, date, sentiment"
+CHECKPOINT_DIR = os.environ.get(
+    "SENTIMENT_CHECKPOINT_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "logs", "checkpoints")
+)
+
+def _checkpoint_path(table_name):
+    return os.path.join(CHECKPOINT_DIR, f"sentiment_{table_name}.json")
+
+def load_checkpoint(table_name):
+    """Last id processed by an interrupted run over table_name (0 if none)"""
+    try:
+        with open(_checkpoint_path(table_name), "r", encoding="utf-8") as f:
+            return int(json.load(f).get("last_id", 0))
+    except (OSError, ValueError):
+        return 0
+
+def save_checkpoint(table_name, last_id):
+    """Record the last id whose batch was classified and written"""
+    os.makedirs(CHECKPOINT_DIR, exist_ok=True)
+    path = _checkpoint_path(table_name)
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump({"last_id": int(last_id), "saved_at": time.strftime("%Y-%m-%d %H:%M:%S")}, f)
+    os.replace(path + ".tmp", path)
+
+def clear_checkpoint(table_name):
+    """Forget the checkpoint once a run reached the end of the table"""
+    try:
+        os.remove(_checkpoint_path(table_name))
+    except OSError:
+        pass
+
+def iter_unlabelled_articles(db_manager, table_name, batch_size=256, start_after_id=0):
+    """
+    Keyset-paginated reader of articles without sentiment
+    
+    Pages are fetched with id > last_id ORDER BY id LIMIT batch_size, so
+    memory stays constant and PostgREST's row cap never truncates the scan.
+    With USE_WORK_QUEUE the batches are claimed from the work queue instead
+    (start_after_id is then ignored).
+    
+    Args:
+        db_manager: Database manager instance
+        table_name: News table name
+        batch_size: Rows per page
+        start_after_id: Resume after this id
+        
+    Yields:
+        Lists of row dicts (id, link, ai_summary, date, sentiment)
+    """
+    if db_manager.uses_work_queue():
+        # Claimed from pipeline_queue: labelled rows leave the queue, so claim until it is empty
+        while True:
+            batch = db_manager.claim_pending_articles(
+                "sentiment", UNLABELLED_COLUMNS, table_name, batch_size,
+                keep=lambda row: bool((row.get("ai_summary") or "").strip())
+            )
+            if batch is None:
+                # Queue not installed: fall back to the scan below
+                break
+            if not batch:
+                return
+            yield batch
+
+    last_id = start_after_id
+    while True:
+        with timer("db_fetch", op="unlabelled", table=table_name):
+            response = db_manager.client.table(table_name).select(UNLABELLED_COLUMNS).neq(
+                "ai_summary", ""
+            ).or_("sentiment.is.null,sentiment.eq.").gt("id", last_id).order("id").limit(batch_size).execute()
+        batch = response.data or []
+        if not batch:
+            return
+        yield batch
+        last_id = batch[-1]["id"]
+        if len(batch) < batch_size:
+            return
+
 def get_data_from_db(db_manager, table_name):
     """Get data using centralized database manager - only rows without sentiment"""
     try:
-        # Only get records where sentiment is NULL or empty AND ai_summary is not empty
-        response = db_manager.client.table(table_name).select("link, ai_summary, date, sentiment").neq("ai_summary", "").or_("sentiment.is.null,sentiment.eq.").execute()
-        
-        if response.data:
-            df = pd.DataFrame(response.data)
-            # Filter out records that already have sentiment
-            df = df[(df['sentiment'].isna()) | (df['sentiment'] == '') | (df['sentiment'].isnull())]
+        rows = [row for batch in iter_unlabelled_articles(db_manager, table_name, batch_size=1000) for row in batch]
+        if rows:
+            df = pd.DataFrame(rows)
             print(f"Loaded {len(df)} rows from {table_name} (only records without sentiment)")
             return df
         else:
@@ -96,70 +226,134 @@ def get_data_from_db(db_manager, table_name):
         return pd.DataFrame()
 
 # ====================== 6. Predict and update DB ======================
-def predict_and_update_sentiment(db_manager, table_name):
-    """Predict sentiment and update database using centralized system"""
-    global model, tokenizer, id2label
-    
-    # Load model if not already loaded
-    if model is None:
-        print("Loading sentiment analysis model...")
-        model, tokenizer, id2label = load_sentiment_model()
-        print("Sentiment model loaded successfully")
-    
-    # Get data from database
-    df = get_data_from_db(db_manager, table_name)
-    if df.empty:
-        print(f"No articles to process in {table_name}")
-        return set()
-
-    updated_dates = set()
-    count = 0
-    start_time = None
-    successful_updates = 0
-
-    print(f"Starting sentiment analysis for {len(df)} articles in {table_name}...")
-
-    for i, row in tqdm(df.iterrows(), total=len(df), desc=f"Processing {table_name}"):
-        text = row["ai_summary"] if pd.notna(row["ai_summary"]) else ""
-        if not text.strip():
-            continue
-
-        if count == 0:
-            start_time = time.time()
-
-        # Tokenize and predict
+def classify_texts(texts, max_length=256):
+    """
+    Classify a batch of summaries in one forward pass
+    
+    Args:
+        texts: List of non-empty strings
+        max_length: Token truncation length
+        
+    Returns:
+        List of labels ('Positive' / 'Negative' / 'Neutral')
+    """
+    model, tokenizer, id2label = get_sentiment_model()
+    
+    with timer("tokenize", model="sentiment"):
         inputs = tokenizer(
-            text,
+            texts,
             return_tensors="pt",
             padding=True,
             truncation=True,
-            max_length=256
+            max_length=max_length
+        )
+    with torch.no_grad(), timer("model_forward", model="sentiment"):
+        outputs = model(
+            input_ids=inputs["input_ids"],
+            attention_mask=inputs["attention_mask"]
         )
+    count("items", len(texts), stage="sentiment")
+    return [id2label[index] for index in torch.argmax(outputs, dim=1).tolist()]
 
-        with torch.no_grad():
-            outputs = model(
-                input_ids=inputs["input_ids"],
-                attention_mask=inputs["attention_mask"]
-            )
-            predicted_class = torch.argmax(outputs, dim=1).item()
+def predict_and_update_sentiment(db_manager, table_name, labelled_articles=None, batch_size=256,
+                                 model_batch_size=32, resume=True):
+    """
+    Predict sentiment and update database using centralized system
+    
+    Unlabelled rows are streamed in id order batch_size at a time, classified
+    model_batch_size texts per forward pass and written back with one bulk
+    request per label. After each written batch the last id is checkpointed,
+    so an interrupted run resumes where it stopped; the checkpoint is cleared
+    when the table has been scanned to the end. Once a write fails the
+    checkpoint stops just before the first failed id, so the next run
+    retries it.
+    
+    Args:
+        db_manager: Database manager instance
+        table_name: News table name
+        labelled_articles: Optional list collecting {link, date, sentiment} of updated
+                           articles (used by the incremental stock update)
+        batch_size: Rows fetched and written per batch
+        model_batch_size: Texts per model forward pass
+        resume: Start after the checkpointed id of an interrupted run
+    """
+    # Queue leases already make an interrupted run resumable
+    use_queue = db_manager.uses_work_queue()
+    start_after_id = load_checkpoint(table_name) if resume and not use_queue else 0
+    if start_after_id:
+        print(f"Resuming {table_name} after id {start_after_id}")
 
-        sentiment = id2label[predicted_class]
-        
-        # Update database
-        if update_sentiment_in_db(db_manager, table_name, row["link"], sentiment):
+    updated_dates = set()
+    processed = 0
+    successful_updates = 0
+    failed_writes = 0
+    # Cleared by the first failed write; later batches must not move the checkpoint past it
+    checkpoint_open = not use_queue
+    start_time = time.time()
+
+    print(f"Starting sentiment analysis for {table_name}...")
+    progress = tqdm(desc=f"Processing {table_name}", unit="article")
+
+    for batch in iter_unlabelled_articles(db_manager, table_name, batch_size, start_after_id):
+        rows = [row for row in batch if (row.get("ai_summary") or "").strip()]
+        labels = []
+        try:
+            for i in range(0, len(rows), model_batch_size):
+                labels.extend(classify_texts([row["ai_summary"] for row in rows[i:i + model_batch_size]]))
+        except Exception:
+            # Hand the claimed batch back instead of leaving it leased until the lease expires
+            db_manager.release_claimed_articles("sentiment", rows)
+            raise
+
+        written = bulk_update_sentiment_labels(
+            db_manager, table_name,
+            [(row["id"], sentiment) for row, sentiment in zip(rows, labels)],
+            key_column="id"
+        )
+        for row, sentiment in zip(rows, labels):
+            # Only rows whose label actually changed trigger stock recalculation
+            if not written.get(row["id"]):
+                continue
             successful_updates += 1
-            
-            # Track updated dates
-            if "date" in row and pd.notna(row["date"]):
+            if row.get("date"):
                 updated_dates.add(str(row["date"]))
+                if labelled_articles is not None:
+                    labelled_articles.append({
+                        "link": row["link"],
+                        "date": str(row["date"]),
+                        "sentiment": sentiment
+                    })
+
+        failed_rows = [row for row in rows if written.get(row["id"]) is None]
+        failed_ids = [row["id"] for row in failed_rows]
+        failed_writes += len(failed_ids)
+        db_manager.release_claimed_articles("sentiment", failed_rows)
+        if checkpoint_open:
+            if failed_ids:
+                first_failed = min(failed_ids)
+                done_ids = [row["id"] for row in batch if row["id"] < first_failed]
+                if done_ids:
+                    save_checkpoint(table_name, done_ids[-1])
+                checkpoint_open = False
+            else:
+                save_checkpoint(table_name, batch[-1]["id"])
+        processed += len(batch)
+        progress.update(len(batch))
+
+    progress.close()
+    if failed_writes:
+        print(f"{failed_writes} label writes failed in {table_name}; checkpoint kept before the first failure")
+    else:
+        clear_checkpoint(table_name)
 
-        count += 1
-        if count == 10:
-            elapsed = time.time() - start_time
-            print(f"Performance: {elapsed:.2f}s for 10 articles ({elapsed/10:.3f}s/article)")
+    if processed == 0:
+        print(f"No articles to process in {table_name}")
+        return set()
 
+    elapsed = time.time() - start_time
+    print(f"Performance: {elapsed:.2f}s for {processed} articles ({elapsed / processed:.3f}s/article)")
     print(f"Sentiment analysis completed for {table_name}!")
-    print(f"Successfully updated: {successful_updates}/{len(df)} articles")
+    print(f"Successfully updated: {successful_updates}/{processed} articles")
     return updated_dates
 
 # ====================== 7. Sentiment Statistics Functions ======================
@@ -167,6 +361,9 @@ def get_sentiment_stats_by_date(db_manager, news_table, dates=None):
     """
     Calculate sentiment statistics by date from news table
     
+    The group-by runs in Postgres (sentiment_daily_counts RPC), so only one
+    row per date is transferred instead of every classified article.
+    
     Args:
         db_manager: Database manager instance
         news_table: Name of the news table (e.g., 'FPT_News')
@@ -176,43 +373,28 @@ def get_sentiment_stats_by_date(db_manager, news_table, dates=None):
         DataFrame with columns: date, Positive, Negative, Neutral
     """
     try:
-        # Build query - get ALL sentiment data from 2020 onwards only
-        query = db_manager.client.table(news_table).select("date, sentiment").neq("sentiment", "").neq("sentiment", None).gte("date", "2020-01-01")
-        
         print(f"Processing sentiment data from 2020-01-01 onwards only")
         
         # If specific dates provided, only process those dates
         # If not, process all dates that have sentiment data (from 2020+)
+        date_list = None
         if dates:
-            # Filter by specific dates but still maintain 2020+ filter
-            date_list = list(dates) if isinstance(dates, set) else dates
             # Only include dates from 2020 onwards
-            date_list = [d for d in date_list if d >= "2020-01-01"]
-            if date_list:
-                query = query.in_("date", date_list)
-            else:
+            date_list = [d for d in dates if d >= "2020-01-01"]
+            if not date_list:
                 print(f"No dates from 2020+ to process")
                 return pd.DataFrame()
         
-        response = query.execute()
+        rows = db_manager.get_sentiment_daily_counts(news_table, start_date="2020-01-01", dates=date_list)
         
-        if not response.data:
+        if not rows:
             print(f"No sentiment data found in {news_table}")
             return pd.DataFrame()
         
-        df = pd.DataFrame(response.data)
-        
-        # Group by date and count sentiments
-        sentiment_stats = df.groupby(['date', 'sentiment']).size().unstack(fill_value=0)
-        sentiment_stats = sentiment_stats.reset_index()
-        
-        # Ensure all sentiment columns exist
-        for sentiment in ['Positive', 'Negative', 'Neutral']:
-            if sentiment not in sentiment_stats.columns:
-                sentiment_stats[sentiment] = 0
+        sentiment_stats = pd.DataFrame(rows, columns=['date', 'Positive', 'Negative', 'Neutral'])
         
         print(f"Calculated sentiment stats for {len(sentiment_stats)} dates in {news_table}")
-        return sentiment_stats[['date', 'Positive', 'Negative', 'Neutral']]
+        return sentiment_stats
         
     except Exception as e:
         print(f"Error calculating sentiment stats for {news_table}: {e}")
@@ -629,7 +811,8 @@ def process_sentiment_to_stock(db_manager, stock_code, updated_dates=None, recal
     print(f"Completed sentiment processing for {stock_code}")
     return updated_count
 
-def run_sentiment_analysis_pipeline(table_names=None, update_stock_tables=True, recalculate_all_stock=False):
+def run_sentiment_analysis_pipeline(table_names=None, update_stock_tables=True, recalculate_all_stock=False,
+                                    stock_workers=1, use_processes=False, return_stock_results=False):
     """
     Run the sentiment analysis pipeline for specified tables.
     
@@ -637,6 +820,9 @@ def run_sentiment_analysis_pipeline(table_names=None, update_stock_tables=True,
         table_names: List of table names to process. If None, process all news tables.
         update_stock_tables: Whether to update stock tables with sentiment statistics
         recalculate_all_stock: If True, recalculate sentiment stats for all dates in stock tables
+        stock_workers: Number of stocks aggregated concurrently in Phase 2 (1 = serial)
+        use_processes: Use a process pool instead of threads for Phase 2
+        return_stock_results: If True, return (updated_dates, per-stock results)
     """
     if table_names is None:
         # Default: process all stock news tables
@@ -650,6 +836,7 @@ def run_sentiment_analysis_pipeline(table_names=None, update_stock_tables=True,
     db_manager = get_database_manager()
     total_updated_dates = set()
     stock_updates = {}
+    stock_results = []
     
     # Phase 1: Predict sentiment and update news tables (only for records without sentiment)
     for table_name in table_names:
@@ -678,18 +865,24 @@ def run_sentiment_analysis_pipeline(table_names=None, update_stock_tables=True,
             if table_name.endswith("_News") and table_name != "General_News":
                 all_stock_codes.add(table_name.replace("_News", ""))
         
-        for stock_code in all_stock_codes:
-            try:
-                updated_dates = stock_updates.get(stock_code, set())
-                
-                # If recalculate_all_stock or there were new predictions, update stock table
-                if recalculate_all_stock or updated_dates:
-                    process_sentiment_to_stock(db_manager, stock_code, updated_dates, recalculate_all_stock)
-                else:
-                    print(f"Skipping {stock_code} - no new predictions")
-                    
-            except Exception as e:
-                print(f"Error updating stock table for {stock_code}: {e}")
+        # If recalculate_all_stock or there were new predictions, update stock table
+        stock_jobs = {}
+        for stock_code in sorted(all_stock_codes):
+            updated_dates = stock_updates.get(stock_code, set())
+            if recalculate_all_stock or updated_dates:
+                stock_jobs[stock_code] = updated_dates
+            else:
+                print(f"Skipping {stock_code} - no new predictions")
+        
+        # Each stock touches only its own tables, so aggregate them concurrently
+        from sentiment.parallel_aggregation import run_parallel_stock_aggregation
+        stock_results = run_parallel_stock_aggregation(
+            stock_jobs,
+            mode="standard",
+            max_workers=stock_workers,
+            use_processes=use_processes,
+            recalculate_all=recalculate_all_stock
+        )
     
     # Close database connections
     db_manager.close_connections()
@@ -698,6 +891,8 @@ def run_sentiment_analysis_pipeline(table_names=None, update_stock_tables=True,
     print(f"Total dates updated: {len(total_updated_dates)}")
     if update_stock_tables:
         print(f"Stock tables processed: {list(stock_updates.keys())}")
+    if return_stock_results:
+        return total_updated_dates, stock_results
     return total_updated_dates
 
 def main_predict_sentiment_and_update_stock():
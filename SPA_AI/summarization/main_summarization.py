@@ -8,6 +8,7 @@ from tqdm import tqdm
 # Import centralized database system
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from database import SupabaseManager, DatabaseConfig
+from model_registry import get_registry
 
 # Wrapper class for backward compatibility
 class SupabaseHandler:
@@ -15,14 +16,18 @@ class SupabaseHandler:
         self.db_manager = SupabaseManager()
         self.config = DatabaseConfig()
     
-    def fetch_unsummarized_articles(self, limit=100, table_name=None):
-        return self.db_manager.fetch_unsummarized_articles(table_name, limit)
+    def fetch_unsummarized_articles(self, limit=100, table_name=None, claim=True):
+        return self.db_manager.fetch_unsummarized_articles(table_name, limit, claim)
     
     def update_summary(self, article_id, summary, table_name):
         return self.db_manager.update_article_summary(article_id, summary, table_name)
     
-    def get_table_stats(self):
-        return self.db_manager.get_table_stats()
+    def get_table_stats(self, max_age=None):
+        return self.db_manager.get_table_stats(max_age)
+    
+    def release_articles(self, articles):
+        """Hand work-queue claims of articles that were not summarized back to the queue"""
+        return self.db_manager.release_claimed_articles("summarize", articles)
 
 from models.summarizer import NewsSummarizer
 
@@ -40,12 +45,19 @@ from utils.helpers import measure_performance
 # Import table names from centralized config
 TABLE_NAMES = DatabaseConfig().get_all_news_tables()
 
+def load_summarizer(use_map_reduce=True):
+    """Summarizer shared through the model registry (loaded once per process)"""
+    return get_registry().get_or_load(
+        f"summarizer(map_reduce={use_map_reduce})",
+        lambda: NewsSummarizer(use_map_reduce=use_map_reduce)
+    )
+
 class SummarizationPipeline:
     """Enhanced pipeline with Map-Reduce support for batch processing news"""
     
     def __init__(self, use_map_reduce=True):
         self.db = SupabaseHandler()
-        self.summarizer = None  # Lazy loading to save memory
+        self._summarizer_map_reduce = None  # Lazy loading to save memory
         self.use_map_reduce = use_map_reduce
         self.start_time = None
         self.processed_count = 0
@@ -58,12 +70,21 @@ class SummarizationPipeline:
         # Log table statistics
         self.log_table_stats()
     
+    @property
+    def summarizer(self):
+        """Summarizer from the model registry (None until _load_model); not held, so eviction frees it"""
+        if self._summarizer_map_reduce is None:
+            return None
+        return load_summarizer(self._summarizer_map_reduce)
+    
     def _load_model(self, use_map_reduce=None):
         """Lazy load model with Map-Reduce option"""
-        if self.summarizer is None:
+        if self._summarizer_map_reduce is None:
             logger.info("Loading AI model...")
             map_reduce_enabled = use_map_reduce if use_map_reduce is not None else self.use_map_reduce
-            self.summarizer = NewsSummarizer(use_map_reduce=map_reduce_enabled)
+            # Shared per process: repeated pipeline cycles reuse the warm model
+            load_summarizer(map_reduce_enabled)
+            self._summarizer_map_reduce = map_reduce_enabled
             logger.info("Model loaded and ready")
             
             # Log configuration
@@ -157,6 +178,7 @@ class SummarizationPipeline:
             try:
                 summaries = self.summarizer.summarize_batch(contents)
                 success_count = 0
+                failed = []
                 
                 for article, summary in zip(articles, summaries):
                     if summary and self.db.update_summary(
@@ -165,12 +187,16 @@ class SummarizationPipeline:
                         article["table_name"]
                     ):
                         success_count += 1
+                    else:
+                        failed.append(article)
+                self.db.release_articles(failed)
                         
                 logger.info(f"Successfully processed {success_count}/{len(articles)} articles")
                 total_success += success_count
                 
             except Exception as e:
                 logger.error(f"Batch processing failed: {str(e)}")
+                self.db.release_articles(articles)
                 break
                 
         return total_success
@@ -192,9 +218,14 @@ class SummarizationPipeline:
                     break
                     
                 contents = [article["content"] for article in articles]
-                summaries = self.summarizer.summarize_batch(contents)
+                try:
+                    summaries = self.summarizer.summarize_batch(contents)
+                except Exception:
+                    self.db.release_articles(articles)
+                    raise
                 
                 batch_processed = 0
+                failed = []
                 for article, summary in zip(articles, summaries):
                     if summary and self.db.update_summary(
                         article["id"], 
@@ -202,6 +233,9 @@ class SummarizationPipeline:
                         article["table_name"]
                     ):
                         batch_processed += 1
+                    else:
+                        failed.append(article)
+                self.db.release_articles(failed)
                 
                 total_processed += batch_processed
                 pbar.update(batch_processed)
@@ -220,8 +254,8 @@ class SummarizationPipeline:
         # Load model before starting
         self._load_model()
         
-        # Get initial stats
-        initial_stats = self.db.get_table_stats().get(table_name, {})
+        # Get initial stats (fresh: decides whether there is work)
+        initial_stats = self.db.get_table_stats(max_age=0).get(table_name, {})
         total_to_process = initial_stats.get('unsummarized', 0)
         
         if total_to_process == 0:
@@ -264,6 +298,7 @@ class SummarizationPipeline:
                     # Database updates
                     logger.info("Saving to database...")
                     batch_processed = 0
+                    failed = []
                     for article, summary in zip(articles, summaries):
                         if summary and self.db.update_summary(
                             article["id"], 
@@ -271,6 +306,9 @@ class SummarizationPipeline:
                             article["table_name"]
                         ):
                             batch_processed += 1
+                        else:
+                            failed.append(article)
+                    self.db.release_articles(failed)
                     
                     # Update counters
                     total_processed += batch_processed
@@ -295,6 +333,7 @@ class SummarizationPipeline:
                 
                 except Exception as e:
                     logger.error(f"BATCH {batch_count} ERROR: {str(e)}")
+                    self.db.release_articles(articles)
                     logger.info("Continuing to next batch...")
                     continue
         
@@ -314,13 +353,17 @@ class SummarizationPipeline:
         
         return total_processed
 
-    def process_all_tables_by_priority(self):
-        """Process all tables in priority order with enhanced tracking"""
+    def process_all_tables_by_priority(self) -> int:
+        """Process all tables in priority order with enhanced tracking
+        
+        Returns:
+            Number of articles summarized across all tables
+        """
         try:
             logger.info("Starting priority-based processing pipeline...")
             
             # Get table statistics and calculate priority
-            stats = self.db.get_table_stats()
+            stats = self.db.get_table_stats(max_age=0)
             table_priorities = []
             
             for table_name, table_stats in stats.items():
@@ -341,7 +384,7 @@ class SummarizationPipeline:
             
             if not table_priorities:
                 logger.info("All tables are already fully processed!")
-                return
+                return 0
             
             total_articles_to_process = sum(t['unsummarized'] for t in table_priorities)
             total_eta_minutes = total_articles_to_process * 11 / 60  # Improved estimate
@@ -397,6 +440,8 @@ class SummarizationPipeline:
             logger.info(f"   Tables completed: {len(table_priorities)}")
             logger.info("=" * 50)
             
+            return total_processed_all
+            
         except Exception as e:
             logger.error(f"Error in priority processing: {str(e)}")
             raise
@@ -417,8 +462,8 @@ class SummarizationPipeline:
         for table_name in TABLE_NAMES:
             logger.info(f"\nAnalyzing {table_name}...")
             
-            # Get sample of articles
-            articles = self.db.fetch_unsummarized_articles(limit=100, table_name=table_name)
+            # Get sample of articles (read only: nothing is claimed from the work queue)
+            articles = self.db.fetch_unsummarized_articles(limit=100, table_name=table_name, claim=False)
             if not articles:
                 logger.info(f"   No articles to analyze in {table_name}")
                 continue
@@ -16,6 +16,7 @@ Config = config_module.Config
  # Import logger using absolute import
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from utils.logger import logger
+from telemetry import timer, count
 from typing import List
 from tqdm import tqdm
 
@@ -168,15 +169,16 @@ class NewsSummarizer:
         try:
             input_text = "summarize: " + text.strip()
             
-            inputs = self.tokenizer(
-                input_text,
-                return_tensors="pt",
-                max_length=Config.MAX_INPUT_LENGTH,
-                truncation=True,
-                padding="max_length"
-            ).to(self.device)
+            with timer("tokenize", model="summarizer"):
+                inputs = self.tokenizer(
+                    input_text,
+                    return_tensors="pt",
+                    max_length=Config.MAX_INPUT_LENGTH,
+                    truncation=True,
+                    padding="max_length"
+                ).to(self.device)
             
-            with torch.no_grad():
+            with torch.no_grad(), timer("model_generate", model="summarizer", mode="single"):
                 outputs = self.model.generate(
                     **inputs,
                     **Config.get_generation_config()
@@ -213,6 +215,8 @@ class NewsSummarizer:
                 short_indices.append(i)
         
         logger.info(f"Batch analysis: {len(long_texts)} long texts, {len(short_texts)} short texts")
+        count("items", len(texts), stage="summarize")
+        count("long_texts", len(long_texts), stage="summarize")
         
         # Initialize results array
         results = [""] * len(texts)
@@ -227,6 +231,7 @@ class NewsSummarizer:
                     logger.info(f"Completed long text {i+1}/{len(long_texts)}")
                 except Exception as e:
                     logger.warning(f"Map-Reduce failed for text {i+1}, using standard: {e}")
+                    count("retries", stage="summarize", reason="map_reduce_fallback")
                     results[long_indices[i]] = self._standard_summarize(text)
         
         # Process short texts in batch
@@ -238,6 +243,7 @@ class NewsSummarizer:
                     results[short_indices[i]] = result
             except Exception as e:
                 logger.warning(f"Batch processing failed, falling back to sequential: {e}")
+                count("retries", stage="summarize", reason="batch_fallback")
                 for i, text in enumerate(short_texts):
                     results[short_indices[i]] = self._standard_summarize(text)
         
@@ -250,14 +256,15 @@ class NewsSummarizer:
             return [self._standard_summarize(text) for text in texts]
         try:
             input_texts = ["summarize: " + t.strip() for t in texts]
-            inputs = self.tokenizer(
-                input_texts,
-                return_tensors="pt",
-                max_length=Config.MAX_INPUT_LENGTH,
-                truncation=True,
-                padding="max_length"
-            ).to(self.device)
-            with torch.no_grad():
+            with timer("tokenize", model="summarizer"):
+                inputs = self.tokenizer(
+                    input_texts,
+                    return_tensors="pt",
+                    max_length=Config.MAX_INPUT_LENGTH,
+                    truncation=True,
+                    padding="max_length"
+                ).to(self.device)
+            with torch.no_grad(), timer("model_generate", model="summarizer", mode="batch"):
                 outputs = self.model.generate(
                     **inputs,
                     **Config.get_generation_config()
@@ -265,6 +272,7 @@ class NewsSummarizer:
             return [self._clean_output(output) for output in outputs]
         except RuntimeError as e:
             logger.warning(f"Standard batch failed: {str(e)}")
+            count("retries", stage="summarize", reason="batch_fallback")
             return [self._standard_summarize(text) for text in texts]
 
     def _clean_output(self, output_tensor: torch.Tensor) -> str:
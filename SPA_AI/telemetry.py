@@ -0,0 +1,281 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+PIPELINE TELEMETRY
+Structured timings and counters for every pipeline phase and stage
+
+Timers record how long an operation took (DB fetch, tokenization, model
+forward/generate, DB write, crawler page load, whole phases) and counters
+record items, retries and errors. Every measurement carries labels such as
+phase, model, table or crawler.
+
+Outputs:
+    - JSON lines, one record per measurement (TELEMETRY_JSONL=path)
+    - Prometheus text format: render_prometheus(), write_prometheus(path),
+      or an HTTP /metrics endpoint (TELEMETRY_PORT=9108)
+    - log_summary() table at the end of a pipeline run
+
+Usage:
+    from telemetry import timer, count
+
+    with timer("model_forward", model="sentiment"):
+        outputs = model(**inputs)
+    count("items", len(texts), stage="sentiment")
+
+Author: SPA VIP Team
+Date: August 12, 2025
+"""
+
+import os
+import json
+import time
+import logging
+import threading
+import functools
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+METRIC_PREFIX = "spa"
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+def _label_key(labels: Dict[str, Any]) -> LabelKey:
+    return tuple(sorted((key, str(value)) for key, value in labels.items() if value is not None))
+
+
+def _escape_label_value(value) -> str:
+    """Prometheus text format: backslash, double quote and newline are escaped in label values"""
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels: LabelKey) -> str:
+    if not labels:
+        return ""
+    escaped = [f'{key}="{_escape_label_value(value)}"' for key, value in labels]
+    return "{" + ",".join(escaped) + "}"
+
+
+class Telemetry:
+    """Thread-safe in-process registry of timers and counters"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # (name, labels) -> [count, sum, min, max]
+        self._timers: Dict[Tuple[str, LabelKey], list] = {}
+        # (name, labels) -> value
+        self._counters: Dict[Tuple[str, LabelKey], float] = {}
+        self._jsonl = None
+        self._server = None
+
+    # ============ CONFIGURATION ============
+
+    def configure(self, jsonl_path: str = None, port: int = None):
+        """
+        Enable the JSON lines sink and/or the /metrics HTTP endpoint
+
+        Args:
+            jsonl_path: File receiving one JSON record per measurement
+            port: Serve Prometheus text on this port (0/None = disabled)
+        """
+        if jsonl_path:
+            os.makedirs(os.path.dirname(os.path.abspath(jsonl_path)), exist_ok=True)
+            with self._lock:
+                if self._jsonl:
+                    self._jsonl.close()
+                self._jsonl = open(jsonl_path, "a", encoding="utf-8", buffering=1)
+            logger.info(f"Telemetry JSON lines: {jsonl_path}")
+        if port:
+            self.start_http_server(port)
+
+    def close(self):
+        with self._lock:
+            if self._jsonl:
+                self._jsonl.close()
+                self._jsonl = None
+        if self._server:
+            self._server.shutdown()
+            self._server = None
+
+    # ============ RECORDING ============
+
+    def observe(self, name: str, seconds: float, **labels):
+        """Record one duration for timer name"""
+        key = (name, _label_key(labels))
+        with self._lock:
+            stats = self._timers.get(key)
+            if stats is None:
+                self._timers[key] = [1, seconds, seconds, seconds]
+            else:
+                stats[0] += 1
+                stats[1] += seconds
+                stats[2] = min(stats[2], seconds)
+                stats[3] = max(stats[3], seconds)
+        self._emit({'type': 'timer', 'name': name, 'seconds': round(seconds, 6), 'labels': labels})
+
+    def count(self, name: str, value: float = 1, **labels):
+        """Increase counter name by value"""
+        key = (name, _label_key(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+        self._emit({'type': 'counter', 'name': name, 'value': value, 'labels': labels})
+
+    @contextmanager
+    def timer(self, name: str, **labels):
+        """Time the block; an exception also increments {name}_errors"""
+        start = time.perf_counter()
+        try:
+            yield
+        except Exception:
+            self.count(f"{name}_errors", **labels)
+            raise
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def timed(self, name: str, **labels):
+        """Decorator form of timer()"""
+        def decorator(func):
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.timer(name, **labels):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def _emit(self, record: Dict[str, Any]):
+        if self._jsonl is None:
+            return
+        record['ts'] = round(time.time(), 3)
+        line = json.dumps(record, ensure_ascii=False, default=str)
+        with self._lock:
+            if self._jsonl:
+                self._jsonl.write(line + "\n")
+
+    # ============ EXPORT ============
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Current aggregates as plain dictionaries"""
+        with self._lock:
+            timers = [
+                {'name': name, 'labels': dict(labels), 'count': stats[0], 'sum': stats[1],
+                 'min': stats[2], 'max': stats[3]}
+                for (name, labels), stats in self._timers.items()
+            ]
+            counters = [
+                {'name': name, 'labels': dict(labels), 'value': value}
+                for (name, labels), value in self._counters.items()
+            ]
+        return {'timers': timers, 'counters': counters}
+
+    def render_prometheus(self) -> str:
+        """Prometheus text exposition format"""
+        with self._lock:
+            timers = sorted(self._timers.items())
+            counters = sorted(self._counters.items())
+
+        lines = []
+        described = set()
+        for (name, labels), (count, total, _, maximum) in timers:
+            metric = f"{METRIC_PREFIX}_{name}_seconds"
+            if metric not in described:
+                lines.append(f"# TYPE {metric} summary")
+                lines.append(f"# TYPE {metric}_max gauge")
+                described.add(metric)
+            label_text = _format_labels(labels)
+            lines.append(f"{metric}_count{label_text} {count}")
+            lines.append(f"{metric}_sum{label_text} {total:.6f}")
+            lines.append(f"{metric}_max{label_text} {maximum:.6f}")
+        for (name, labels), value in counters:
+            metric = f"{METRIC_PREFIX}_{name}_total"
+            if metric not in described:
+                lines.append(f"# TYPE {metric} counter")
+                described.add(metric)
+            lines.append(f"{metric}{_format_labels(labels)} {value:g}")
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path: str):
+        """Write the Prometheus text snapshot (e.g. for the node_exporter textfile collector)"""
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            f.write(self.render_prometheus())
+        os.replace(path + ".tmp", path)
+
+    def start_http_server(self, port: int, host: str = "0.0.0.0"):
+        """Serve GET /metrics from a daemon thread"""
+        if self._server:
+            return
+        telemetry = self
+
+        class MetricsHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.rstrip("/") not in ("", "/metrics"):
+                    self.send_response(404)
+                    self.end_headers()
+                    return
+                body = telemetry.render_prometheus().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((host, port), MetricsHandler)
+        threading.Thread(target=self._server.serve_forever, name="telemetry-http", daemon=True).start()
+        logger.info(f"Telemetry metrics served on http://{host}:{port}/metrics")
+
+    def log_summary(self, log: logging.Logger = None):
+        """Log one line per timer (slowest total first) and every counter"""
+        log = log or logger
+        snapshot = self.snapshot()
+        if not snapshot['timers'] and not snapshot['counters']:
+            return
+        log.info("TELEMETRY:")
+        log.info(f"{'Timer':<40} {'Count':>7} {'Total s':>9} {'Avg ms':>9} {'Max ms':>9}")
+        for timer in sorted(snapshot['timers'], key=lambda t: t['sum'], reverse=True):
+            labels = ",".join(f"{key}={value}" for key, value in timer['labels'].items())
+            name = f"{timer['name']}[{labels}]" if labels else timer['name']
+            log.info(f"{name[:40]:<40} {timer['count']:>7} {timer['sum']:>9.2f} "
+                     f"{timer['sum'] / timer['count'] * 1000:>9.1f} {timer['max'] * 1000:>9.1f}")
+        for counter in sorted(snapshot['counters'], key=lambda c: c['name']):
+            labels = ",".join(f"{key}={value}" for key, value in counter['labels'].items())
+            log.info(f"   {counter['name']}[{labels}] = {counter['value']:g}")
+
+    def reset(self):
+        with self._lock:
+            self._timers.clear()
+            self._counters.clear()
+
+
+# Process-wide instance and shortcuts
+telemetry = Telemetry()
+timer = telemetry.timer
+timed = telemetry.timed
+observe = telemetry.observe
+count = telemetry.count
+
+
+def configure_from_env(default_jsonl: Optional[str] = None):
+    """Configure from TELEMETRY_JSONL / TELEMETRY_PORT (JSON lines are written only when TELEMETRY_JSONL or default_jsonl is set)"""
+    jsonl_path = os.getenv("TELEMETRY_JSONL", default_jsonl)
+    port = int(os.getenv("TELEMETRY_PORT", "0") or 0)
+    telemetry.configure(jsonl_path=jsonl_path or None, port=port or None)
+
+
+def instrument_driver(driver, crawler: str):
+    """Wrap a Selenium driver so every driver.get() is recorded as a page_load"""
+    original_get = driver.get
+
+    def timed_get(url, *args, **kwargs):
+        with telemetry.timer("page_load", crawler=crawler):
+            result = original_get(url, *args, **kwargs)
+        telemetry.count("pages", crawler=crawler)
+        return result
+
+    driver.get = timed_get
+    return driver
@@ -5,6 +5,7 @@ Stock price prediction using LSTM/GRU models
 This module provides:
 - StockPredictor: Core prediction class
 - TimeseriesPipeline: Integrated pipeline for SPA VIP system
+- ForecastService: Multi-model ensemble forecasting with result caching
 - Support for multiple stock codes (FPT, GAS, IMP, VCB)
 - Integration with centralized database system
 """
@@ -18,7 +19,16 @@ try:
 except ImportError:
     _PIPELINE_AVAILABLE = False
 
+# Imported separately so a failure here does not hide TimeseriesPipeline
+try:
+    from .forecast_service import ForecastService
+    _FORECAST_SERVICE_AVAILABLE = True
+except ImportError:
+    _FORECAST_SERVICE_AVAILABLE = False
+
 __all__ = ['StockPredictor', 'run_prediction_for_table']
 
 if _PIPELINE_AVAILABLE:
     __all__.append('TimeseriesPipeline')
+if _FORECAST_SERVICE_AVAILABLE:
+    __all__.append('ForecastService')
@@ -0,0 +1,271 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+WALK-FORWARD BACKTEST
+Vectorized historical evaluation of the LSTM forecaster
+
+Every historical window of a *_Stock table is taken as a strided view over
+the price history (no copies), scaled the same way StockPredictor scales its
+live window, and rolled forward through the model in large batches across all
+tickers. Reports MAE / MAPE for each horizon step.
+
+Usage:
+    python backtest.py                         # all stocks, default model
+    python backtest.py --stocks FPT VCB --years 3
+    python backtest.py --model path/to/candidate.keras --output report.json
+
+Author: SPA VIP Team
+Date: August 12, 2025
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import logging
+from datetime import datetime, timedelta
+from typing import Dict, List, Any
+
+import numpy as np
+import tensorflow as tf
+
+# Add paths for imports
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+sys.path.insert(0, parent_dir)
+
+from database import SupabaseManager
+from load_model_timeseries_db import StockPredictor, recursive_forecast
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MODEL_PATH = os.path.join(current_dir, "..", "model_AI", "timeseries_model", "model_lstm", "LSTM_missing10_window15.keras")
+FEATURES = ["Giá đóng cửa", "Positive", "Negative"]
+PAGE_SIZE = 1000  # PostgREST default max rows per request
+
+
+def load_history(db_manager: SupabaseManager, stock_code: str, years: int = 5):
+    """
+    Load the full trading history of a stock (paginated)
+
+    Args:
+        db_manager: Database manager
+        stock_code: Stock code (e.g., 'FPT')
+        years: How many years of history to load
+
+    Returns:
+        DataFrame sorted by date, or None if no data
+    """
+    stock_table = f"{stock_code}_Stock"
+    start_date = (datetime.now().date() - timedelta(days=365 * years)).strftime('%Y-%m-%d')
+
+    rows = []
+    offset = 0
+    while True:
+        response = (
+            db_manager.client.table(stock_table)
+            .select("date, close_price, Positive, Neutral, Negative")
+            .gte("date", start_date)
+            .neq("close_price", "")
+            .not_.is_("close_price", "null")
+            .order("date")
+            .range(offset, offset + PAGE_SIZE - 1)
+            .execute()
+        )
+        batch = response.data or []
+        rows.extend(batch)
+        if len(batch) < PAGE_SIZE:
+            break
+        offset += PAGE_SIZE
+
+    if not rows:
+        return None
+
+    df = StockPredictor.prepare_window_frame(rows)
+    return df.dropna(subset=["Giá đóng cửa"]).reset_index(drop=True)
+
+
+def build_windows(values: np.ndarray, window_size: int, horizon: int):
+    """
+    Build every (input window, future targets) pair as strided views
+
+    Args:
+        values: Feature matrix with shape (T, F); column 0 is the close price
+        window_size: Model input length
+        horizon: Number of steps to forecast
+
+    Returns:
+        Tuple (windows, targets) with shapes (N, W, F) and (N, H), both views
+    """
+    # (N, F, W + H) view over the history, transposed to (N, W + H, F) without copying
+    span = np.lib.stride_tricks.sliding_window_view(values, window_size + horizon, axis=0)
+    span = span.transpose(0, 2, 1)
+    return span[:, :window_size, :], span[:, window_size:, 0]
+
+
+def scale_windows(windows: np.ndarray):
+    """
+    Min-max scale each window independently (same as fitting a MinMaxScaler per window)
+
+    Args:
+        windows: Array with shape (N, W, F)
+
+    Returns:
+        Tuple (scaled windows, close min, close range) for inverse transform
+    """
+    mins = windows.min(axis=1, keepdims=True)
+    ranges = windows.max(axis=1, keepdims=True) - mins
+    # MinMaxScaler leaves constant features unscaled instead of dividing by zero
+    ranges[ranges == 0] = 1.0
+    scaled = (windows - mins) / ranges
+    return scaled.astype(np.float32), mins[:, 0, 0], ranges[:, 0, 0]
+
+
+def compute_metrics(predictions: np.ndarray, targets: np.ndarray) -> Dict[str, Any]:
+    """
+    MAE / MAPE per horizon step
+
+    Args:
+        predictions: Predicted prices with shape (N, H)
+        targets: Actual prices with shape (N, H)
+
+    Returns:
+        Dictionary with per-step and overall metrics
+    """
+    errors = np.abs(predictions - targets)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        pct = np.where(targets != 0, errors / np.abs(targets), np.nan)
+
+    mae = errors.mean(axis=0)
+    mape = np.nanmean(pct, axis=0) * 100
+
+    return {
+        'windows': int(len(targets)),
+        'mae_per_step': [round(float(v), 4) for v in mae],
+        'mape_per_step': [round(float(v), 4) for v in mape],
+        'mae': round(float(errors.mean()), 4),
+        'mape': round(float(np.nanmean(pct) * 100), 4)
+    }
+
+
+def run_backtest(model_path: str = DEFAULT_MODEL_PATH, stock_codes: List[str] = None,
+                 years: int = 5, window_size: int = 15, horizon: int = 10,
+                 batch_size: int = 4096, db_manager: SupabaseManager = None) -> Dict[str, Any]:
+    """
+    Walk-forward backtest of a forecasting model over several tickers
+
+    Args:
+        model_path: Path to the .keras model to evaluate
+        stock_codes: Stock codes (default: FPT, GAS, IMP, VCB)
+        years: Years of history to evaluate
+        window_size: Model input length
+        horizon: Forecast horizon in trading days
+        batch_size: Batch size for model.predict
+        db_manager: Optional shared database manager
+
+    Returns:
+        Dictionary with per-stock and overall metrics
+    """
+    stock_codes = stock_codes or ["FPT", "GAS", "IMP", "VCB"]
+    db_manager = db_manager or SupabaseManager()
+
+    start_time = time.time()
+    model = tf.keras.models.load_model(model_path)
+
+    # Build all windows per ticker, then stack so each horizon step is one model call
+    per_stock = {}
+    for stock_code in stock_codes:
+        df = load_history(db_manager, stock_code, years)
+        if df is None or len(df) < window_size + horizon:
+            logger.warning(f"{stock_code}: not enough history for backtest")
+            continue
+
+        values = df[FEATURES].to_numpy(dtype=np.float64)
+        windows, targets = build_windows(values, window_size, horizon)
+        scaled, close_min, close_range = scale_windows(windows)
+        per_stock[stock_code] = {
+            'scaled': scaled,
+            'targets': targets,
+            'close_min': close_min,
+            'close_range': close_range,
+            'first_date': df["Ngày"].iloc[0].strftime('%Y-%m-%d'),
+            'last_date': df["Ngày"].iloc[-1].strftime('%Y-%m-%d')
+        }
+        logger.info(f"{stock_code}: {len(targets)} windows ({per_stock[stock_code]['first_date']} → {per_stock[stock_code]['last_date']})")
+
+    if not per_stock:
+        raise ValueError("No stock has enough history to backtest")
+
+    load_seconds = time.time() - start_time
+
+    all_scaled = np.concatenate([item['scaled'] for item in per_stock.values()])
+    infer_start = time.time()
+    preds_scaled = recursive_forecast(model, all_scaled, horizon=horizon, batch_size=batch_size)
+    infer_seconds = time.time() - infer_start
+
+    results = {}
+    all_preds, all_targets = [], []
+    offset = 0
+    for stock_code, item in per_stock.items():
+        count = len(item['targets'])
+        preds = preds_scaled[offset:offset + count] * item['close_range'][:, None] + item['close_min'][:, None]
+        offset += count
+
+        results[stock_code] = compute_metrics(preds, item['targets'])
+        results[stock_code]['period'] = f"{item['first_date']} → {item['last_date']}"
+        all_preds.append(preds)
+        all_targets.append(item['targets'])
+
+    overall = compute_metrics(np.concatenate(all_preds), np.concatenate(all_targets))
+
+    return {
+        'model_path': model_path,
+        'window_size': window_size,
+        'horizon': horizon,
+        'stocks': results,
+        'overall': overall,
+        'timing': {
+            'load_seconds': round(load_seconds, 2),
+            'inference_seconds': round(infer_seconds, 2),
+            'total_seconds': round(time.time() - start_time, 2)
+        }
+    }
+
+
+def main():
+    """Command line entry point"""
+    parser = argparse.ArgumentParser(description="Walk-forward backtest for the timeseries model")
+    parser.add_argument("--model", default=DEFAULT_MODEL_PATH, help="Path to .keras model")
+    parser.add_argument("--stocks", nargs="+", default=["FPT", "GAS", "IMP", "VCB"], help="Stock codes")
+    parser.add_argument("--years", type=int, default=5, help="Years of history")
+    parser.add_argument("--window", type=int, default=15, help="Model window size")
+    parser.add_argument("--horizon", type=int, default=10, help="Forecast horizon")
+    parser.add_argument("--batch-size", type=int, default=4096, help="Inference batch size")
+    parser.add_argument("--output", help="Optional path to save the JSON report")
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s'
+    )
+
+    report = run_backtest(args.model, args.stocks, args.years, args.window, args.horizon, args.batch_size)
+
+    logger.info("="*60)
+    logger.info("BACKTEST RESULTS")
+    logger.info("="*60)
+    for stock_code, metrics in report['stocks'].items():
+        logger.info(f"{stock_code}: windows={metrics['windows']}, MAE={metrics['mae']:,.2f}, MAPE={metrics['mape']:.2f}%")
+    logger.info(f"Overall: MAE={report['overall']['mae']:,.2f}, MAPE={report['overall']['mape']:.2f}%")
+    logger.info(f"MAPE per step: {report['overall']['mape_per_step']}")
+    logger.info(f"Timing: {report['timing']}")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        logger.info(f"Report saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,289 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+FORECAST SERVICE
+Multi-model ensemble forecasting with per-model result caching
+
+Keeps several registered Keras models in memory at once, runs each of them
+as one batched forecast over the input windows of all requested tickers and
+returns per-model and blended predictions. Results are cached by
+(ticker, last data date, model name, model version), so repeating a
+comparison for the same trading day does not touch the models again.
+
+Author: SPA VIP Team
+Date: August 12, 2025
+"""
+
+import os
+import sys
+import logging
+import threading
+from datetime import timedelta
+from typing import Dict, List, Any
+
+import numpy as np
+import tensorflow as tf
+from sklearn.preprocessing import MinMaxScaler
+
+# Add paths for imports
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+sys.path.insert(0, parent_dir)
+
+from database import SupabaseManager
+from load_model_timeseries_db import StockPredictor, recursive_forecast
+from model_registry import get_registry, file_model_key
+
+logger = logging.getLogger(__name__)
+
+
+class RegisteredModel:
+    """A forecasting model known to the service (loaded lazily)"""
+
+    def __init__(self, name: str, model_path: str, window_size: int = 15,
+                 version: str = None, weight: float = 1.0):
+        self.name = name
+        self.model_path = model_path
+        self.window_size = window_size
+        self.version = version or self._version_from_file(model_path)
+        self.weight = weight
+
+    @staticmethod
+    def _version_from_file(model_path: str) -> str:
+        """Derive a version stamp from the model file so a retrained file invalidates the cache"""
+        try:
+            return str(int(os.path.getmtime(model_path)))
+        except OSError:
+            return "unversioned"
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'name': self.name,
+            'model_path': self.model_path,
+            'window_size': self.window_size,
+            'version': self.version,
+            'weight': self.weight,
+            'loaded': get_registry().is_loaded(file_model_key("keras", self.model_path))
+        }
+
+
+class ForecastService:
+    """
+    Forecasting service holding several models in memory
+
+    Usage:
+        service = ForecastService()
+        service.register_model("lstm_w15", path_w15, window_size=15)
+        service.register_model("gru_w30", path_w30, window_size=30, weight=0.5)
+        results = service.forecast(["FPT", "GAS"])
+    """
+
+    def __init__(self, db_manager: SupabaseManager = None, horizon: int = 10):
+        self.db_manager = db_manager or SupabaseManager()
+        self.horizon = horizon
+        self.features = ["Giá đóng cửa", "Positive", "Negative"]
+        self.models: Dict[str, RegisteredModel] = {}
+        self._cache: Dict[tuple, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    # ============ MODEL REGISTRY ============
+
+    def register_model(self, name: str, model_path: str, window_size: int = 15,
+                       version: str = None, weight: float = 1.0) -> RegisteredModel:
+        """
+        Register a model for ensemble forecasting
+
+        Args:
+            name: Unique model name (e.g., 'lstm_w15')
+            model_path: Path to the .keras file
+            window_size: Input window length the model was trained with
+            version: Explicit version stamp (defaults to the file mtime)
+            weight: Weight of this model in the blended forecast
+
+        Returns:
+            RegisteredModel entry
+        """
+        entry = RegisteredModel(name, model_path, window_size, version, weight)
+        with self._lock:
+            # The model itself lives in the model registry, so registering the same file again reuses it
+            self.models[name] = entry
+        logger.info(f"Registered forecast model '{name}' (window={window_size}, version={entry.version})")
+        return entry
+
+    def unregister_model(self, name: str):
+        """Remove a model and its cached results"""
+        with self._lock:
+            self.models.pop(name, None)
+            self._cache = {key: value for key, value in self._cache.items() if key[2] != name}
+
+    def list_models(self) -> List[Dict[str, Any]]:
+        """List registered models"""
+        return [entry.to_dict() for entry in self.models.values()]
+
+    def _ensure_loaded(self, entry: RegisteredModel):
+        """
+        Load the Keras model once per process (shared with StockPredictor via the model registry)
+
+        The model is not kept on the entry, so evicting it from the registry frees it.
+        """
+        key = file_model_key("keras", entry.model_path)
+        if not get_registry().is_loaded(key):
+            logger.info(f"Loading forecast model '{entry.name}' from {entry.model_path}")
+        return get_registry().get_or_load(key, lambda: tf.keras.models.load_model(entry.model_path))
+
+    def clear_cache(self):
+        """Drop all cached forecasts"""
+        with self._lock:
+            self._cache.clear()
+
+    # ============ DATA ============
+
+    def load_windows(self, stock_codes: List[str], length: int) -> Dict[str, Any]:
+        """
+        Load the latest `length` trading days for each ticker
+
+        Args:
+            stock_codes: Stock codes to load
+            length: Number of most recent rows with a close price
+
+        Returns:
+            Dict mapping stock code → DataFrame sorted by date
+        """
+        frames = {}
+        for stock_code in stock_codes:
+            try:
+                response = (
+                    self.db_manager.client.table(f"{stock_code}_Stock")
+                    .select("date, close_price, Positive, Neutral, Negative")
+                    .neq("close_price", "")
+                    .not_.is_("close_price", "null")
+                    .order("date", desc=True)
+                    .limit(length)
+                    .execute()
+                )
+                if response.data:
+                    frames[stock_code] = StockPredictor.prepare_window_frame(response.data)
+                else:
+                    logger.warning(f"No close_price data available for {stock_code}")
+            except Exception as e:
+                logger.error(f"Error loading window data for {stock_code}: {e}")
+        return frames
+
+    # ============ FORECASTING ============
+
+    def _forecast_model(self, entry: RegisteredModel, frames: Dict[str, Any]) -> Dict[str, np.ndarray]:
+        """Run one model over the windows of several tickers in a single batch"""
+        model = self._ensure_loaded(entry)
+
+        codes, windows, scalers = [], [], []
+        for stock_code, df in frames.items():
+            if len(df) < entry.window_size:
+                logger.warning(f"{stock_code}: need {entry.window_size} days for '{entry.name}', got {len(df)}")
+                continue
+            # Same scaling as StockPredictor: fit on the window the model sees
+            scaler = MinMaxScaler()
+            scaled = scaler.fit_transform(df[self.features].tail(entry.window_size))
+            codes.append(stock_code)
+            windows.append(scaled)
+            scalers.append(scaler)
+
+        if not codes:
+            return {}
+
+        preds_scaled = recursive_forecast(model, np.stack(windows), horizon=self.horizon)
+
+        results = {}
+        for stock_code, scaler, preds in zip(codes, scalers, preds_scaled):
+            padded = np.zeros((len(preds), len(self.features)))
+            padded[:, 0] = preds
+            results[stock_code] = scaler.inverse_transform(padded)[:, 0]
+        return results
+
+    def forecast(self, stock_codes: List[str], model_names: List[str] = None,
+                 weights: Dict[str, float] = None) -> Dict[str, Dict[str, Any]]:
+        """
+        Forecast the next `horizon` days with every selected model
+
+        Args:
+            stock_codes: Stock codes to forecast
+            model_names: Registered models to use (default: all)
+            weights: Optional per-call blend weights overriding registered weights
+
+        Returns:
+            Dict mapping stock code → {
+                'last_data_date', 'dates', 'models': {name: {...}}, 'blended'
+            }
+        """
+        names = model_names or list(self.models.keys())
+        missing = [name for name in names if name not in self.models]
+        if missing:
+            raise ValueError(f"Unknown forecast models: {missing}")
+        if not names:
+            raise ValueError("No forecast models registered")
+
+        entries = [self.models[name] for name in names]
+        max_window = max(entry.window_size for entry in entries)
+        frames = self.load_windows(stock_codes, max_window)
+
+        # Split work into cache hits and models that still have to run
+        per_stock: Dict[str, Dict[str, Any]] = {}
+        pending: Dict[str, Dict[str, Any]] = {}
+        for stock_code, df in frames.items():
+            last_date = df["Ngày"].iloc[-1]
+            per_stock[stock_code] = {
+                'stock_code': stock_code,
+                'last_data_date': last_date.strftime('%Y-%m-%d'),
+                'dates': [(last_date + timedelta(days=i + 1)).strftime('%Y-%m-%d') for i in range(self.horizon)],
+                'models': {}
+            }
+            for entry in entries:
+                key = (stock_code, per_stock[stock_code]['last_data_date'], entry.name, entry.version)
+                with self._lock:
+                    cached = self._cache.get(key)
+                if cached is not None:
+                    per_stock[stock_code]['models'][entry.name] = dict(cached, cached=True)
+                else:
+                    pending.setdefault(entry.name, {})[stock_code] = df
+
+        for entry in entries:
+            if entry.name not in pending:
+                continue
+            try:
+                predictions = self._forecast_model(entry, pending[entry.name])
+            except Exception as e:
+                logger.error(f"Forecast model '{entry.name}' failed: {e}")
+                continue
+
+            for stock_code, prices in predictions.items():
+                result = {
+                    'version': entry.version,
+                    'window_size': entry.window_size,
+                    'predictions': [float(p) for p in prices]
+                }
+                key = (stock_code, per_stock[stock_code]['last_data_date'], entry.name, entry.version)
+                with self._lock:
+                    self._cache[key] = result
+                per_stock[stock_code]['models'][entry.name] = dict(result, cached=False)
+
+        # Blend per-model forecasts
+        for stock_code, result in per_stock.items():
+            model_results = result['models']
+            if not model_results:
+                result['blended'] = None
+                continue
+
+            blend_weights = {
+                name: (weights or {}).get(name, self.models[name].weight)
+                for name in model_results
+            }
+            total_weight = sum(blend_weights.values())
+            stacked = np.array([model_results[name]['predictions'] for name in model_results])
+            w = np.array([blend_weights[name] for name in model_results])
+            if total_weight <= 0:
+                w = np.ones(len(w))
+                total_weight = float(len(w))
+
+            result['weights'] = blend_weights
+            result['blended'] = [float(p) for p in (w @ stacked) / total_weight]
+
+        return per_stock
@@ -5,6 +5,7 @@ from sklearn.preprocessing import MinMaxScaler
 from datetime import timedelta
 import os
 import sys
+import time
 
 # Add parent directory for imports
 current_dir = os.path.dirname(os.path.abspath(__file__))
@@ -18,6 +19,8 @@ except ImportError:
     SUPABASE_AVAILABLE = False
     print("Supabase not installed. Install with: pip install supabase")
 
+from telemetry import timer, observe, count
+
 # Try to import centralized database (optional for backwards compatibility)
 try:
     from database import SupabaseManager, DatabaseConfig
@@ -26,12 +29,45 @@ except ImportError:
     CENTRALIZED_DB_AVAILABLE = False
 
 
+def recursive_forecast(model, windows, horizon=10, batch_size=None):
+    """
+    Roll a one-step model forward for several windows at once
+
+    Each step predicts the scaled close price for every window in a single
+    model call, then appends [pred, 0, 0, ...] and drops the oldest row,
+    exactly like the original one-window loop in predict_next_10_days.
+
+    Args:
+        model: Loaded Keras model taking (batch, window, features)
+        windows: Array of scaled windows with shape (batch, window, features)
+        horizon: Number of steps to forecast
+        batch_size: Optional batch size passed to model.predict
+
+    Returns:
+        Array of scaled predictions with shape (batch, horizon)
+    """
+    current = np.asarray(windows, dtype=np.float32)
+    predictions = np.zeros((current.shape[0], horizon), dtype=np.float32)
+
+    for step in range(horizon):
+        with timer("model_forward", model="timeseries"):
+            raw = model.predict(current, batch_size=batch_size, verbose=0)
+        preds = np.asarray(raw).reshape(current.shape[0], -1)[:, 0]
+        predictions[:, step] = preds
+
+        next_rows = np.zeros((current.shape[0], 1, current.shape[2]), dtype=np.float32)
+        next_rows[:, 0, 0] = preds
+        current = np.concatenate([current[:, 1:, :], next_rows], axis=1)
+
+    return predictions
+
+
 class StockPredictor:
 
     def __init__(self, model_path, supabase_config, use_centralized_db=True):
         self.model_path = model_path
         self.supabase_config = supabase_config
-        self.model = None
+        self._model_loaded = False
         self.scaler = MinMaxScaler()
         self.window_size = 15  # Use the last 15 days
         self.features = ["Giá đóng cửa", "Positive", "Negative"]
@@ -81,9 +117,23 @@ class StockPredictor:
                 "table_name": table_name,
             }
 
+    def _registry_model(self):
+        from model_registry import get_registry, file_model_key
+        # One Keras model per file per process, shared by every ticker's predictor
+        return get_registry().get_or_load(
+            file_model_key("keras", self.model_path),
+            lambda: tf.keras.models.load_model(self.model_path)
+        )
+
+    @property
+    def model(self):
+        """Keras model from the model registry (None until load_model); not held, so eviction frees it"""
+        return self._registry_model() if self._model_loaded else None
+
     def load_model(self):
         try:
-            self.model = tf.keras.models.load_model(self.model_path)
+            self._registry_model()
+            self._model_loaded = True
             print(f"Model loaded: {self.model_path}")
             return True
         except Exception as e:
@@ -97,38 +147,22 @@ class StockPredictor:
             return None
 
         try:
-            response = (
-                self.supabase.table(self.table_name)
-                .select("*")
-                .neq("close_price", "")
-                .not_.is_("close_price", "null")
-                .order("date", desc=True)
-                .limit(self.window_size)  # Use window_size instead of hardcoded 15
-                .execute()
-            )
+            with timer("db_fetch", op="price_window", table=self.table_name):
+                response = (
+                    self.supabase.table(self.table_name)
+                    .select("*")
+                    .neq("close_price", "")
+                    .not_.is_("close_price", "null")
+                    .order("date", desc=True)
+                    .limit(self.window_size)  # Use window_size instead of hardcoded 15
+                    .execute()
+                )
 
             if not response.data:
                 print("No close_price data available!")
                 return None
 
-            df = pd.DataFrame(response.data)
-            df["Ngày"] = pd.to_datetime(df["date"])
-            df["Giá đóng cửa"] = pd.to_numeric(
-                df["close_price"].astype(str).str.replace(",", ""),
-                errors="coerce",
-            )
-
-            df = df.sort_values("Ngày").reset_index(drop=True)
-
-            # Handle sentiment columns - ensure all are numeric
-            for col in ["Positive", "Neutral", "Negative"]:
-                if col not in df.columns:
-                    df[col] = 0
-                else:
-                    df[col] = (
-                        pd.to_numeric(df[col].replace("", "0"), errors="coerce")
-                        .fillna(0)
-                    )
+            df = self.prepare_window_frame(response.data)
 
             print(f"Successfully loaded {len(df)} most recent days (window_size={self.window_size})")
             
@@ -153,32 +187,57 @@ class StockPredictor:
 
         except Exception as e:
             print(f"Error loading last days: {e}")
+            count("db_errors", op="price_window")
             return None
 
+    @staticmethod
+    def prepare_window_frame(records):
+        """
+        Convert raw *_Stock rows into a numeric frame sorted by date
+
+        Args:
+            records: List of row dictionaries returned by Supabase
+
+        Returns:
+            DataFrame with "Ngày", "Giá đóng cửa" and sentiment columns
+        """
+        df = pd.DataFrame(records)
+        df["Ngày"] = pd.to_datetime(df["date"])
+        df["Giá đóng cửa"] = pd.to_numeric(
+            df["close_price"].astype(str).str.replace(",", ""),
+            errors="coerce",
+        )
+
+        df = df.sort_values("Ngày").reset_index(drop=True)
+
+        # Handle sentiment columns - ensure all are numeric
+        for col in ["Positive", "Neutral", "Negative"]:
+            if col not in df.columns:
+                df[col] = 0
+            else:
+                df[col] = (
+                    pd.to_numeric(df[col].replace("", "0"), errors="coerce")
+                    .fillna(0)
+                )
+        return df
+
     def fit_scaler(self, df):
         scaled = self.scaler.fit_transform(df[self.features])
         return scaled
 
     def predict_next_10_days(self, df):
-        if self.model is None:
+        model = self.model
+        if model is None:
             print("Model not loaded!")
             return None, None
 
         scaled_data = self.fit_scaler(df)
-        last_window = scaled_data[-self.window_size:].tolist()
-        predictions_scaled = []
-
-        for _ in range(10):
-            x_input = np.array([last_window])
-            pred = self.model.predict(x_input, verbose=0)[0][0]
-            next_input = [pred, 0, 0]
-            last_window.append(next_input)
-            last_window.pop(0)
-            predictions_scaled.append([pred, 0, 0])
+        last_window = scaled_data[-self.window_size:]
+        preds = recursive_forecast(model, last_window[np.newaxis, ...], horizon=10)[0]
 
-        predicted_prices = self.scaler.inverse_transform(
-            np.array(predictions_scaled)
-        )[:, 0]
+        predictions_scaled = np.zeros((len(preds), len(self.features)))
+        predictions_scaled[:, 0] = preds
+        predicted_prices = self.scaler.inverse_transform(predictions_scaled)[:, 0]
 
         last_date = df["Ngày"].iloc[-1]
         future_dates = [last_date + timedelta(days=i + 1) for i in range(10)]
@@ -191,6 +250,7 @@ class StockPredictor:
             return False
 
         updated, inserted = 0, 0
+        write_start = time.perf_counter()
 
         for date, price in zip(prediction_dates, predicted_prices):
             date_str = date.strftime("%Y-%m-%d")
@@ -225,6 +285,8 @@ class StockPredictor:
                 self.supabase.table(self.table_name).insert(record).execute()
                 inserted += 1
 
+        observe("db_write", time.perf_counter() - write_start, op="predictions", table=self.table_name)
+        count("items", updated + inserted, stage="timeseries")
         print(f"Updated: {updated}, Inserted: {inserted}")
         return True
 
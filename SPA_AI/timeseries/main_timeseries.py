@@ -25,6 +25,9 @@ from load_model_timeseries_db import StockPredictor
 
 logger = logging.getLogger(__name__)
 
+# Default production model (LSTM, window 15)
+DEFAULT_MODEL_PATH = os.path.join(current_dir, "..", "model_AI", "timeseries_model", "model_lstm", "LSTM_missing10_window15.keras")
+
 class TimeseriesPipeline:
     """
     Integrated timeseries prediction pipeline for SPA VIP system
@@ -35,6 +38,7 @@ class TimeseriesPipeline:
         self.db_manager = SupabaseManager()
         self.config = DatabaseConfig()
         self.predictors = {}  # Cache for model predictors
+        self.forecast_service = None  # Lazily created multi-model service
         self.results = {}
         
         # Available stock codes
@@ -56,8 +60,7 @@ class TimeseriesPipeline:
         if stock_code not in self.predictors:
             # Default model path if not provided
             if model_path is None:
-                # Use relative path from the timeseries directory
-                model_path = os.path.join(current_dir, "..", "model_AI", "timeseries_model", "model_lstm", "LSTM_missing10_window15.keras")
+                model_path = DEFAULT_MODEL_PATH
             
             # Create stock table name
             stock_table = f"{stock_code}_Stock"
@@ -210,6 +213,42 @@ class TimeseriesPipeline:
         logger.info(f"Starting predictions for all available stocks: {self.available_stocks}")
         return self.predict_specific_stocks(self.available_stocks, model_path)
     
+    def get_forecast_service(self):
+        """
+        Get the shared multi-model forecast service
+
+        The default LSTM model is registered on first use; further models can
+        be added with `service.register_model(...)`.
+
+        Returns:
+            ForecastService instance
+        """
+        if self.forecast_service is None:
+            from forecast_service import ForecastService
+
+            self.forecast_service = ForecastService(self.db_manager)
+            self.forecast_service.register_model("lstm_w15", DEFAULT_MODEL_PATH, window_size=15)
+        return self.forecast_service
+
+    def compare_models(self, stock_codes: List[str] = None, model_names: List[str] = None,
+                       weights: Dict[str, float] = None) -> Dict[str, Any]:
+        """
+        Forecast with several registered models side by side (no database writes)
+
+        Args:
+            stock_codes: Stock codes to forecast (default: all available)
+            model_names: Registered model names (default: all)
+            weights: Optional blend weights per model
+
+        Returns:
+            Dictionary mapping stock code to per-model and blended forecasts
+        """
+        stock_codes = [code for code in (stock_codes or self.available_stocks) if code in self.available_stocks]
+        service = self.get_forecast_service()
+
+        logger.info(f"Comparing models {model_names or [m['name'] for m in service.list_models()]} on {stock_codes}")
+        return service.forecast(stock_codes, model_names=model_names, weights=weights)
+
     def get_stock_prediction_status(self, stock_code: str) -> Dict[str, Any]:
         """
         Get prediction status for a specific stock
@@ -5,6 +5,8 @@ import json
 from dotenv import load_dotenv
 import os
 import logging # Professional logging library
+import hashlib
+from datetime import datetime
 from fastapi import FastAPI, HTTPException
 
 # --- LOGGING CONFIGURATION ---
@@ -23,99 +25,434 @@ def get_redis_connection():
     r = redis.Redis(host=os.getenv("REDIS_HOST"), port=os.getenv("REDIS_PORT"), password=os.getenv("REDIS_PASSWORD"), decode_responses=True)
     return r
 
+# --- REDIS INDEX LAYOUT ---
+# news:item:{table}:{id}              hash with the processed fields of one article
+# news:idx:{scope}                    sorted set of item ids, score = YYYYMMDD * 1e8 + id (read with ZREVRANGE)
+# news:idx:sentiment:{label}          set of item ids per sentiment label (e.g. 'Tích_cực')
+# news:idx:date:{YYYY-MM-DD}          set of item ids per date
+# news:{scope}                        legacy JSON blob, still written for older readers
+# news:page:{scope}:{sentiment}:{date}:{page}:{limit}   precomputed /api/news response body
+# news:etag:{scope}:{sentiment}:{date}:{page}:{limit}   strong ETag of that body
+# news:page:keys                      set of all precomputed page keys (to drop stale ones)
+# news:hwm:{table}                    high-water mark '{updated_at}|{id}' of the last synced row
+# news:dates:{table}                  sorted set of the cached distinct dates of a table (score YYYYMMDD)
+# news:full_sync_at                   unix time of the last full sync
+# Every key expires after NEWS_TTL_SECONDS; each incremental sync refreshes the TTL of the whole window.
+NEWS_TTL_SECONDS = 86400
+# updated_at is the writing transaction's start time, so a row can commit below the mark of a sync
+# that ran meanwhile: incremental syncs re-read this many seconds before the mark (patching is idempotent)
+NEWS_SYNC_LAG_SECONDS = int(os.getenv("NEWS_SYNC_LAG_SECONDS", "120"))
+# Incremental syncs never see rows deleted in Postgres; a full rebuild at least this often drops them
+NEWS_FULL_SYNC_SECONDS = int(os.getenv("NEWS_FULL_SYNC_SECONDS", "3600"))
+NEWS_WINDOW_DAYS = 5
+NEWS_TABLES = ["General_News", "FPT_News", "VCB_News", "IMP_News", "GAS_News"]
+INDUSTRY_SCOPES = {"Finance": "Tài chính", "Technology": "Công nghệ", "Energy": "Năng lượng", "Healthcare": "Sức khỏe", "Other": "Khác"}
+NEWS_ITEM_FIELDS = ['date', 'industry', 'title', 'summary', 'link', 'influence']
+NEWS_SENTIMENT_LABELS = ["Tích_cực", "Tiêu_cực", "Trung_tính"]
+
 # --- NEW HELPER FUNCTION FOR REUSE ---
-def fetch_and_process_data_for_table(cursor, table_name: str):
+def news_columns(table_name: str) -> str:
+    """Explicit column list pushed to Redis (never the full article content)."""
+    columns = ['id', 'date', 'title', 'ai_summary', 'sentiment', 'link', 'updated_at']
+    if table_name == "General_News":
+        columns.insert(2, 'industry')  # Only General_News is classified by industry
+    return ", ".join(f'"{column}"' for column in columns)
+
+def process_news_row(row) -> dict:
+    """Convert one database row into the record served by the API."""
+    formatted_date = row['date'].strftime('%d/%m/%Y') if row.get('date') else ""
+    # Apply common processing logic
+    data = {
+        'date': formatted_date,
+        'industry': row.get('industry', ''),
+        'title': row.get('title', ''),
+        'summary': row.get('ai_summary', ''),
+        'influence': row.get('sentiment', ''),
+        'link': row.get('link', '')
+    }
+
+    data['industry'] = INDUSTRY_SCOPES.get(data['industry'], data['industry'])
+    influence_map = {"Positive": "Tích_cực", "Negative": "Tiêu_cực", "Neutral": "Trung_tính"}
+    # Rename key from 'influence' to 'hashtags' for consistency with frontend if needed
+    data['influence'] = influence_map.get(data.pop('influence'), [])
+    data['influence'] = data['influence'].split() if isinstance(data['influence'], str) else []
+    return data
+
+def news_item_id(table_name: str, row) -> str:
+    """Identifier of a record in the Redis index: '{table}:{id}'."""
+    return f"{table_name}:{row.get('id') or row.get('link', '')}"
+
+def news_item_score(item_id: str, item: dict) -> float:
+    """Index score ordering items by date DESC, then id DESC (read with ZREVRANGE)."""
+    try:
+        date_part = int(datetime.strptime(item.get('date', ''), '%d/%m/%Y').strftime('%Y%m%d'))
+    except ValueError:
+        date_part = 0
+    id_part = item_id.rsplit(':', 1)[-1]
+    return date_part * 1e8 + (int(id_part) % 10**8 if id_part.isdigit() else 0)
+
+def fetch_and_process_data_for_table(cursor, table_name: str, include_ids: bool = False, rows_out: list = None):
     """
     This function takes a table name, queries the last 5 days,
     processes the data, and returns a list of cleaned records.
+    With include_ids=True it returns (item_id, record) pairs, where
+    item_id is '{table}:{id}' and identifies the record in the Redis index.
+    Raw rows are appended to rows_out when given (used to derive the sync high-water mark).
     """
     logging.info(f"Starting to fetch data for table: {table_name}...")
     # Use psycopg2 to safely pass the table name
     query = f"""
-        SELECT * FROM "{table_name}" WHERE "date" IN (
-            SELECT DISTINCT "date" FROM "{table_name}" WHERE "date" IS NOT NULL ORDER BY "date" DESC LIMIT 5
-        ) ORDER BY "date" DESC;
+        SELECT {news_columns(table_name)} FROM "{table_name}" WHERE "date" IN (
+            SELECT DISTINCT "date" FROM "{table_name}" WHERE "date" IS NOT NULL ORDER BY "date" DESC LIMIT {NEWS_WINDOW_DAYS}
+        ) ORDER BY "date" DESC, "id" DESC;
     """
     cursor.execute(query)
     rows = cursor.fetchall()
     logging.info(f"Fetched {len(rows)} rows from table '{table_name}'.")
+    if rows_out is not None:
+        rows_out.extend(rows)
 
     processed_rows = []
     for row in rows:
-        formatted_date = row['date'].strftime('%d/%m/%Y') if row.get('date') else ""
-        # Apply common processing logic
-        data = {
-            'date': formatted_date,
-            'industry': row.get('industry', ''),
-            'title': row.get('title', ''),
-            'summary': row.get('ai_summary', ''),
-            'influence': row.get('sentiment', ''),
-            'link': row.get('link', '')
-        }
-
-        industry_map = {"Finance": "Tài chính", "Technology": "Công nghệ", "Energy": "Năng lượng", "Healthcare": "Sức khỏe", "Other": "Khác"}
-        data['industry'] = industry_map.get(data['industry'], data['industry'])
-        influence_map = {"Positive": "Tích_cực", "Negative": "Tiêu_cực", "Neutral": "Trung_tính"}
-        # Rename key from 'influence' to 'hashtags' for consistency with frontend if needed
-        data['influence'] = influence_map.get(data.pop('influence'), [])
-        data['influence'] = data['influence'].split() if isinstance(data['influence'], str) else []
-
-        processed_rows.append(data)
+        data = process_news_row(row)
+        if include_ids:
+            processed_rows.append((news_item_id(table_name, row), data))
+        else:
+            processed_rows.append(data)
     return processed_rows
 
+def format_hwm(rows) -> str:
+    """High-water mark '{updated_at}|{id}' of the last row in (updated_at, id) order."""
+    last = max((row for row in rows if row.get('updated_at')), key=lambda row: (row['updated_at'], row['id']))
+    return f"{last['updated_at'].isoformat()}|{last['id']}"
+
+def parse_hwm(value: str):
+    """(updated_at, id) of a stored high-water mark (marks without an id come from older syncs)."""
+    updated_at, _, last_id = value.partition('|')
+    return updated_at, int(last_id) if last_id else -1
+
+def fetch_changed_rows(cursor, table_name: str, since: str, min_date=None):
+    """
+    Rows of a table updated since the high-water mark minus NEWS_SYNC_LAG_SECONDS,
+    in (updated_at, id) order (explicit columns only). Rows at or below the mark
+    are re-read so late commits are not missed; the caller drops the ones Redis already has.
+    """
+    since_updated_at, _ = parse_hwm(since)
+    query = (f'SELECT {news_columns(table_name)} FROM "{table_name}" '
+             'WHERE "updated_at" > %s::timestamptz - make_interval(secs => %s) AND "date" IS NOT NULL')
+    params = [since_updated_at, NEWS_SYNC_LAG_SECONDS]
+    if min_date:
+        query += ' AND "date" >= %s'
+        params.append(min_date)
+    query += ' ORDER BY "updated_at" ASC, "id" ASC;'
+    cursor.execute(query, params)
+    rows = cursor.fetchall()
+    logging.info(f"Fetched {len(rows)} changed rows from table '{table_name}' since {since}.")
+    return rows
+
+def is_past_hwm(row, since: str) -> bool:
+    """Whether a row sorts after the high-water mark in (updated_at, id) order."""
+    since_updated_at, since_id = parse_hwm(since)
+    return (row['updated_at'], row['id']) > (datetime.fromisoformat(since_updated_at), since_id)
+
+def drop_already_synced(redis_conn, table_name: str, rows: list, since: str) -> list:
+    """
+    Keep rows past the mark, and re-read rows (within the lag) whose cached
+    item is missing or differs from what the row would write.
+    """
+    replayed = [row for row in rows if not is_past_hwm(row, since)]
+    if not replayed:
+        return rows
+    with redis_conn.pipeline(transaction=False) as pipe:
+        for row in replayed:
+            pipe.hgetall(f"news:item:{news_item_id(table_name, row)}")
+        cached = pipe.execute()
+    stale = {id(row) for row, fields in zip(replayed, cached) if fields != news_item_to_hash(process_news_row(row))}
+    return [row for row in rows if is_past_hwm(row, since) or id(row) in stale]
+
+def table_scopes(table_name: str) -> list:
+    """Scopes whose index can contain items of a table."""
+    if table_name == "General_News":
+        return ["all"] + list(INDUSTRY_SCOPES)
+    return [table_name.split('_')[0]]
+
+def item_scopes(table_name: str, item: dict) -> list:
+    """Scopes an item belongs to."""
+    if table_name != "General_News":
+        return [table_name.split('_')[0]]
+    industry = next((key for key, value in INDUSTRY_SCOPES.items() if value == item.get('industry')), None)
+    return ["all", industry] if industry else ["all"]
+
+def news_item_to_hash(item: dict) -> dict:
+    """Flatten a processed record into Redis hash fields (lists are JSON-encoded)."""
+    return {
+        field: json.dumps(item.get(field, []), ensure_ascii=False) if field == 'influence' else (item.get(field) or '')
+        for field in NEWS_ITEM_FIELDS
+    }
+
+def push_news_index(pipe, items_by_scope: dict):
+    """
+    Queue the indexed news structures on a Redis pipeline.
+    items_by_scope maps a scope ('all', 'Finance', 'FPT', ...) to a list of
+    (item_id, record) pairs. Index keys are built under
+    temporary names and renamed at the end, so readers never see a half-built index.
+    """
+    item_hashes = {}
+    sentiment_sets = {}
+    date_sets = {}
+    for item_id_list in items_by_scope.values():
+        for item_id, item in item_id_list:
+            item_hashes[item_id] = item
+            for label in item.get('influence', []):
+                sentiment_sets.setdefault(label, set()).add(item_id)
+            try:
+                # Cached dates are DD/MM/YYYY, filters arrive as YYYY-MM-DD
+                iso_date = datetime.strptime(item.get('date', ''), '%d/%m/%Y').strftime('%Y-%m-%d')
+                date_sets.setdefault(iso_date, set()).add(item_id)
+            except ValueError:
+                pass
+
+    for item_id, item in item_hashes.items():
+        item_key = f"news:item:{item_id}"
+        pipe.delete(item_key)
+        pipe.hset(item_key, mapping=news_item_to_hash(item))
+        pipe.expire(item_key, NEWS_TTL_SECONDS)
+
+    index_keys = {}
+    for scope, item_id_list in items_by_scope.items():
+        index_keys[f"news:idx:{scope}"] = {item_id: news_item_score(item_id, item) for item_id, item in item_id_list}
+    for label, members in sentiment_sets.items():
+        index_keys[f"news:idx:sentiment:{label}"] = members
+    for iso_date, members in date_sets.items():
+        index_keys[f"news:idx:date:{iso_date}"] = members
+
+    for key, members in index_keys.items():
+        tmp_key = f"{key}:building"
+        pipe.delete(tmp_key)
+        if members:
+            if isinstance(members, dict):
+                pipe.zadd(tmp_key, members)
+            else:
+                pipe.sadd(tmp_key, *members)
+            pipe.expire(tmp_key, NEWS_TTL_SECONDS)
+            pipe.rename(tmp_key, key)
+        else:
+            pipe.delete(key)
+    return len(item_hashes)
+
+def news_page_key(scope: str, sentiment: str, date: str, page: int, limit: int) -> str:
+    """Redis key of a precomputed /api/news response (empty sentiment/date = no filter)."""
+    return f"news:page:{scope}:{sentiment or ''}:{date or ''}:{page}:{limit}"
+
+def build_news_page(items: list, sentiment: str = None, iso_date: str = None, page: int = 1, limit: int = 5) -> dict:
+    """Same filtering and pagination as the API's get_news_from_db."""
+    if sentiment:
+        items = [news for news in items if sentiment in news.get('influence', [])]
+    if iso_date:
+        date_to_compare = datetime.strptime(iso_date, '%Y-%m-%d').strftime('%d/%m/%Y')
+        items = [news for news in items if news.get('date') == date_to_compare]
+    total_items = len(items)
+    total_pages = (total_items + limit - 1) // limit
+    start_index = (page - 1) * limit
+    return {
+        "items": items[start_index:start_index + limit],
+        "total": total_items,
+        "page": page,
+        "limit": limit,
+        "total_pages": total_pages,
+        "has_next": page < total_pages,
+        "has_prev": page > 1
+    }
+
+def push_news_pages(pipe, redis_conn, items_by_scope: dict) -> int:
+    """
+    Queue serialized /api/news responses for the common filter combinations
+    (every scope x sentiment x cached date x first pages x dashboard page sizes),
+    together with a strong ETag per body. Keys of the given scopes from the
+    previous sync that are not rewritten are deleted so removed dates cannot be
+    served stale; pages of other scopes are left untouched.
+    """
+    # Page sizes offered by the dashboard and number of pages precomputed per filter combination
+    precompute_limits = [int(x) for x in os.getenv("NEWS_PRECOMPUTE_LIMITS", "5,10").split(",") if x.strip()]
+    precompute_max_pages = int(os.getenv("NEWS_PRECOMPUTE_MAX_PAGES", "3"))
+
+    page_keys = set()
+    for scope, items in items_by_scope.items():
+        iso_dates = set()
+        for item in items:
+            try:
+                iso_dates.add(datetime.strptime(item.get('date', ''), '%d/%m/%Y').strftime('%Y-%m-%d'))
+            except ValueError:
+                pass
+        for sentiment in [None] + NEWS_SENTIMENT_LABELS:
+            for iso_date in [None] + sorted(iso_dates):
+                for limit in precompute_limits:
+                    for page in range(1, precompute_max_pages + 1):
+                        body = json.dumps(build_news_page(items, sentiment, iso_date, page, limit), ensure_ascii=False)
+                        etag = '"' + hashlib.sha1(body.encode('utf-8')).hexdigest() + '"'
+                        key = news_page_key(scope, sentiment, iso_date, page, limit)
+                        pipe.set(key, body, ex=NEWS_TTL_SECONDS)
+                        pipe.set(key.replace("news:page:", "news:etag:", 1), etag, ex=NEWS_TTL_SECONDS)
+                        page_keys.add(key)
+
+    rebuilt_scopes = set(items_by_scope)
+    stale_keys = {
+        key for key in redis_conn.smembers("news:page:keys")
+        if key.split(':')[2] in rebuilt_scopes and key not in page_keys
+    }
+    for key in stale_keys:
+        pipe.delete(key, key.replace("news:page:", "news:etag:", 1))
+    if stale_keys:
+        pipe.srem("news:page:keys", *stale_keys)
+    if page_keys:
+        pipe.sadd("news:page:keys", *page_keys)
+    return len(page_keys)
+
+def push_scope_payloads(pipe, redis_conn, items_by_scope: dict) -> int:
+    """Queue the legacy JSON blobs and precomputed pages of the given scopes."""
+    for scope, data_list in items_by_scope.items():
+        if data_list:
+            redis_key = f"news:{scope}"
+            pipe.set(redis_key, json.dumps(data_list, ensure_ascii=False), ex=NEWS_TTL_SECONDS)
+            logging.info(f"Prepared to push {len(data_list)} items for key '{redis_key}'.")
+    return push_news_pages(pipe, redis_conn, items_by_scope)
+
+def load_scope_items(redis_conn, scopes) -> dict:
+    """Read the current items of some scopes back from the Redis index (display order)."""
+    with redis_conn.pipeline(transaction=False) as pipe:
+        for scope in scopes:
+            pipe.zrevrange(f"news:idx:{scope}", 0, -1)
+        id_lists = pipe.execute()
+    items_by_scope = {}
+    for scope, item_ids in zip(scopes, id_lists):
+        with redis_conn.pipeline(transaction=False) as pipe:
+            for item_id in item_ids:
+                pipe.hgetall(f"news:item:{item_id}")
+            hashes = pipe.execute()
+        items = []
+        for fields in hashes:
+            if not fields:
+                continue
+            item = {field: fields.get(field, '') for field in NEWS_ITEM_FIELDS}
+            item['influence'] = json.loads(item['influence']) if item['influence'] else []
+            items.append(item)
+        items_by_scope[scope] = items
+    return items_by_scope
+
+def date_score(value) -> int:
+    """YYYYMMDD integer of a date/datetime."""
+    return int(value.strftime('%Y%m%d'))
+
+def record_sync_state(pipe, table_rows: dict):
+    """Queue the high-water mark and cached date window of each fully synced table."""
+    for table_name, rows in table_rows.items():
+        dates = {row['date'] for row in rows if row.get('date')}
+        pipe.delete(f"news:dates:{table_name}")
+        if dates:
+            pipe.zadd(f"news:dates:{table_name}", {value.strftime('%Y-%m-%d'): date_score(value) for value in dates})
+            pipe.expire(f"news:dates:{table_name}", NEWS_TTL_SECONDS)
+        if any(row.get('updated_at') for row in rows):
+            pipe.set(f"news:hwm:{table_name}", format_hwm(rows), ex=NEWS_TTL_SECONDS)
+    pipe.set("news:full_sync_at", int(datetime.now().timestamp()), ex=NEWS_TTL_SECONDS)
+
+def refresh_news_ttls(redis_conn):
+    """
+    Reset the TTL of every key of the cached window: item hashes, scope,
+    sentiment and date indexes, blobs, precomputed pages/ETags and the sync
+    state. Items and scopes that did not change keep being served, and if
+    syncs stop for longer than the TTL everything (sync state included)
+    expires together, so the next sync is a full one.
+    """
+    scopes = sorted({scope for table in NEWS_TABLES for scope in table_scopes(table)})
+    with redis_conn.pipeline(transaction=False) as pipe:
+        for scope in scopes:
+            pipe.zrange(f"news:idx:{scope}", 0, -1)
+        for table in NEWS_TABLES:
+            pipe.zrange(f"news:dates:{table}", 0, -1)
+        pipe.smembers("news:page:keys")
+        results = pipe.execute()
+    item_ids = {item_id for members in results[:len(scopes)] for item_id in members}
+    iso_dates = {iso_date for members in results[len(scopes):-1] for iso_date in members}
+    page_keys = results[-1]
+
+    keys = [f"news:item:{item_id}" for item_id in item_ids]
+    keys += [f"news:idx:{scope}" for scope in scopes] + [f"news:{scope}" for scope in scopes]
+    keys += [f"news:idx:sentiment:{label}" for label in NEWS_SENTIMENT_LABELS]
+    keys += [f"news:idx:date:{iso_date}" for iso_date in iso_dates]
+    keys += [key for page_key in page_keys for key in (page_key, page_key.replace("news:page:", "news:etag:", 1))]
+    keys += [f"news:hwm:{table}" for table in NEWS_TABLES] + [f"news:dates:{table}" for table in NEWS_TABLES]
+    keys.append("news:full_sync_at")
+    with redis_conn.pipeline(transaction=False) as pipe:
+        for key in keys:
+            pipe.expire(key, NEWS_TTL_SECONDS)
+        pipe.execute()
+    return len(keys)
+
 # --- UPDATED MAIN FUNCTION ---
-def sync_postgres_to_redis():
+def sync_postgres_to_redis(full: bool = False):
+    """
+    Push news to Redis. Runs an incremental sync when every table has a
+    high-water mark and a cached date window from a previous sync, otherwise
+    (or with full=True) rebuilds the five-day window from scratch. A full
+    rebuild also runs once the last one is NEWS_FULL_SYNC_SECONDS old: it is
+    how articles deleted in Postgres leave the cache.
+    """
+    if not full:
+        redis_conn = get_redis_connection()
+        hwms = redis_conn.mget([f"news:hwm:{table}" for table in NEWS_TABLES])
+        windows = redis_conn.exists(*[f"news:dates:{table}" for table in NEWS_TABLES])
+        full_sync_at = int(redis_conn.get("news:full_sync_at") or 0)
+        if datetime.now().timestamp() - full_sync_at >= NEWS_FULL_SYNC_SECONDS:
+            logging.info("Last full synchronization is too old, running full synchronization.")
+        elif all(hwms) and windows == len(NEWS_TABLES):
+            return sync_postgres_to_redis_incremental(redis_conn, dict(zip(NEWS_TABLES, hwms)))
+        else:
+            logging.info("No high-water mark or date window found, running full synchronization.")
+    return sync_postgres_to_redis_full()
+
+def sync_postgres_to_redis_full():
     logging.info("Starting synchronization process...")
     pg_conn = None
     try:
         pg_conn = get_db_connection()
         cursor = pg_conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+        table_rows = {table: [] for table in NEWS_TABLES}
         # =================================================================
         # PART 1: PROCESS GENERAL NEWS DATA AND CLASSIFY BY INDUSTRY
         # =================================================================
-        general_news_data = fetch_and_process_data_for_table(cursor, "General_News")
-        data_by_industry = {
-            "Finance": [], "Technology": [], "Energy": [], "Healthcare": [], "Other": [],
-            "all": general_news_data # Key 'all' will contain all general news
-        }
-        # Classify general news into industries
-        for news_item in general_news_data:
-            original_industry = next((key for key, value in {"Finance": "Tài chính", "Technology": "Công nghệ", "Energy": "Năng lượng", "Healthcare": "Sức khỏe", "Other": "Khác"}.items() if value == news_item['industry']), None)
-            if original_industry and original_industry in data_by_industry:
-                data_by_industry[original_industry].append(news_item)
+        general_news_indexed = fetch_and_process_data_for_table(cursor, "General_News", include_ids=True, rows_out=table_rows["General_News"])
+        indexed_by_scope = {scope: [] for scope in table_scopes("General_News")}
+        # Key 'all' will contain all general news; classify the rest into industries
+        for item_id, news_item in general_news_indexed:
+            for scope in item_scopes("General_News", news_item):
+                indexed_by_scope[scope].append((item_id, news_item))
         logging.info("Processing and classifying 'General_News' data completed.")
         # =================================================================
         # PART 2: PROCESS DATA FOR EACH COMPANY
         # =================================================================
-        company_tables = ["FPT_News", "VCB_News", "IMP_News", "GAS_News"]
-        data_by_company = {}
-        for table in company_tables:
-            company_news_data = fetch_and_process_data_for_table(cursor, table)
+        for table in NEWS_TABLES[1:]:
             # Get company name from table name, e.g., "FPT_News" -> "FPT"
             company_name = table.split('_')[0]
-            data_by_company[company_name] = company_news_data
+            indexed_by_scope[company_name] = fetch_and_process_data_for_table(cursor, table, include_ids=True, rows_out=table_rows[table])
         logging.info("Processing data for companies completed.")
         # =================================================================
         # PART 3: PUSH ALL DATA TO REDIS
         # =================================================================
         redis_conn = get_redis_connection()
-        total_records_pushed = 0
+        total_records_pushed = sum(len(indexed_by_scope[scope]) for scope in table_scopes("General_News"))
         with redis_conn.pipeline() as pipe:
-            # Push data classified by industry
-            for industry_name, data_list in data_by_industry.items():
-                if data_list:
-                    redis_key = f"news:{industry_name}"
-                    json_data = json.dumps(data_list, ensure_ascii=False)
-                    pipe.set(redis_key, json_data, ex=86400)
-                    logging.info(f"Prepared to push {len(data_list)} items for industry key '{redis_key}'.")
-                    total_records_pushed += len(data_list)
-            # Push data for each company
-            for company_name, data_list in data_by_company.items():
-                if data_list:
-                    redis_key = f"news:{company_name}" # Create new key, e.g.: news:FPT
-                    json_data = json.dumps(data_list, ensure_ascii=False)
-                    pipe.set(redis_key, json_data, ex=86400)
-                    logging.info(f"Prepared to push {len(data_list)} items for company key '{redis_key}'.")
+            # Legacy JSON blobs and serialized response pages served directly by /api/news
+            page_count = push_scope_payloads(pipe, redis_conn, {
+                scope: [item for _, item in items] for scope, items in indexed_by_scope.items()
+            })
+            logging.info(f"Prepared {page_count} precomputed news pages.")
+            # Indexed structures used by /api/news for O(page) filtering and pagination
+            indexed_count = push_news_index(pipe, indexed_by_scope)
+            logging.info(f"Prepared {indexed_count} item hashes and {len(indexed_by_scope)} scope indexes.")
+            # High-water marks for the next incremental sync
+            record_sync_state(pipe, table_rows)
+            # Bump the version so API workers drop their decoded copies
+            pipe.incr("news:version")
             pipe.execute()
         logging.info("Successfully pushed all keys to Redis.")
         return total_records_pushed # Return total number of processed records
@@ -126,6 +463,124 @@ def sync_postgres_to_redis():
         if pg_conn:
             pg_conn.close()
             logging.info("Closed PostgreSQL connection.")
+
+def sync_postgres_to_redis_incremental(redis_conn, hwms: dict):
+    """
+    Pull only rows changed since each table's high-water mark, patch item
+    hashes and index sets in place, evict dates that fell out of the
+    five-day window by score, and rebuild blobs/pages of touched scopes only.
+    The TTL of the whole window is refreshed on every run, changes or not.
+    """
+    logging.info("Starting incremental synchronization process...")
+    pg_conn = None
+    try:
+        pg_conn = get_db_connection()
+        cursor = pg_conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+
+        # 1. Changed rows per table, restricted to the cached date window
+        changed = {}
+        for table in NEWS_TABLES:
+            window = redis_conn.zrange(f"news:dates:{table}", 0, 0)
+            rows = fetch_changed_rows(cursor, table, hwms[table], window[0] if window else None)
+            rows = drop_already_synced(redis_conn, table, rows, hwms[table])
+            if rows:
+                changed[table] = rows
+        if not changed:
+            refresh_news_ttls(redis_conn)
+            logging.info("No news changes since last sync.")
+            return 0
+
+        # 2. Previous state of the changed items (to move them between sets)
+        changed_ids = [(table, news_item_id(table, row)) for table, rows in changed.items() for row in rows]
+        with redis_conn.pipeline(transaction=False) as pipe:
+            for _, item_id in changed_ids:
+                pipe.hmget(f"news:item:{item_id}", 'date', 'industry', 'influence')
+            previous_fields = dict(zip([item_id for _, item_id in changed_ids], pipe.execute()))
+
+        touched_scopes = set()
+        with redis_conn.pipeline() as pipe:
+            for table, rows in changed.items():
+                # 3. Move the date window forward and find the eviction cutoff
+                dates_key = f"news:dates:{table}"
+                current_dates = dict(redis_conn.zrange(dates_key, 0, -1, withscores=True))
+                current_dates.update({row['date'].strftime('%Y-%m-%d'): date_score(row['date']) for row in rows})
+                window = sorted(current_dates.items(), key=lambda entry: entry[1], reverse=True)[:NEWS_WINDOW_DAYS]
+                cutoff = min(score for _, score in window)
+                pipe.delete(dates_key)
+                pipe.zadd(dates_key, dict(window))
+                pipe.expire(dates_key, NEWS_TTL_SECONDS)
+
+                # 4. Patch changed items in place
+                for row in rows:
+                    if date_score(row['date']) < cutoff:
+                        continue
+                    item_id = news_item_id(table, row)
+                    item = process_news_row(row)
+                    old_date, old_industry, old_influence = previous_fields.get(item_id) or (None, None, None)
+
+                    old_scopes = item_scopes(table, {'industry': old_industry}) if old_date else []
+                    new_scopes = item_scopes(table, item)
+                    for scope in set(old_scopes) - set(new_scopes):
+                        pipe.zrem(f"news:idx:{scope}", item_id)
+                    for scope in new_scopes:
+                        pipe.zadd(f"news:idx:{scope}", {item_id: news_item_score(item_id, item)})
+                        pipe.expire(f"news:idx:{scope}", NEWS_TTL_SECONDS)
+                    touched_scopes.update(old_scopes)
+                    touched_scopes.update(new_scopes)
+
+                    for label in (json.loads(old_influence) if old_influence else []):
+                        pipe.srem(f"news:idx:sentiment:{label}", item_id)
+                    for label in item['influence']:
+                        pipe.sadd(f"news:idx:sentiment:{label}", item_id)
+                        pipe.expire(f"news:idx:sentiment:{label}", NEWS_TTL_SECONDS)
+
+                    if old_date:
+                        pipe.srem(f"news:idx:date:{datetime.strptime(old_date, '%d/%m/%Y').strftime('%Y-%m-%d')}", item_id)
+                    date_key = f"news:idx:date:{row['date'].strftime('%Y-%m-%d')}"
+                    pipe.sadd(date_key, item_id)
+                    pipe.expire(date_key, NEWS_TTL_SECONDS)
+
+                    item_key = f"news:item:{item_id}"
+                    pipe.delete(item_key)
+                    pipe.hset(item_key, mapping=news_item_to_hash(item))
+                    pipe.expire(item_key, NEWS_TTL_SECONDS)
+
+                # 5. Evict items older than the window by index score
+                cutoff_score = cutoff * 1e8
+                for scope in table_scopes(table):
+                    evicted = redis_conn.zrangebyscore(f"news:idx:{scope}", '-inf', f"({cutoff_score}")
+                    if evicted:
+                        pipe.zremrangebyscore(f"news:idx:{scope}", '-inf', f"({cutoff_score}")
+                        pipe.delete(*[f"news:item:{item_id}" for item_id in evicted])
+                        for label in ("Tích_cực", "Tiêu_cực", "Trung_tính"):
+                            pipe.srem(f"news:idx:sentiment:{label}", *evicted)
+                        touched_scopes.add(scope)
+
+                # Re-read rows sit below the mark: only rows past it move the mark forward
+                past_mark = [row for row in rows if is_past_hwm(row, hwms[table])]
+                if past_mark:
+                    pipe.set(f"news:hwm:{table}", format_hwm(past_mark), ex=NEWS_TTL_SECONDS)
+            pipe.execute()
+
+        # 6. Rebuild derived payloads of touched scopes from Redis (no Postgres traffic)
+        items_by_scope = load_scope_items(redis_conn, sorted(touched_scopes))
+        with redis_conn.pipeline() as pipe:
+            page_count = push_scope_payloads(pipe, redis_conn, items_by_scope)
+            pipe.incr("news:version")
+            pipe.execute()
+        refresh_news_ttls(redis_conn)
+
+        total_changed = sum(len(rows) for rows in changed.values())
+        logging.info(f"Incremental sync applied {total_changed} changed rows; rebuilt {len(items_by_scope)} scopes ({page_count} pages).")
+        return total_changed
+    except Exception as e:
+        logging.error(f"An error occurred during incremental synchronization: {e}")
+        raise e
+    finally:
+        if pg_conn:
+            pg_conn.close()
+            logging.info("Closed PostgreSQL connection.")
+
 # --- CREATE APPLICATION AND API ENDPOINT ---
 
 app = FastAPI()
@@ -141,13 +596,14 @@ async def health_check():
 
 
 @app.post("/push_data")
-async def trigger_sync_endpoint():
+async def trigger_sync_endpoint(full: bool = False):
     """
     This endpoint is called by n8n to trigger the data synchronization process.
+    Pass ?full=true to force a full rebuild of the five-day window.
     """
     try:
         # Call main logic function
-        record_count = sync_postgres_to_redis()
+        record_count = sync_postgres_to_redis(full=full)
         # Return success message
         return {"status": "success", "message": f"Data synced successfully. {record_count} records processed."}
     except Exception as e:
@@ -5,6 +5,9 @@ import json
 from dotenv import load_dotenv
 import os
 import logging
+import calendar
+from bisect import bisect_left, bisect_right
+from datetime import datetime, timedelta, time as dt_time
 from fastapi import FastAPI, HTTPException
 
 # --- LOGGING CONFIGURATION ---
@@ -31,181 +34,189 @@ def get_redis_connection():
     )
     return r
 
-# --- LOGIC FUNCTIONS ---
+# --- CHART PAYLOAD FORMAT ---
+# stock:{ticker}:{range} holds a columnar payload:
+#   {"format": "columnar", "fields": ["date", "close_price", ...],
+#    "columns": {"date": [...], "close_price": [...]}, "points": n, "source_points": m}
+# A row i is {field: columns[field][i]} for every field whose value is not null.
+# Ranges listed in DOWNSAMPLED_RANGES are reduced to the chart target point count.
+DOWNSAMPLED_RANGES = ("all", "5Y", "1Y")
+DEFAULT_CHART_POINTS = 300
 
-def process_rows(rows, price_column_name='close_price'):
+def lttb_downsample(rows, threshold: int, value_key: str = 'close_price'):
     """
-    Helper function to process data rows, convert and clean (for common cases).
+    Largest-Triangle-Three-Buckets downsampling of date-ordered rows.
+    Keeps the first and last point and, for every bucket in between, the
+    point forming the largest triangle with its neighbours, so peaks and
+    troughs survive at a fraction of the points.
     """
-    processed_rows = []
+    if threshold >= len(rows) or threshold < 3:
+        return rows
+
+    sampled = [rows[0]]
+    bucket_size = (len(rows) - 2) / (threshold - 2)
+    previous_index = 0
+    for bucket in range(threshold - 2):
+        # Average point of the next bucket (x is the row position)
+        next_start = int((bucket + 1) * bucket_size) + 1
+        next_end = min(int((bucket + 2) * bucket_size) + 1, len(rows))
+        next_rows = rows[next_start:next_end] or [rows[-1]]
+        avg_x = (next_start + next_end - 1) / 2.0
+        avg_y = sum(row[value_key] for row in next_rows) / len(next_rows)
+
+        # Point of the current bucket with the largest triangle area
+        start = int(bucket * bucket_size) + 1
+        end = int((bucket + 1) * bucket_size) + 1
+        previous_y = rows[previous_index][value_key]
+        best_index, best_area = start, -1.0
+        for index in range(start, end):
+            area = abs((previous_index - avg_x) * (rows[index][value_key] - previous_y)
+                       - (previous_index - index) * (avg_y - previous_y))
+            if area > best_area:
+                best_index, best_area = index, area
+        sampled.append(rows[best_index])
+        previous_index = best_index
+
+    sampled.append(rows[-1])
+    return sampled
+
+def to_columnar(rows, source_points: int = None) -> dict:
+    """Convert a list of row dicts into the columnar chart payload."""
+    fields = ['date']
     for row in rows:
-        if row.get('date') is None or row.get(price_column_name) is None:
-            logging.warning(f"Skipping row with missing data: date or {price_column_name} is NULL. Data: {row}")
-            continue
-        
-        try:
-            processed_rows.append({
-                'date': row['date'].strftime('%Y-%m-%d'),
-                'close_price': float(str(row[price_column_name]).replace(',', ''))
-            })
-        except (ValueError, TypeError) as e:
-            logging.error(f"Cannot convert value {price_column_name} to number: '{row[price_column_name]}'. Error: {e}. Skipping this row.")
-            continue
-    return processed_rows
+        for field in row:
+            if field not in fields:
+                fields.append(field)
+    return {
+        "format": "columnar",
+        "fields": fields,
+        "columns": {field: [row.get(field) for row in rows] for field in fields},
+        "points": len(rows),
+        "source_points": source_points if source_points is not None else len(rows)
+    }
 
-def process_rows_with_prediction(rows, price_column_name='close_price', keep_original_label=False):
-    """
-    Function to process data with the ability to keep the original label for predict_price.
-    """
-    processed_rows = []
-    for row in rows:
-        if row.get('date') is None or row.get(price_column_name) is None:
-            logging.warning(f"Skipping row with missing data: date or {price_column_name} is NULL. Data: {row}")
-            continue
-        
-        try:
-            processed_row = {
-                'date': row['date'].strftime('%Y-%m-%d'),
-            }
-            
-            if keep_original_label and price_column_name == 'predict_price':
-                processed_row['predict_price'] = float(str(row[price_column_name]).replace(',', ''))
-            else:
-                processed_row['close_price'] = float(str(row[price_column_name]).replace(',', ''))
-                
-            processed_rows.append(processed_row)
-        except (ValueError, TypeError) as e:
-            logging.error(f"Cannot convert value {price_column_name} to number: '{row[price_column_name]}'. Error: {e}. Skipping this row.")
-            continue
-    return processed_rows
+# --- LOGIC FUNCTIONS ---
+
+def subtract_interval(moment: datetime, years: int = 0, months: int = 0) -> datetime:
+    """Postgres `timestamp - INTERVAL 'n months/years'`: calendar months, day clamped to month end."""
+    total_months = moment.year * 12 + (moment.month - 1) - (years * 12 + months)
+    year, month = divmod(total_months, 12)
+    month += 1
+    day = min(moment.day, calendar.monthrange(year, month)[1])
+    return moment.replace(year=year, month=month, day=day)
 
-def fetch_stock_data(cursor, stock_ticker: str, time_condition: str):
+def fetch_ticker_series(cursor, stock_ticker: str):
     """
-    Helper function to fetch and process data for a stock with a specific time condition.
-    Applies to cases: all, 1Y, 5Y.
+    Read a ticker's *_Stock table once, ordered by date, as parallel arrays
+    (dates, close prices, predicted prices; None where missing or invalid).
     """
     table_name = f'"{stock_ticker}_Stock"'
-    logging.info(f"Starting to fetch data for table: {table_name} with condition: {time_condition or 'All'}...")
-    
-    query = f"""
-        SELECT "date", "close_price" 
-        FROM {table_name} 
-        {time_condition}
+    logging.info(f"Starting to fetch data for table: {table_name}...")
+    cursor.execute(f"""
+        SELECT "date", "close_price", "predict_price"
+        FROM {table_name}
+        WHERE "date" IS NOT NULL
         ORDER BY "date" ASC;
-    """
-    
-    cursor.execute(query)
+    """)
     rows = cursor.fetchall()
     logging.info(f"Fetched {len(rows)} rows.")
-    
-    return process_rows(rows, 'close_price')
-
-def fetch_stock_data_combined(cursor, stock_ticker: str, interval_str: str):
-    """
-    NEW function: Fetch historical and prediction data within a specific interval,
-    along with prediction data for the next 10 days.
-    """
-    table_name = f'"{stock_ticker}_Stock"'
-    range_label = interval_str.replace("'", "").replace(" ", "_") # e.g., '1_month'
-    logging.info(f"Starting to fetch COMBINED data ({range_label}) for table: {table_name}...")
 
-    # 1. Fetch historical data (close_price) in the given interval
-    past_historical_query = f"""
-        SELECT "date", "close_price"
-        FROM {table_name}
-        WHERE "date" >= (NOW() - INTERVAL {interval_str}) AND "date" <= NOW()::date
-        ORDER BY "date" ASC;
-    """
-    cursor.execute(past_historical_query)
-    past_historical_rows = cursor.fetchall()
-    logging.info(f"{range_label} - Past (close_price): Fetched {len(past_historical_rows)} rows.")
-    processed_past_historical = process_rows(past_historical_rows, 'close_price')
-    
-    # 2. Fetch past prediction data (if any)
-    past_prediction_query = f"""
-        SELECT "date", "predict_price"
-        FROM {table_name}
-        WHERE "date" >= (NOW() - INTERVAL {interval_str}) AND "date" < NOW()::date
-        AND "predict_price" IS NOT NULL
-        ORDER BY "date" ASC;
+    def parse(value, column):
+        if value is None:
+            return None
+        try:
+            return float(str(value).replace(',', ''))
+        except (ValueError, TypeError) as e:
+            logging.error(f"Cannot convert value {column} to number: '{value}'. Error: {e}. Skipping this row.")
+            return None
+
+    dates = [row['date'] for row in rows]
+    closes = [parse(row['close_price'], 'close_price') for row in rows]
+    predictions = [parse(row['predict_price'], 'predict_price') for row in rows]
+    return dates, closes, predictions
+
+def slice_rows(dates, values, start: int, end: int, label: str = 'close_price'):
+    """Rows {date, label} for positions [start, end) where the value is present."""
+    return [
+        {'date': dates[index].strftime('%Y-%m-%d'), label: values[index]}
+        for index in range(start, end)
+        if values[index] is not None
+    ]
+
+def build_stock_ranges(series, now: datetime) -> dict:
     """
-    cursor.execute(past_prediction_query)
-    past_prediction_rows = cursor.fetchall()
-    logging.info(f"{range_label} - Past (predict_price): Fetched {len(past_prediction_rows)} rows.")
-    processed_past_predictions = process_rows_with_prediction(past_prediction_rows, 'predict_price', keep_original_label=True)
-
-    # 3. Fetch prediction data from today to the next 10 days
-    future_query = f"""
-        SELECT "date", "predict_price"
-        FROM {table_name}
-        WHERE "date" >= NOW()::date AND "date" <= (NOW()::date + INTERVAL '10 days')
-        ORDER BY "date" ASC;
+    Derive every chart range from one ticker series with binary searches,
+    reproducing the former per-range SQL conditions:
+      all          close prices of every date
+      1Y / 5Y      close prices with date >= NOW() - INTERVAL
+      1M / 3M      close prices with NOW() - INTERVAL <= date <= today,
+                   then past predictions (date < today),
+                   then predictions for today .. today + 10 days
     """
-    cursor.execute(future_query)
-    future_rows = cursor.fetchall()
-    logging.info(f"{range_label} - Prediction: Fetched {len(future_rows)} rows.")
-    processed_future_data = process_rows_with_prediction(future_rows, 'predict_price', keep_original_label=True)
-    
-    # 4. Combine all data
-    all_past_data = processed_past_historical + processed_past_predictions
-    combined_data = all_past_data + processed_future_data
-    logging.info(f"{range_label} - Total: {len(combined_data)} rows after combining.")
-    
-    return combined_data
+    dates, closes, predictions = series
+    today = now.date()
+
+    def first_after(moment: datetime) -> int:
+        # A date compared with a timestamp is its midnight: date >= moment
+        cutoff = moment.date() if moment.time() == dt_time.min else moment.date() + timedelta(days=1)
+        return bisect_left(dates, cutoff)
+
+    today_start = bisect_left(dates, today)
+    today_end = bisect_right(dates, today)
+    future_end = bisect_right(dates, today + timedelta(days=10))
+
+    ranges = {
+        "all": slice_rows(dates, closes, 0, len(dates)),
+        "1Y": slice_rows(dates, closes, first_after(subtract_interval(now, years=1)), len(dates)),
+        "5Y": slice_rows(dates, closes, first_after(subtract_interval(now, years=5)), len(dates)),
+    }
+    future = slice_rows(dates, predictions, today_start, future_end, 'predict_price')
+    for range_key, months in (("1M", 1), ("3M", 3)):
+        start = first_after(subtract_interval(now, months=months))
+        past_historical = slice_rows(dates, closes, start, today_end)
+        past_predictions = slice_rows(dates, predictions, start, max(start, today_start), 'predict_price')
+        ranges[range_key] = past_historical + past_predictions + future
+        logging.info(f"{range_key} - Total: {len(ranges[range_key])} rows after combining.")
+    return ranges
 
 def sync_stock_data_to_redis():
     """
     Main function to synchronize stock price data from Postgres to Redis.
+    Each ticker table is read once and every range is sliced from memory.
     """
     logging.info("Starting STOCK DATA synchronization process...")
     pg_conn = None
     
     STOCKS_TO_PROCESS = ["FPT", "GAS", "IMP", "VCB"]
-    
-    # --- UPDATE: Mark 3M as a special case ---
-    TIME_RANGES = {
-        "all": "",
-        "1M": "SPECIAL_CASE",
-        "3M": "SPECIAL_CASE",
-        "1Y": "WHERE \"date\" >= NOW() - INTERVAL '1 year'",
-        "5Y": "WHERE \"date\" >= NOW() - INTERVAL '5 years'",
-    }
-
-    # --- UPDATE: Create a map to define intervals for special cases ---
-    SPECIAL_CASE_INTERVALS = {
-        "1M": "'1 month'",
-        "3M": "'3 months'"
-    }
+    TIME_RANGES = ["all", "1M", "3M", "1Y", "5Y"]
 
     try:
         pg_conn = get_db_connection()
         cursor = pg_conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
         redis_conn = get_redis_connection()
+        chart_points = int(os.getenv("STOCK_CHART_POINTS", DEFAULT_CHART_POINTS))
+
+        # Use the database clock (session time zone) like the former NOW() conditions
+        cursor.execute("SELECT NOW()::timestamp AS now;")
+        now = cursor.fetchone()['now']
 
         with redis_conn.pipeline() as pipe:
             for ticker in STOCKS_TO_PROCESS:
-                for range_key, condition in TIME_RANGES.items():
-                    stock_data = []
-                    
-                    # --- UPDATE: Logic to handle special cases flexibly ---
-                    if condition == "SPECIAL_CASE":
-                        # Get corresponding interval from map
-                        interval = SPECIAL_CASE_INTERVALS.get(range_key)
-                        if interval:
-                            # Call new combined function with corresponding interval
-                            stock_data = fetch_stock_data_combined(cursor, ticker, interval)
-                        else:
-                            logging.warning(f"Interval definition not found for special case: {range_key}")
-                    else:
-                        # Keep old logic for other cases (all, 1Y, 5Y)
-                        stock_data = fetch_stock_data(cursor, ticker, condition)
-                    
+                ranges = build_stock_ranges(fetch_ticker_series(cursor, ticker), now)
+                for range_key in TIME_RANGES:
+                    stock_data = ranges[range_key]
                     if stock_data:
                         redis_key = f"stock:{ticker}:{range_key}"
-                        json_data = json.dumps(stock_data)
+                        source_points = len(stock_data)
+                        # Long ranges are drawn a few hundred pixels wide; 1M/3M keep full resolution
+                        if range_key in DOWNSAMPLED_RANGES:
+                            stock_data = lttb_downsample(stock_data, chart_points)
+                        json_data = json.dumps(to_columnar(stock_data, source_points), separators=(',', ':'))
                         pipe.set(redis_key, json_data, ex=86400) # Expire after 1 day
-                        logging.info(f"Prepared to push {len(stock_data)} records for key '{redis_key}'.")
+                        logging.info(f"Prepared to push {len(stock_data)}/{source_points} records for key '{redis_key}'.")
 
+            # Bump the version so API workers drop their decoded copies
+            pipe.incr("stock:version")
             pipe.execute()
         
         logging.info("Successfully pushed all stock data to Redis.")
@@ -0,0 +1,218 @@
+import os
+import json
+import hashlib
+from dotenv import load_dotenv
+from fastapi import FastAPI, Request
+from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, Response
+
+# Load environment variables
+load_dotenv()
+
+from .config import current_config
+from . import async_services
+from .async_services import (
+    get_news_from_db, get_precomputed_news_page, get_bookmarks, add_bookmark, delete_bookmark,
+    get_user_from_token, get_stock_data_from_redis, check_bookmark_exists, remove_bookmark_by_article,
+    get_bookmark_statuses
+)
+from .shared import MAX_BOOKMARK_STATUS_IDS
+
+# ASGI version of app/routes.py: same endpoints, status codes and payloads,
+# with async handlers on pooled Redis / Supabase clients.
+# Run with: uvicorn asgi:app --host 0.0.0.0 --port 7860 --workers 2
+app = FastAPI(title="News Summary Dashboard API")
+
+# CORS configuration (mirrors app/routes.py)
+if current_config.ENVIRONMENT == 'production' or os.environ.get('SPACE_ID'):
+    allowed_origins = [
+        "https://*.vercel.app",
+        "https://localhost:3000",
+        "http://localhost:3000",
+        "*"  # Temporarily allow all for testing
+    ]
+else:
+    allowed_origins = ["*"]
+app.add_middleware(
+    CORSMiddleware,
+    allow_origins=allowed_origins,
+    allow_credentials=True,
+    allow_methods=["*"],
+    allow_headers=["*"]
+)
+
+@app.on_event("startup")
+async def startup():
+    await async_services.init_clients()
+
+@app.on_event("shutdown")
+async def shutdown():
+    await async_services.close_clients()
+
+# Health check endpoint
+@app.get('/api/health')
+async def health_check():
+    """Health check endpoint for monitoring"""
+    return {
+        "status": "healthy",
+        "message": "News Summary Dashboard API is running"
+    }
+
+def _conditional_json_response(request: Request, body: str, etag: str):
+    """Serve a JSON body with a strong ETag, answering 304 when If-None-Match matches."""
+    etag_value = etag.strip('"')
+    headers = {
+        "ETag": f'"{etag_value}"',
+        "Cache-Control": f"public, max-age={current_config.NEWS_CACHE_MAX_AGE}"
+    }
+    if_none_match = request.headers.get('if-none-match', '')
+    if etag_value in [tag.strip().removeprefix('W/').strip('"') for tag in if_none_match.split(',')]:
+        return Response(status_code=304, headers=headers)
+    return Response(body, media_type='application/json', headers=headers)
+
+@app.get('/api/news')
+async def news_endpoint(request: Request):
+    """
+    This endpoint will be called by the frontend.
+    It fetches data from Redis and returns it with pagination.
+    """
+    try:
+        industry_filter = request.query_params.get('industry')
+        sentiment_filter = request.query_params.get('sentiment')
+        date_filter = request.query_params.get('date')
+
+        page = int(request.query_params.get('page', 1))
+        limit = int(request.query_params.get('limit', 5))
+        if page < 1:
+            page = 1
+        if limit < 1 or limit > 100:  # Max 100 items per page
+            limit = 5
+
+        # Common combinations are precomputed by the sync agent: serve the stored bytes
+        precomputed = await get_precomputed_news_page(industry_filter, sentiment_filter, date_filter, page, limit)
+        if precomputed:
+            body, etag = precomputed
+            return _conditional_json_response(request, body, etag)
+
+        result = await get_news_from_db(
+            industry=industry_filter,
+            sentiment=sentiment_filter,
+            date=date_filter,
+            page=page,
+            limit=limit
+        )
+        body = json.dumps(result, ensure_ascii=False)
+        etag = hashlib.sha1(body.encode('utf-8')).hexdigest()
+        return _conditional_json_response(request, body, etag)
+
+    except Exception as e:
+        print(f"Error fetching news: {e}")
+        return JSONResponse({"error": "Cannot fetch data from server"}, status_code=500)
+
+# --- BOOKMARKS ---
+
+@app.get('/api/bookmarks')
+async def handle_get_bookmarks(request: Request):
+    try:
+        user = await get_user_from_token(request.headers.get('Authorization'))
+        if not user:
+            return JSONResponse({"error": "Invalid authentication"}, status_code=401)
+        return await get_bookmarks(user.id)
+    except Exception as e:
+        return JSONResponse({"error": str(e)}, status_code=500)
+
+@app.post('/api/bookmarks')
+async def handle_add_bookmark(request: Request):
+    try:
+        user = await get_user_from_token(request.headers.get('Authorization'))
+        if not user:
+            return JSONResponse({"error": "Invalid authentication"}, status_code=401)
+        article_data = await request.json()
+        new_bookmark = await add_bookmark(user.id, article_data)
+        return JSONResponse(new_bookmark, status_code=201)
+    except ValueError as e:
+        return JSONResponse({"error": str(e)}, status_code=409)  # Conflict
+    except Exception as e:
+        return JSONResponse({"error": str(e)}, status_code=500)
+
+@app.post('/api/bookmarks/toggle')
+async def handle_toggle_bookmark(request: Request):
+    """Toggle bookmark - add if not exists, remove if exists."""
+    try:
+        user = await get_user_from_token(request.headers.get('Authorization'))
+        if not user:
+            return JSONResponse({"error": "Invalid authentication"}, status_code=401)
+        article_data = await request.json()
+        article_id = (article_data.get('article_id') or
+                    article_data.get('id') or
+                    article_data.get('news_id') or
+                    str(hash(str(article_data))))
+        if await check_bookmark_exists(user.id, article_id):
+            await remove_bookmark_by_article(user.id, article_id)
+            return {"action": "removed", "bookmarked": False}
+        new_bookmark = await add_bookmark(user.id, article_data)
+        return JSONResponse({"action": "added", "bookmarked": True, "bookmark": new_bookmark}, status_code=201)
+    except Exception as e:
+        return JSONResponse({"error": str(e)}, status_code=500)
+
+@app.post('/api/bookmarks/status')
+async def handle_bookmark_status(request: Request):
+    """Batched bookmark lookup: {"article_ids": [...]} -> {"bookmarked": {id: bool}}"""
+    try:
+        user = await get_user_from_token(request.headers.get('Authorization'))
+        if not user:
+            return JSONResponse({"error": "Invalid authentication"}, status_code=401)
+        try:
+            article_ids = (await request.json() or {}).get('article_ids')
+        except ValueError:
+            article_ids = None
+        if not isinstance(article_ids, list):
+            return JSONResponse({"error": "article_ids must be a list"}, status_code=400)
+        if len(article_ids) > MAX_BOOKMARK_STATUS_IDS:
+            return JSONResponse({"error": f"At most {MAX_BOOKMARK_STATUS_IDS} article_ids per request"}, status_code=400)
+        return {"bookmarked": await get_bookmark_statuses(user.id, article_ids)}
+    except Exception as e:
+        return JSONResponse({"error": str(e)}, status_code=500)
+
+@app.delete('/api/bookmarks/{bookmark_id}')
+async def handle_delete_bookmark(bookmark_id: int, request: Request):
+    try:
+        user = await get_user_from_token(request.headers.get('Authorization'))
+        if not user:
+            return JSONResponse({"error": "Invalid authentication"}, status_code=401)
+        await delete_bookmark(user.id, bookmark_id)
+        return {"message": "Bookmark has been deleted"}
+    except Exception as e:
+        return JSONResponse({"error": str(e)}, status_code=500)
+
+@app.get('/api/stocks/{ticker}/history')
+async def stock_history_endpoint(ticker: str, request: Request):
+    """Historical price data for a stock fetched from cache on Redis."""
+    try:
+        time_range = request.query_params.get('range', 'all')
+        # ?format=columnar returns {fields, columns} arrays instead of a list of rows
+        columnar = request.query_params.get('format') == 'columnar'
+        ticker_upper = ticker.upper()
+        stock_data = await get_stock_data_from_redis(ticker_upper, time_range, columnar=columnar)
+        if not stock_data:
+            return JSONResponse({"error": f"No data found for {ticker_upper} with time range {time_range}"}, status_code=404)
+        return stock_data
+    except Exception as e:
+        print(f"Error fetching stock history: {e}")
+        return JSONResponse({"error": "Error fetching historical data from server"}, status_code=500)
+
+@app.get('/api/debug/redis-stock-keys')
+async def debug_redis_stock_keys():
+    """Debug endpoint to view keys in Redis stock"""
+    try:
+        if not async_services.redis_client_stock:
+            return JSONResponse({"error": "Redis stock connection not available"}, status_code=500)
+        keys = await async_services.get_stock_keys()
+        return {"keys": keys, "total": len(keys)}
+    except Exception as e:
+        return JSONResponse({"error": str(e)}, status_code=500)
+
+@app.get('/api/debug/payload-cache')
+async def debug_payload_cache():
+    """Debug endpoint to view hit/miss counters of this worker's payload cache"""
+    return async_services.payload_cache.stats()
@@ -0,0 +1,369 @@
+import json
+from datetime import datetime
+import redis.asyncio as aioredis
+import httpx
+from .auth import AuthUser, LocalVerificationUnavailable, bearer_token
+from .shared import (
+    config, payload_cache, token_verifier, NEWS_VERSION_KEY, STOCK_VERSION_KEY, BOOKMARK_SET_SENTINEL,
+    BOOKMARK_WRITE_LUA, BOOKMARK_STORE_LUA, BOOKMARK_STATUS_LUA, bookmark_cache_keys, bookmark_write_args,
+    _news_item_from_hash, _stock_rows_from_columnar, _stock_columnar_from_rows
+)
+
+# Async counterparts of services.py for the ASGI app (app/asgi.py).
+# Redis and Supabase are reached through connection pools that are opened once
+# per worker in init_clients() and shared by every request, so a handler waiting
+# on the network yields the event loop instead of holding a thread.
+
+redis_client_news = None
+redis_client_stock = None
+http_client = None
+
+def _empty_news_page(page, limit):
+    return {
+        "items": [],
+        "total": 0,
+        "page": page,
+        "limit": limit,
+        "total_pages": 0
+    }
+
+async def init_clients():
+    """Open the Redis pools and the Supabase HTTP client of this worker."""
+    global redis_client_news, redis_client_stock, http_client
+    try:
+        redis_client_news = aioredis.Redis(connection_pool=aioredis.ConnectionPool(
+            host=config.REDIS_HOST_NEWS,
+            port=config.REDIS_PORT_NEWS,
+            password=config.REDIS_PASSWORD_NEWS,
+            decode_responses=True,
+            max_connections=config.REDIS_MAX_CONNECTIONS
+        ))
+        await redis_client_news.ping()
+        print("Successfully created async Redis connection pool for news section.")
+    except Exception as e:
+        print(f"Error initializing async Redis News: {e}")
+        redis_client_news = None
+    try:
+        redis_client_stock = aioredis.Redis(connection_pool=aioredis.ConnectionPool(
+            host=config.REDIS_HOST_STOCK,
+            port=config.REDIS_PORT_STOCK,
+            password=config.REDIS_PASSWORD_STOCK,
+            decode_responses=True,
+            max_connections=config.REDIS_MAX_CONNECTIONS
+        ))
+        await redis_client_stock.ping()
+        print("Successfully created async Redis connection pool for stock section.")
+    except Exception as e:
+        print(f"Error initializing async Redis Stock: {e}")
+        redis_client_stock = None
+    http_client = httpx.AsyncClient(
+        base_url=config.SUPABASE_URL or "",
+        headers={
+            "apikey": config.SUPABASE_SERVICE_KEY or "",
+            "Authorization": f"Bearer {config.SUPABASE_SERVICE_KEY}"
+        },
+        limits=httpx.Limits(
+            max_connections=config.HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=config.HTTP_MAX_CONNECTIONS
+        ),
+        timeout=10.0
+    )
+
+async def close_clients():
+    """Release the pools opened by init_clients()."""
+    for client in (redis_client_news, redis_client_stock):
+        if client is not None:
+            await client.close()
+    if http_client is not None:
+        await http_client.aclose()
+
+async def _get_payload_version(client, version_key):
+    """Current sync version, or None if the agent has not published one yet."""
+    try:
+        return await client.get(version_key)
+    except Exception as e:
+        print(f"Error reading {version_key}: {e}")
+        return None
+
+async def _get_decoded_json(client, redis_key, version):
+    """GET and json.loads a Redis key, reusing the decoded object within one sync version."""
+    if version is not None:
+        cached = payload_cache.get(redis_key, version)
+        if cached is not None:
+            return cached
+    json_data = await client.get(redis_key)
+    value = json.loads(json_data) if json_data else None
+    if version is not None and value is not None:
+        payload_cache.set(redis_key, version, value)
+    return value
+
+async def _get_news_from_index(scope, sentiment=None, date=None, page=1, limit=5):
+    """Async version of services._get_news_from_index (None when the index is missing)."""
+    index_key = f"news:idx:{scope}"
+    if not await redis_client_news.exists(index_key):
+        return None
+
+    filter_keys = []
+    if sentiment:
+        filter_keys.append(f"news:idx:sentiment:{sentiment}")
+    if date:
+        try:
+            datetime.strptime(date, '%Y-%m-%d')
+            filter_keys.append(f"news:idx:date:{date}")
+        except ValueError:
+            # Skip if date format is invalid
+            print(f"Invalid date format: {date}")
+
+    start_index = (page - 1) * limit
+    end_index = start_index + limit - 1
+
+    async with redis_client_news.pipeline() as pipe:
+        if filter_keys:
+            # Weight 0 on the filter sets keeps the scope index score (display order)
+            result_key = f"news:tmp:{scope}:{sentiment or ''}:{date or ''}"
+            weights = {index_key: 1}
+            weights.update({key: 0 for key in filter_keys})
+            pipe.zinterstore(result_key, weights)
+            pipe.expire(result_key, 30)
+        else:
+            result_key = index_key
+        pipe.zcard(result_key)
+        pipe.zrevrange(result_key, start_index, end_index)
+        results = await pipe.execute()
+    total_items, item_ids = results[-2], results[-1]
+
+    async with redis_client_news.pipeline(transaction=False) as pipe:
+        for item_id in item_ids:
+            pipe.hgetall(f"news:item:{item_id}")
+        item_hashes = await pipe.execute()
+    # Item hashes may have expired between index and item reads
+    paginated_data = [_news_item_from_hash(fields) for fields in item_hashes if fields]
+
+    total_pages = (total_items + limit - 1) // limit
+    return {
+        "items": paginated_data,
+        "total": total_items,
+        "page": page,
+        "limit": limit,
+        "total_pages": total_pages,
+        "has_next": page < total_pages,
+        "has_prev": page > 1
+    }
+
+async def get_precomputed_news_page(industry=None, sentiment=None, date=None, page=1, limit=5):
+    """Serialized response body and ETag precomputed by the sync agent, or None."""
+    if not redis_client_news:
+        return None
+    key_suffix = f"{industry or 'all'}:{sentiment or ''}:{date or ''}:{page}:{limit}"
+    try:
+        body, etag = await redis_client_news.mget(f"news:page:{key_suffix}", f"news:etag:{key_suffix}")
+    except Exception as e:
+        print(f"Error reading precomputed news page: {e}")
+        return None
+    if body is None or etag is None:
+        return None
+    return body, etag
+
+async def get_news_from_db(industry=None, sentiment=None, date=None, page=1, limit=5):
+    """Async version of services.get_news_from_db (same response shape)."""
+    if not redis_client_news:
+        return _empty_news_page(page, limit)
+    scope = industry or "all"
+    news_version = await _get_payload_version(redis_client_news, NEWS_VERSION_KEY)
+    try:
+        page_key = f"news:idx:{scope}|{sentiment or ''}|{date or ''}|{page}|{limit}"
+        indexed_result = payload_cache.get(page_key, news_version) if news_version is not None else None
+        if indexed_result is None:
+            indexed_result = await _get_news_from_index(scope, sentiment, date, page, limit)
+            if indexed_result is not None and news_version is not None:
+                payload_cache.set(page_key, news_version, indexed_result)
+        if indexed_result is not None:
+            return indexed_result
+    except Exception as e:
+        print(f"Error reading news index from Redis, falling back to JSON blob: {e}")
+
+    redis_key = f"news:{industry}" if industry else "news:all"
+    try:
+        filtered_data = await _get_decoded_json(redis_client_news, redis_key, news_version)
+        if not filtered_data:
+            return _empty_news_page(page, limit)
+        if sentiment:
+            filtered_data = [news for news in filtered_data if sentiment in news.get('influence', [])]
+        if date:
+            try:
+                date_to_compare = datetime.strptime(date, '%Y-%m-%d').strftime('%d/%m/%Y')
+                filtered_data = [news for news in filtered_data if news.get('date') == date_to_compare]
+            except ValueError:
+                print(f"Invalid date format: {date}")
+        total_items = len(filtered_data)
+        total_pages = (total_items + limit - 1) // limit
+        start_index = (page - 1) * limit
+        return {
+            "items": filtered_data[start_index:start_index + limit],
+            "total": total_items,
+            "page": page,
+            "limit": limit,
+            "total_pages": total_pages,
+            "has_next": page < total_pages,
+            "has_prev": page > 1
+        }
+    except Exception as e:
+        print(f"Error processing data from Redis: {e}")
+        return _empty_news_page(page, limit)
+
+async def get_stock_data_from_redis(ticker: str, time_range: str = 'all', columnar: bool = False):
+    """Async version of services.get_stock_data_from_redis."""
+    if not redis_client_stock:
+        print("Error: Redis connection not established.")
+        return []
+    redis_key = f"stock:{ticker}:{time_range}"
+    try:
+        stock_version = await _get_payload_version(redis_client_stock, STOCK_VERSION_KEY)
+        filtered_data = await _get_decoded_json(redis_client_stock, redis_key, stock_version)
+        if not filtered_data:
+            print(f"Key '{redis_key}' does not exist in Redis.")
+            return []
+        is_columnar = isinstance(filtered_data, dict) and filtered_data.get('format') == 'columnar'
+        if columnar:
+            return filtered_data if is_columnar else _stock_columnar_from_rows(filtered_data)
+        if not is_columnar:
+            return filtered_data
+        if stock_version is None:
+            return _stock_rows_from_columnar(filtered_data)
+        return payload_cache.get_or_load(f"{redis_key}:rows", stock_version,
+                                         lambda: _stock_rows_from_columnar(filtered_data))
+    except Exception as e:
+        print(f"Error processing stock data from Redis: {e}")
+        return []
+
+async def get_stock_keys():
+    """All stock:* keys (debug endpoint)."""
+    return await redis_client_stock.keys('stock:*')
+
+# --- BOOKMARKS (Supabase Auth and PostgREST over the pooled HTTP client) ---
+
+async def get_user_from_token(authorization: str):
+    """
+    Authenticate a 'Bearer <jwt>' header; returns the user (with .id) or None.
+    Verified locally when possible, otherwise with Supabase Auth (cached briefly).
+    """
+    jwt_token = bearer_token(authorization)
+    if not jwt_token:
+        return None
+    try:
+        return await token_verifier.verify_async(jwt_token)
+    except LocalVerificationUnavailable as e:
+        print(f"Local token verification unavailable, calling Supabase Auth: {e}")
+    response = await http_client.get("/auth/v1/user", headers={"Authorization": f"Bearer {jwt_token}"})
+    if response.status_code != 200:
+        return None
+    user_data = response.json()
+    user = AuthUser({**user_data, 'sub': user_data.get('id')})
+    token_verifier.remember(jwt_token, user)
+    return user
+
+async def _bookmarks_request(method: str, params: dict, json_body=None):
+    headers = {"Prefer": "return=representation"} if method in ("POST", "DELETE") else None
+    response = await http_client.request(method, "/rest/v1/bookmarks", params=params, json=json_body, headers=headers)
+    response.raise_for_status()
+    return response.json() if response.content else []
+
+def _bookmark_cache_enabled():
+    return redis_client_news is not None and config.BOOKMARK_CACHE_TTL > 0
+
+async def _bookmark_generation(user_id: str):
+    """Write counter of the user, read before querying Supabase."""
+    return await redis_client_news.get(bookmark_cache_keys(user_id)[0]) or ''
+
+async def _store_bookmarks(user_id: str, generation, article_ids, list_rows=None):
+    """Cache what was loaded from Supabase, unless a write was applied since `generation`."""
+    list_json = json.dumps(list_rows, ensure_ascii=False) if list_rows is not None else ''
+    await redis_client_news.eval(BOOKMARK_STORE_LUA, 3, *bookmark_cache_keys(user_id), generation,
+                                 config.BOOKMARK_CACHE_TTL, BOOKMARK_SET_SENTINEL, list_json,
+                                 *[str(article_id) for article_id in article_ids])
+
+async def _invalidate_bookmark_list(user_id: str, added=(), removed=(), drop_ids=False):
+    """Write-through after a successful Supabase write (see services._invalidate_bookmark_list)."""
+    if not _bookmark_cache_enabled():
+        return
+    try:
+        await redis_client_news.eval(BOOKMARK_WRITE_LUA, 3, *bookmark_cache_keys(user_id),
+                                     config.BOOKMARK_CACHE_TTL, BOOKMARK_SET_SENTINEL,
+                                     *bookmark_write_args(added, removed, drop_ids))
+    except Exception as e:
+        print(f"Error updating bookmark cache: {e}")
+
+async def get_bookmarks(user_id: str):
+    """Get all bookmarks of a user."""
+    generation = None
+    if _bookmark_cache_enabled():
+        try:
+            cached = await redis_client_news.get(bookmark_cache_keys(user_id)[2])
+            if cached is not None:
+                return json.loads(cached)
+            generation = await _bookmark_generation(user_id)
+        except Exception as e:
+            print(f"Error reading bookmark cache: {e}")
+    rows = await _bookmarks_request("GET", {"select": "*", "user_id": f"eq.{user_id}", "order": "created_at.desc"})
+    if generation is not None:
+        try:
+            await _store_bookmarks(user_id, generation, [row['article_id'] for row in rows if row.get('article_id') is not None], rows)
+        except Exception as e:
+            print(f"Error writing bookmark cache: {e}")
+    return rows
+
+async def get_bookmark_statuses(user_id: str, article_ids: list):
+    """Which of the given article ids the user has bookmarked (article_id -> bool)."""
+    article_ids = [str(article_id) for article_id in article_ids]
+    if not article_ids:
+        return {}
+    if _bookmark_cache_enabled():
+        try:
+            ids_key = bookmark_cache_keys(user_id)[1]
+            flags = await redis_client_news.eval(BOOKMARK_STATUS_LUA, 1, ids_key, config.BOOKMARK_CACHE_TTL,
+                                                 BOOKMARK_SET_SENTINEL, *article_ids)
+            if flags is not None:
+                return {article_id: bool(flag) for article_id, flag in zip(article_ids, flags)}
+            generation = await _bookmark_generation(user_id)
+            rows = await _bookmarks_request("GET", {"select": "article_id", "user_id": f"eq.{user_id}"})
+            bookmarked = {str(row['article_id']) for row in rows if row.get('article_id') is not None}
+            await _store_bookmarks(user_id, generation, bookmarked)
+            return {article_id: article_id in bookmarked for article_id in article_ids}
+        except Exception as e:
+            print(f"Error reading bookmark cache, querying Supabase: {e}")
+    in_list = ",".join('"' + article_id.replace('"', '\\"') + '"' for article_id in article_ids)
+    rows = await _bookmarks_request("GET", {"select": "article_id", "user_id": f"eq.{user_id}", "article_id": f"in.({in_list})"})
+    bookmarked = {str(row['article_id']) for row in rows}
+    return {article_id: article_id in bookmarked for article_id in article_ids}
+
+async def check_bookmark_exists(user_id: str, article_id: str):
+    """Check if a bookmark already exists."""
+    return (await get_bookmark_statuses(user_id, [article_id]))[str(article_id)]
+
+async def add_bookmark(user_id: str, article_data: dict):
+    """Add a new bookmark with duplicate check."""
+    article_id = (article_data.get('article_id') or
+                article_data.get('id') or
+                article_data.get('news_id') or
+                str(hash(str(article_data))))
+    if await check_bookmark_exists(user_id, article_id):
+        raise ValueError("Article already bookmarked")
+    rows = await _bookmarks_request("POST", None, {
+        'user_id': user_id,
+        'article_id': article_id,
+        'article_data': article_data
+    })
+    await _invalidate_bookmark_list(user_id, added=[article_id])
+    return rows[0]
+
+async def remove_bookmark_by_article(user_id: str, article_id: str):
+    """Remove bookmark by article_id."""
+    rows = await _bookmarks_request("DELETE", {"user_id": f"eq.{user_id}", "article_id": f"eq.{article_id}"})
+    await _invalidate_bookmark_list(user_id, removed=[article_id])
+    return rows
+
+async def delete_bookmark(user_id: str, bookmark_id: int):
+    """Delete a bookmark by its ID and user_id."""
+    rows = await _bookmarks_request("DELETE", {"id": f"eq.{bookmark_id}", "user_id": f"eq.{user_id}"})
+    removed = [row['article_id'] for row in rows if row.get('article_id') is not None]
+    await _invalidate_bookmark_list(user_id, removed=removed, drop_ids=not removed)
@@ -0,0 +1,135 @@
+import time
+import asyncio
+import threading
+from collections import OrderedDict
+
+try:
+    import jwt
+except ImportError:
+    jwt = None
+
+
+class AuthUser:
+    """Minimal user object built from verified JWT claims (same .id as the Supabase user)."""
+
+    def __init__(self, claims: dict):
+        self.id = claims.get('sub')
+        self.email = claims.get('email')
+        self.role = claims.get('role')
+        self.claims = claims
+
+
+class TokenVerifier:
+    """
+    Verify Supabase access tokens locally instead of calling Supabase Auth.
+
+    Tokens are checked against SUPABASE_JWT_SECRET (HS256) when it is set,
+    otherwise against the project's JWKS endpoint. PyJWKClient caches the
+    signing keys and refetches them when a token carries an unknown key id,
+    which covers key rotation. Verified users are kept in a short-TTL cache
+    keyed by token, bounded by the token's own expiry.
+
+    verify() returns the user, None for a token that is invalid or expired,
+    and raises LocalVerificationUnavailable when the token cannot be checked
+    locally (no PyJWT, no key material, unexpected algorithm), in which case
+    the caller falls back to the remote Supabase call.
+    """
+
+    def __init__(self, supabase_url: str = None, jwt_secret: str = None,
+                 audience: str = 'authenticated', cache_ttl: int = 60, max_entries: int = 1024):
+        self.jwt_secret = jwt_secret
+        self.audience = audience
+        self.cache_ttl = cache_ttl
+        self.max_entries = max_entries
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self._jwks_client = None
+        if jwt is not None and not jwt_secret and supabase_url:
+            self._jwks_client = jwt.PyJWKClient(
+                f"{supabase_url.rstrip('/')}/auth/v1/.well-known/jwks.json",
+                cache_keys=True,
+                lifespan=3600
+            )
+
+    @property
+    def enabled(self) -> bool:
+        return jwt is not None and bool(self.jwt_secret or self._jwks_client)
+
+    def cached_user(self, token: str):
+        """User cached for this token, or None."""
+        with self._lock:
+            entry = self._cache.get(token)
+            if entry is None:
+                return None
+            user, expires_at = entry
+            if expires_at <= time.time():
+                del self._cache[token]
+                return None
+            self._cache.move_to_end(token)
+            return user
+
+    def remember(self, token: str, user, token_exp: float = None):
+        """Cache a user for at most cache_ttl seconds and never past the token expiry."""
+        if self.cache_ttl <= 0 or user is None:
+            return
+        expires_at = time.time() + self.cache_ttl
+        if token_exp:
+            expires_at = min(expires_at, token_exp)
+        with self._lock:
+            self._cache[token] = (user, expires_at)
+            self._cache.move_to_end(token)
+            while len(self._cache) > self.max_entries:
+                self._cache.popitem(last=False)
+
+    def verify(self, token: str):
+        user = self.cached_user(token)
+        if user is not None:
+            return user
+        if not self.enabled:
+            raise LocalVerificationUnavailable("Local JWT verification is not configured")
+
+        try:
+            if self.jwt_secret:
+                key, algorithms = self.jwt_secret, ['HS256']
+            else:
+                key, algorithms = self._jwks_client.get_signing_key_from_jwt(token).key, ['RS256', 'ES256']
+            claims = jwt.decode(token, key, algorithms=algorithms, audience=self.audience,
+                                options={"require": ["exp", "sub"]})
+        except (jwt.PyJWKClientError, jwt.InvalidAlgorithmError, jwt.InvalidKeyError) as e:
+            raise LocalVerificationUnavailable(str(e))
+        except jwt.InvalidTokenError as e:
+            # Bad signature, expired, wrong audience, malformed...
+            print(f"Rejected access token: {e}")
+            return None
+
+        user = AuthUser(claims)
+        self.remember(token, user, claims.get('exp'))
+        return user
+
+    async def verify_async(self, token: str):
+        """verify() for the event loop: a JWKS lookup may fetch keys over HTTP, so it runs in a thread."""
+        user = self.cached_user(token)
+        if user is not None:
+            return user
+        if self._jwks_client is not None and not self.jwt_secret:
+            return await asyncio.to_thread(self.verify, token)
+        return self.verify(token)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "mode": "secret" if self.jwt_secret else ("jwks" if self._jwks_client else "remote"),
+                "cached_tokens": len(self._cache)
+            }
+
+
+class LocalVerificationUnavailable(Exception):
+    """The token could not be verified locally; use the remote Supabase Auth call."""
+
+
+def bearer_token(auth_header: str):
+    """Token of an 'Authorization: Bearer <jwt>' header, or None."""
+    if not auth_header or not auth_header.startswith('Bearer '):
+        return None
+    return auth_header.split(' ')[1]
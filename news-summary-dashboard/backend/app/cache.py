@@ -0,0 +1,67 @@
+import threading
+from collections import OrderedDict
+
+
+class DecodedPayloadCache:
+    """
+    Per-process LRU cache of decoded Redis payloads.
+
+    Entries are keyed by (redis_key, version). The sync agents bump the
+    version counter (news:version / stock:version) every time they push, so
+    a worker decodes each payload at most once per sync and old versions
+    simply age out of the LRU.
+    """
+
+    def __init__(self, max_entries: int = 256):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, version):
+        """Return the cached object or None."""
+        with self._lock:
+            entry_key = (key, version)
+            if entry_key in self._entries:
+                self._entries.move_to_end(entry_key)
+                self.hits += 1
+                return self._entries[entry_key]
+            self.misses += 1
+            return None
+
+    def set(self, key, version, value):
+        """Store a decoded object, evicting the least recently used entry if full."""
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            entry_key = (key, version)
+            self._entries[entry_key] = value
+            self._entries.move_to_end(entry_key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get_or_load(self, key, version, loader):
+        """
+        Return the cached object, or call loader() and cache its result.
+        None results are not cached so a missing key is retried next time.
+        """
+        value = self.get(key, version)
+        if value is None:
+            value = loader()
+            if value is not None:
+                self.set(key, version, value)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses
+            }
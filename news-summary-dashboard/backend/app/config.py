@@ -32,6 +32,9 @@ class Config:
     SUPABASE_URL = os.environ.get('SUPABASE_URL')
     SUPABASE_SERVICE_KEY = os.environ.get('SUPABASE_SERVICE_KEY')
     
+    # Browser cache lifetime for /api/news responses (seconds)
+    NEWS_CACHE_MAX_AGE = int(os.environ.get('NEWS_CACHE_MAX_AGE', 60))
+    
     # Gemini API
     GEMINI_API_URL = os.environ.get('gemini_api_url')
     GEMINI_API_KEY = os.environ.get('gemini_api_key')
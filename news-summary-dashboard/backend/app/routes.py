@@ -1,13 +1,15 @@
-from flask import Flask, jsonify, request
+from flask import Flask, jsonify, request, Response
 from flask_cors import CORS
 import os
+import json
+import hashlib
 from dotenv import load_dotenv
 
 # Load environment variables
 load_dotenv()
 
 from .config import current_config
-from .services import get_news_from_db, get_bookmarks, add_bookmark, delete_bookmark, get_user_from_token, get_stock_data_from_redis, check_bookmark_exists, remove_bookmark_by_article
+from .services import get_news_from_db, get_precomputed_news_page, get_bookmarks, add_bookmark, delete_bookmark, get_user_from_token, get_stock_data_from_redis, check_bookmark_exists, remove_bookmark_by_article, get_bookmark_statuses, MAX_BOOKMARK_STATUS_IDS
 
 # Initialize Flask application
 app = Flask(__name__)
@@ -42,6 +44,20 @@ def health_check():
         "message": "News Summary Dashboard API is running"
     }), 200
 
+def _conditional_json_response(body, etag):
+    """
+    Serve a JSON body with a strong ETag and Cache-Control,
+    answering 304 Not Modified when If-None-Match matches.
+    """
+    etag_value = etag.strip('"')
+    if etag_value in request.if_none_match:
+        response = Response(status=304)
+    else:
+        response = Response(body, mimetype='application/json')
+    response.set_etag(etag_value)
+    response.headers['Cache-Control'] = f"public, max-age={current_config.NEWS_CACHE_MAX_AGE}"
+    return response
+
 # Define API endpoint named '/api/news'
 @app.route('/api/news', methods=['GET'])
 def news_endpoint():
@@ -65,6 +81,12 @@ def news_endpoint():
         if limit < 1 or limit > 100:  # Max 100 items per page
             limit = 5
 
+        # Common combinations are precomputed by the sync agent: serve the stored bytes
+        precomputed = get_precomputed_news_page(industry_filter, sentiment_filter, date_filter, page, limit)
+        if precomputed:
+            body, etag = precomputed
+            return _conditional_json_response(body, etag)
+
         # Pass all parameters to the service function
         result = get_news_from_db(
             industry=industry_filter, 
@@ -74,7 +96,9 @@ def news_endpoint():
             limit=limit
         )
 
-        return jsonify(result)   
+        body = json.dumps(result, ensure_ascii=False)
+        etag = hashlib.sha1(body.encode('utf-8')).hexdigest()
+        return _conditional_json_response(body, etag)
 
     except Exception as e:
         print(f"Error fetching news: {e}")
@@ -137,6 +161,27 @@ def handle_toggle_bookmark():
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+@app.route('/api/bookmarks/status', methods=['POST'])
+def handle_bookmark_status():
+    """
+    Batched bookmark lookup for a news list.
+    Body: {"article_ids": ["...", ...]} -> {"bookmarked": {"<article_id>": true|false}}
+    """
+    try:
+        user = get_user_from_token(request)
+        if not user:
+            return jsonify({"error": "Invalid authentication"}), 401
+
+        article_ids = (request.get_json(silent=True) or {}).get('article_ids')
+        if not isinstance(article_ids, list):
+            return jsonify({"error": "article_ids must be a list"}), 400
+        if len(article_ids) > MAX_BOOKMARK_STATUS_IDS:
+            return jsonify({"error": f"At most {MAX_BOOKMARK_STATUS_IDS} article_ids per request"}), 400
+
+        return jsonify({"bookmarked": get_bookmark_statuses(user.id, article_ids)})
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
 @app.route('/api/bookmarks/<int:bookmark_id>', methods=['DELETE'])
 def handle_delete_bookmark(bookmark_id):
     try:
@@ -158,6 +203,8 @@ def stock_history_endpoint(ticker):
     try:
         # Get 'range' parameter from URL, default to 'all' if not present
         time_range = request.args.get('range', 'all')
+        # ?format=columnar returns {fields, columns} arrays instead of a list of rows
+        columnar = request.args.get('format') == 'columnar'
         
         # Convert ticker code to uppercase for consistency
         ticker_upper = ticker.upper()
@@ -165,7 +212,7 @@ def stock_history_endpoint(ticker):
         print(f"Fetching stock data for {ticker_upper} with range {time_range}")
         
         # Call new service function with both ticker and time_range
-        stock_data = get_stock_data_from_redis(ticker_upper, time_range)
+        stock_data = get_stock_data_from_redis(ticker_upper, time_range, columnar=columnar)
 
         if not stock_data:
             return jsonify({"error": f"No data found for {ticker_upper} with time range {time_range}"}), 404
@@ -190,3 +237,10 @@ def debug_redis_stock_keys():
         return jsonify({"keys": keys, "total": len(keys)})
     except Exception as e:
         return jsonify({"error": str(e)}), 500
+
+# Debug endpoint to check the per-worker payload cache
+@app.route('/api/debug/payload-cache', methods=['GET'])
+def debug_payload_cache():
+    """Debug endpoint to view hit/miss counters of this worker's payload cache"""
+    from .services import payload_cache
+    return jsonify(payload_cache.stats())
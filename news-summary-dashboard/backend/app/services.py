@@ -4,23 +4,17 @@ from datetime import datetime
 from supabase import create_client, Client
 import os
 from dotenv import load_dotenv
+from .auth import LocalVerificationUnavailable, bearer_token
+from .shared import (
+    config, payload_cache, token_verifier, NEWS_VERSION_KEY, STOCK_VERSION_KEY, BOOKMARK_SET_SENTINEL,
+    BOOKMARK_WRITE_LUA, BOOKMARK_STORE_LUA, BOOKMARK_STATUS_LUA, MAX_BOOKMARK_STATUS_IDS,
+    bookmark_cache_keys, bookmark_write_args, _news_item_from_hash, _stock_rows_from_columnar,
+    _stock_columnar_from_rows
+)
 
 # Load environment variables
 load_dotenv()
 
-# Create config object directly instead of importing
-class Config:
-    REDIS_HOST_NEWS = os.environ.get('REDIS_HOST_NEW')
-    REDIS_PORT_NEWS = os.environ.get('REDIS_PORT_NEW') 
-    REDIS_PASSWORD_NEWS = os.environ.get('REDIS_PASSWORD_NEW')
-    REDIS_HOST_STOCK = os.environ.get('REDIS_HOST_STOCK')
-    REDIS_PORT_STOCK = os.environ.get('REDIS_PORT_STOCK')
-    REDIS_PASSWORD_STOCK = os.environ.get('REDIS_PASSWORD_STOCK')
-    SUPABASE_URL = os.environ.get('SUPABASE_URL')
-    SUPABASE_SERVICE_KEY = os.environ.get('SUPABASE_SERVICE_KEY')
-
-config = Config()
-
 # --- Redis for news section ---
 try:
     pool_news = redis.ConnectionPool(
@@ -59,6 +53,100 @@ except Exception as e:
     print(f"Supabase connection error: {e}")
     supabase = None
 
+def _get_payload_version(client, version_key):
+    """Current sync version, or None if the agent has not published one yet."""
+    try:
+        return client.get(version_key)
+    except Exception as e:
+        print(f"Error reading {version_key}: {e}")
+        return None
+
+def _get_decoded_json(client, redis_key, version):
+    """GET and json.loads a Redis key, reusing the decoded object within one sync version."""
+    def load():
+        json_data = client.get(redis_key)
+        return json.loads(json_data) if json_data else None
+    if version is None:
+        return load()
+    return payload_cache.get_or_load(redis_key, version, load)
+
+def _get_news_from_index(scope, sentiment=None, date=None, page=1, limit=5):
+    """
+    Answer a news page from the indexed Redis structures.
+    Filters are applied with ZINTERSTORE inside Redis and only one page of
+    item hashes is fetched, so the cost is O(page size) on this side.
+    Returns None when the index has not been built yet.
+    """
+    index_key = f"news:idx:{scope}"
+    if not redis_client_news.exists(index_key):
+        return None
+
+    filter_keys = []
+    if sentiment:
+        print(f"Filtering with sentiment: {sentiment}")
+        filter_keys.append(f"news:idx:sentiment:{sentiment}")
+    if date:
+        print(f"Filtering with date: {date}")
+        try:
+            datetime.strptime(date, '%Y-%m-%d')
+            filter_keys.append(f"news:idx:date:{date}")
+        except ValueError:
+            # Skip if date format is invalid
+            print(f"Invalid date format: {date}")
+
+    start_index = (page - 1) * limit
+    end_index = start_index + limit - 1
+
+    with redis_client_news.pipeline() as pipe:
+        if filter_keys:
+            # Weight 0 on the filter sets keeps the scope index score (display order)
+            result_key = f"news:tmp:{scope}:{sentiment or ''}:{date or ''}"
+            weights = {index_key: 1}
+            weights.update({key: 0 for key in filter_keys})
+            pipe.zinterstore(result_key, weights)
+            pipe.expire(result_key, 30)
+        else:
+            result_key = index_key
+        pipe.zcard(result_key)
+        pipe.zrevrange(result_key, start_index, end_index)
+        results = pipe.execute()
+    total_items, item_ids = results[-2], results[-1]
+
+    with redis_client_news.pipeline(transaction=False) as pipe:
+        for item_id in item_ids:
+            pipe.hgetall(f"news:item:{item_id}")
+        item_hashes = pipe.execute()
+    # Item hashes may have expired between index and item reads
+    paginated_data = [_news_item_from_hash(fields) for fields in item_hashes if fields]
+
+    total_pages = (total_items + limit - 1) // limit
+    return {
+        "items": paginated_data,
+        "total": total_items,
+        "page": page,
+        "limit": limit,
+        "total_pages": total_pages,
+        "has_next": page < total_pages,
+        "has_prev": page > 1
+    }
+
+def get_precomputed_news_page(industry=None, sentiment=None, date=None, page=1, limit=5):
+    """
+    Serialized response body and ETag precomputed by the sync agent, or None.
+    One MGET round trip and no JSON processing.
+    """
+    if not redis_client_news:
+        return None
+    key_suffix = f"{industry or 'all'}:{sentiment or ''}:{date or ''}:{page}:{limit}"
+    try:
+        body, etag = redis_client_news.mget(f"news:page:{key_suffix}", f"news:etag:{key_suffix}")
+    except Exception as e:
+        print(f"Error reading precomputed news page: {e}")
+        return None
+    if body is None or etag is None:
+        return None
+    return body, etag
+
 # --- FUNCTION TO GET UPDATED DATA WITH PAGINATION ---
 def get_news_from_db(industry=None, sentiment=None, date=None, page=1, limit=5):
     if not redis_client_news:
@@ -69,12 +157,28 @@ def get_news_from_db(industry=None, sentiment=None, date=None, page=1, limit=5):
             "limit": limit,
             "total_pages": 0
         }
+    # 0. Prefer the indexed structures; fall back to the legacy JSON blob
+    scope = industry or "all"
+    news_version = _get_payload_version(redis_client_news, NEWS_VERSION_KEY)
+    try:
+        page_key = f"news:idx:{scope}|{sentiment or ''}|{date or ''}|{page}|{limit}"
+        if news_version is None:
+            indexed_result = _get_news_from_index(scope, sentiment, date, page, limit)
+        else:
+            indexed_result = payload_cache.get_or_load(
+                page_key, news_version,
+                lambda: _get_news_from_index(scope, sentiment, date, page, limit)
+            )
+        if indexed_result is not None:
+            return indexed_result
+    except Exception as e:
+        print(f"Error reading news index from Redis, falling back to JSON blob: {e}")
     # 1. Determine Redis key to get industry data
     redis_key = f"news:{industry}" if industry else "news:all"
     print(f"Fetching data from Redis with key: '{redis_key}' - Page: {page}, Limit: {limit}")
     try:
-        json_data = redis_client_news.get(redis_key)
-        if not json_data:
+        filtered_data = _get_decoded_json(redis_client_news, redis_key, news_version)
+        if not filtered_data:
             return {
                 "items": [],
                 "total": 0,
@@ -82,7 +186,6 @@ def get_news_from_db(industry=None, sentiment=None, date=None, page=1, limit=5):
                 "limit": limit,
                 "total_pages": 0
             }
-        filtered_data = json.loads(json_data)
         # 2. FILTER BY SENTIMENT (IF ANY)
         if sentiment:
             print(f"Filtering with sentiment: {sentiment}")
@@ -136,23 +239,102 @@ def get_news_from_db(industry=None, sentiment=None, date=None, page=1, limit=5):
 # --- NEW FUNCTIONS FOR BOOKMARKS ---
 
 def get_user_from_token(request):
-    """Authenticate JWT and get user information."""
-    auth_header = request.headers.get('Authorization')
-    if not auth_header or not auth_header.startswith('Bearer '):
+    """
+    Authenticate JWT and get user information.
+    The signature is verified locally; Supabase Auth is only called when the
+    token cannot be checked locally, and its answer is cached briefly.
+    """
+    jwt_token = bearer_token(request.headers.get('Authorization'))
+    if not jwt_token:
         return None
-    jwt_token = auth_header.split(' ')[1]
-    user_response = supabase.auth.get_user(jwt_token)
-    return user_response.user
+    try:
+        return token_verifier.verify(jwt_token)
+    except LocalVerificationUnavailable as e:
+        print(f"Local token verification unavailable, calling Supabase Auth: {e}")
+    user = supabase.auth.get_user(jwt_token).user
+    token_verifier.remember(jwt_token, user)
+    return user
+
+# --- BOOKMARK CACHE (news Redis) ---
+# Layout and consistency rules: see the BOOKMARK CACHE section of shared.py.
+def _bookmark_cache_enabled():
+    return redis_client_news is not None and config.BOOKMARK_CACHE_TTL > 0
+
+def _bookmark_generation(user_id: str):
+    """Write counter of the user, read before querying Supabase."""
+    return redis_client_news.get(bookmark_cache_keys(user_id)[0]) or ''
+
+def _store_bookmarks(user_id: str, generation, article_ids, list_rows=None):
+    """Cache what was loaded from Supabase, unless a write was applied since `generation`."""
+    list_json = json.dumps(list_rows, ensure_ascii=False) if list_rows is not None else ''
+    redis_client_news.eval(BOOKMARK_STORE_LUA, 3, *bookmark_cache_keys(user_id), generation,
+                           config.BOOKMARK_CACHE_TTL, BOOKMARK_SET_SENTINEL, list_json,
+                           *[str(article_id) for article_id in article_ids])
+
+def _invalidate_bookmark_list(user_id: str, added=(), removed=(), drop_ids=False):
+    """Write-through after a successful Supabase write (drop_ids when the change is unknown)."""
+    if not _bookmark_cache_enabled():
+        return
+    try:
+        redis_client_news.eval(BOOKMARK_WRITE_LUA, 3, *bookmark_cache_keys(user_id),
+                               config.BOOKMARK_CACHE_TTL, BOOKMARK_SET_SENTINEL,
+                               *bookmark_write_args(added, removed, drop_ids))
+    except Exception as e:
+        print(f"Error updating bookmark cache: {e}")
 
 def get_bookmarks(user_id: str):
     """Get all bookmarks of a user."""
+    generation = None
+    if _bookmark_cache_enabled():
+        try:
+            cached = redis_client_news.get(bookmark_cache_keys(user_id)[2])
+            if cached is not None:
+                return json.loads(cached)
+            generation = _bookmark_generation(user_id)
+        except Exception as e:
+            print(f"Error reading bookmark cache: {e}")
     response = supabase.table('bookmarks').select('*').eq('user_id', user_id).order('created_at', desc=True).execute()
+    if generation is not None:
+        try:
+            article_ids = [row['article_id'] for row in response.data if row.get('article_id') is not None]
+            _store_bookmarks(user_id, generation, article_ids, response.data)
+        except Exception as e:
+            print(f"Error writing bookmark cache: {e}")
     return response.data
 
 def check_bookmark_exists(user_id: str, article_id: str):
     """Check if a bookmark already exists."""
-    response = supabase.table('bookmarks').select('id').eq('user_id', user_id).eq('article_id', article_id).execute()
-    return len(response.data) > 0
+    return get_bookmark_statuses(user_id, [article_id])[str(article_id)]
+
+def get_bookmark_statuses(user_id: str, article_ids: list):
+    """
+    Which of the given article ids the user has bookmarked.
+    Answered from the cached id set in one round trip; on a miss the user's
+    ids are loaded with one Supabase query and cached.
+
+    Returns:
+        Dict mapping article_id (str) -> bool
+    """
+    article_ids = [str(article_id) for article_id in article_ids]
+    if not article_ids:
+        return {}
+    if _bookmark_cache_enabled():
+        try:
+            ids_key = bookmark_cache_keys(user_id)[1]
+            flags = redis_client_news.eval(BOOKMARK_STATUS_LUA, 1, ids_key, config.BOOKMARK_CACHE_TTL,
+                                           BOOKMARK_SET_SENTINEL, *article_ids)
+            if flags is not None:
+                return {article_id: bool(flag) for article_id, flag in zip(article_ids, flags)}
+            generation = _bookmark_generation(user_id)
+            response = supabase.table('bookmarks').select('article_id').eq('user_id', user_id).execute()
+            bookmarked = {str(row['article_id']) for row in response.data if row.get('article_id') is not None}
+            _store_bookmarks(user_id, generation, bookmarked)
+            return {article_id: article_id in bookmarked for article_id in article_ids}
+        except Exception as e:
+            print(f"Error reading bookmark cache, querying Supabase: {e}")
+    response = supabase.table('bookmarks').select('article_id').eq('user_id', user_id).in_('article_id', article_ids).execute()
+    bookmarked = {str(row['article_id']) for row in response.data}
+    return {article_id: article_id in bookmarked for article_id in article_ids}
 
 def add_bookmark(user_id: str, article_data: dict):
     """Add a new bookmark with duplicate check."""
@@ -170,23 +352,29 @@ def add_bookmark(user_id: str, article_data: dict):
         'article_id': article_id,
         'article_data': article_data
     }).execute()
+    _invalidate_bookmark_list(user_id, added=[article_id])
     return response.data[0]
 
 def remove_bookmark_by_article(user_id: str, article_id: str):
     """Remove bookmark by article_id."""
     response = supabase.table('bookmarks').delete().eq('user_id', user_id).eq('article_id', article_id).execute()
+    _invalidate_bookmark_list(user_id, removed=[article_id])
     return response.data
 
 def delete_bookmark(user_id: str, bookmark_id: int):
     """Delete a bookmark by its ID and user_id."""
-    supabase.table('bookmarks').delete().eq('id', bookmark_id).eq('user_id', user_id).execute()
+    response = supabase.table('bookmarks').delete().eq('id', bookmark_id).eq('user_id', user_id).execute()
+    removed = [row['article_id'] for row in (response.data or []) if row.get('article_id') is not None]
+    _invalidate_bookmark_list(user_id, removed=removed, drop_ids=not removed)
 
 # Open services.py and add this function at the end of the file
 
-def get_stock_data_from_redis(ticker: str, time_range: str = 'all'):
+def get_stock_data_from_redis(ticker: str, time_range: str = 'all', columnar: bool = False):
     """
     Get historical price data of a stock from cache on Redis.
     This function takes a ticker and time range (e.g.: '1M', '1Y', 'all').
+    Returns a list of {date, close_price | predict_price} rows, or the
+    compact columnar payload written by the agent when columnar=True.
     """
     if not redis_client_stock:
         print("Error: Redis connection not established.")
@@ -196,15 +384,24 @@ def get_stock_data_from_redis(ticker: str, time_range: str = 'all'):
     redis_key = f"stock:{ticker}:{time_range}"
     print(f"Fetching data from Redis with key: '{redis_key}'")
     try:
-        # 2. Get JSON string data from Redis
-        json_data = redis_client_stock.get(redis_key)
+        # 2. Get decoded data (parsed once per sync version in this worker)
+        stock_version = _get_payload_version(redis_client_stock, STOCK_VERSION_KEY)
+        filtered_data = _get_decoded_json(redis_client_stock, redis_key, stock_version)
         # 3. Check if key exists
-        if not json_data:
+        if not filtered_data:
             print(f"Key '{redis_key}' does not exist in Redis.")
             return []
-        # 4. Convert JSON string to Python object and return
-        filtered_data = json.loads(json_data)
-        return filtered_data
+        is_columnar = isinstance(filtered_data, dict) and filtered_data.get('format') == 'columnar'
+        if columnar:
+            return filtered_data if is_columnar else _stock_columnar_from_rows(filtered_data)
+        if not is_columnar:
+            # Payload written by an older agent
+            return filtered_data
+        # Expand once per sync version, like the decoded payload itself
+        if stock_version is None:
+            return _stock_rows_from_columnar(filtered_data)
+        return payload_cache.get_or_load(f"{redis_key}:rows", stock_version,
+                                         lambda: _stock_rows_from_columnar(filtered_data))
     except Exception as e:
         print(f"Error processing stock data from Redis: {e}")
         return []
\ No newline at end of file
@@ -0,0 +1,159 @@
+import os
+import json
+from dotenv import load_dotenv
+from .cache import DecodedPayloadCache
+from .auth import TokenVerifier
+
+# Configuration, caches and payload helpers shared by services.py (Flask) and
+# async_services.py (ASGI). Importing this module opens no connections.
+
+# Load environment variables
+load_dotenv()
+
+# Create config object directly instead of importing
+class Config:
+    REDIS_HOST_NEWS = os.environ.get('REDIS_HOST_NEW')
+    REDIS_PORT_NEWS = os.environ.get('REDIS_PORT_NEW') 
+    REDIS_PASSWORD_NEWS = os.environ.get('REDIS_PASSWORD_NEW')
+    REDIS_HOST_STOCK = os.environ.get('REDIS_HOST_STOCK')
+    REDIS_PORT_STOCK = os.environ.get('REDIS_PORT_STOCK')
+    REDIS_PASSWORD_STOCK = os.environ.get('REDIS_PASSWORD_STOCK')
+    SUPABASE_URL = os.environ.get('SUPABASE_URL')
+    SUPABASE_SERVICE_KEY = os.environ.get('SUPABASE_SERVICE_KEY')
+    # Project JWT secret (Settings > API); without it tokens are checked against the JWKS endpoint
+    SUPABASE_JWT_SECRET = os.environ.get('SUPABASE_JWT_SECRET')
+    # Seconds a verified token -> user mapping is reused (0 disables)
+    AUTH_TOKEN_CACHE_TTL = int(os.environ.get('AUTH_TOKEN_CACHE_TTL', 60))
+    # Seconds a user's bookmark set/list stays cached in Redis (0 disables)
+    BOOKMARK_CACHE_TTL = int(os.environ.get('BOOKMARK_CACHE_TTL', 3600))
+    # Decoded payloads kept per worker process (0 disables the cache)
+    PAYLOAD_CACHE_SIZE = int(os.environ.get('PAYLOAD_CACHE_SIZE', 256))
+    # Connection pool sizes of the async API (app/asgi.py), per worker
+    REDIS_MAX_CONNECTIONS = int(os.environ.get('REDIS_MAX_CONNECTIONS', 50))
+    HTTP_MAX_CONNECTIONS = int(os.environ.get('HTTP_MAX_CONNECTIONS', 100))
+
+config = Config()
+
+# Per-worker cache of decoded Redis payloads, invalidated by the agents' version counters
+payload_cache = DecodedPayloadCache(config.PAYLOAD_CACHE_SIZE)
+NEWS_VERSION_KEY = "news:version"
+STOCK_VERSION_KEY = "stock:version"
+
+# Local verification of Supabase access tokens (falls back to supabase.auth.get_user)
+token_verifier = TokenVerifier(
+    supabase_url=config.SUPABASE_URL,
+    jwt_secret=config.SUPABASE_JWT_SECRET,
+    cache_ttl=config.AUTH_TOKEN_CACHE_TTL
+)
+
+# --- BOOKMARK CACHE (news Redis) ---
+# bookmarks:ids:{user_id}    set of bookmarked article_ids plus a sentinel member,
+#                            so an empty-but-loaded set is distinguishable from a miss
+# bookmarks:list:{user_id}   JSON list returned by GET /api/bookmarks
+# bookmarks:gen:{user_id}    write counter; a reader only stores what it loaded from
+#                            Supabase if no write was applied while it was querying
+# Writes go to Supabase first, then BOOKMARK_WRITE_LUA bumps the counter, drops the
+# list and updates the id set in place. All checks run inside Redis, so a
+# concurrent loader can neither leave a partial set nor write back stale ids.
+BOOKMARK_SET_SENTINEL = "__loaded__"
+
+def bookmark_cache_keys(user_id) -> tuple:
+    """(generation, id set, list) keys of a user's bookmark cache."""
+    return (f"bookmarks:gen:{user_id}", f"bookmarks:ids:{user_id}", f"bookmarks:list:{user_id}")
+
+# KEYS: gen, ids, list  ARGV: ttl, sentinel, 'add' | 'remove' | 'drop', article_id...
+BOOKMARK_WRITE_LUA = """
+redis.call('INCR', KEYS[1])
+redis.call('EXPIRE', KEYS[1], ARGV[1])
+redis.call('DEL', KEYS[3])
+if ARGV[3] == 'drop' then
+    redis.call('DEL', KEYS[2])
+elseif ARGV[3] == 'add' then
+    if redis.call('SISMEMBER', KEYS[2], ARGV[2]) == 1 then
+        for i = 4, #ARGV do redis.call('SADD', KEYS[2], ARGV[i]) end
+    end
+else
+    for i = 4, #ARGV do redis.call('SREM', KEYS[2], ARGV[i]) end
+end
+return 1
+"""
+
+# KEYS: gen, ids, list  ARGV: generation read before the query, ttl, sentinel,
+# list JSON ('' keeps the list key untouched), article_id...
+BOOKMARK_STORE_LUA = """
+if (redis.call('GET', KEYS[1]) or '') ~= ARGV[1] then
+    return 0
+end
+redis.call('DEL', KEYS[2])
+redis.call('SADD', KEYS[2], ARGV[3])
+for i = 5, #ARGV do redis.call('SADD', KEYS[2], ARGV[i]) end
+redis.call('EXPIRE', KEYS[2], ARGV[2])
+if ARGV[4] ~= '' then
+    redis.call('SET', KEYS[3], ARGV[4], 'EX', ARGV[2])
+end
+return 1
+"""
+
+# KEYS: ids  ARGV: ttl, sentinel, article_id...
+# Returns nil when the set is not loaded, else one 0/1 flag per article_id
+BOOKMARK_STATUS_LUA = """
+if redis.call('SISMEMBER', KEYS[1], ARGV[2]) == 0 then
+    return false
+end
+redis.call('EXPIRE', KEYS[1], ARGV[1])
+local flags = {}
+for i = 3, #ARGV do flags[#flags + 1] = redis.call('SISMEMBER', KEYS[1], ARGV[i]) end
+return flags
+"""
+
+def bookmark_write_args(added=(), removed=(), drop_ids=False) -> list:
+    """Mode and ids passed to BOOKMARK_WRITE_LUA for one Supabase write."""
+    if drop_ids:
+        return ['drop']
+    if added:
+        return ['add'] + [str(article_id) for article_id in added]
+    return ['remove'] + [str(article_id) for article_id in removed]
+
+# Upper bound of ids accepted by /api/bookmarks/status
+MAX_BOOKMARK_STATUS_IDS = 200
+
+# Fields of a news item hash written by the sync agent (see agent/push_data_news_to_Redis.py)
+NEWS_ITEM_FIELDS = ['date', 'industry', 'title', 'summary', 'link', 'influence']
+
+def _news_item_from_hash(fields: dict) -> dict:
+    """Rebuild the API news item from its Redis hash."""
+    item = {field: fields.get(field, '') for field in NEWS_ITEM_FIELDS}
+    try:
+        item['influence'] = json.loads(item['influence']) if item['influence'] else []
+    except ValueError:
+        item['influence'] = []
+    return item
+
+def _stock_rows_from_columnar(payload: dict) -> list:
+    """Expand a columnar chart payload into the legacy list of row dicts."""
+    fields = payload.get('fields', [])
+    columns = payload.get('columns', {})
+    rows = []
+    for index in range(payload.get('points', 0)):
+        row = {}
+        for field in fields:
+            value = columns[field][index]
+            if value is not None:
+                row[field] = value
+        rows.append(row)
+    return rows
+
+def _stock_columnar_from_rows(rows: list) -> dict:
+    """Build a columnar chart payload from a legacy list of row dicts."""
+    fields = ['date']
+    for row in rows:
+        for field in row:
+            if field not in fields:
+                fields.append(field)
+    return {
+        "format": "columnar",
+        "fields": fields,
+        "columns": {field: [row.get(field) for row in rows] for field in fields},
+        "points": len(rows),
+        "source_points": len(rows)
+    }
@@ -0,0 +1,23 @@
+#!/usr/bin/env python3
+"""
+ASGI entry point (async API mode)
+Serves the same endpoints as wsgi.py with async handlers and pooled clients.
+Run with: uvicorn asgi:app --host 0.0.0.0 --port 7860 --workers 2
+"""
+import os
+import sys
+from dotenv import load_dotenv
+
+# Load environment variables first
+load_dotenv()
+
+# Add current directory to Python path to ensure imports work
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, current_dir)
+
+from app.asgi import app
+
+if __name__ == '__main__':
+    import uvicorn
+    # Force port 7860 for HF Spaces (ignore PORT from .env to avoid DB port conflict)
+    uvicorn.run("asgi:app", host='0.0.0.0', port=7860, workers=int(os.environ.get('WEB_CONCURRENCY', 2)))
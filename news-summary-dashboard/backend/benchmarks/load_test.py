@@ -0,0 +1,431 @@
+#!/usr/bin/env python3
+"""
+Load test / latency benchmark for the dashboard API
+
+Seeds an in-process Redis stand-in (fakeredis) or a local Redis with payloads
+produced by the real sync agents, then drives the Flask app from a pool of
+threads and reports throughput and p50/p95/p99 latency per route as JSON.
+
+The agents run unchanged against synthetic Postgres rows (a cursor stand-in
+serving generated News/Stock tables), so the Redis layout is exactly what
+production serves. Supabase is replaced by an in-memory bookmarks table with
+an optional simulated round-trip latency.
+
+Usage:
+    python benchmarks/load_test.py --concurrency 16 --requests 500
+    python benchmarks/load_test.py --redis-url redis://localhost:6379/15 --output results.json
+    python benchmarks/load_test.py --routes news,stock --news-per-day 200
+
+Requires fakeredis (pip install fakeredis) unless --redis-url is given.
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import random
+import argparse
+import threading
+from datetime import date, datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+
+# Add backend and agent directories for imports
+current_dir = os.path.dirname(os.path.abspath(__file__))
+backend_dir = os.path.dirname(current_dir)
+sys.path.insert(0, backend_dir)
+sys.path.insert(0, os.path.join(backend_dir, 'agent'))
+
+SENTIMENTS = ["Positive", "Negative", "Neutral"]
+INDUSTRIES = ["Finance", "Technology", "Energy", "Healthcare", "Other"]
+TICKERS = ["FPT", "GAS", "IMP", "VCB"]
+FILTER_SENTIMENTS = [None, "Tích_cực", "Tiêu_cực", "Trung_tính"]
+STOCK_RANGES = ["all", "1M", "3M", "1Y", "5Y"]
+BENCH_USER_ID = "00000000-0000-0000-0000-000000000001"
+BENCH_TOKEN = "benchmark-token"
+
+
+# --- SYNTHETIC DATA ---
+
+def generate_news_tables(days: int = 7, per_day: int = 60, seed: int = 42) -> dict:
+    """Rows of every *_News table as the agent selects them."""
+    rng = random.Random(seed)
+    today = date.today()
+    tables = {}
+    row_id = 1
+    for table in ["General_News", "FPT_News", "VCB_News", "IMP_News", "GAS_News"]:
+        rows = []
+        for offset in range(days):
+            day = today - timedelta(days=offset)
+            for _ in range(per_day if table == "General_News" else max(1, per_day // 4)):
+                row = {
+                    'id': row_id,
+                    'date': day,
+                    'title': f"Tin {table} số {row_id}: thị trường biến động",
+                    'ai_summary': "Tóm tắt: " + " ".join(["thông tin"] * rng.randint(20, 60)),
+                    'sentiment': rng.choice(SENTIMENTS),
+                    'link': f"https://example.com/{table.lower()}/{row_id}",
+                    'updated_at': datetime.combine(day, datetime.min.time()) + timedelta(minutes=rng.randint(0, 1439))
+                }
+                if table == "General_News":
+                    row['industry'] = rng.choice(INDUSTRIES)
+                rows.append(row)
+                row_id += 1
+        # Newest first, like ORDER BY date DESC, id DESC
+        rows.sort(key=lambda r: (r['date'], r['id']), reverse=True)
+        tables[table] = rows
+    return tables
+
+def generate_stock_tables(years: int = 8, seed: int = 7) -> dict:
+    """Daily rows of every *_Stock table (close prices in the past, predictions ahead)."""
+    rng = random.Random(seed)
+    today = date.today()
+    tables = {}
+    for ticker in TICKERS:
+        price = rng.uniform(20, 120)
+        rows = []
+        day = today - timedelta(days=365 * years)
+        while day <= today + timedelta(days=10):
+            if day.weekday() < 5:
+                price = max(1.0, price * (1 + rng.gauss(0, 0.015)))
+                past = day < today
+                rows.append({
+                    'date': day,
+                    'close_price': f"{price:,.2f}" if past else None,
+                    'predict_price': round(price * (1 + rng.gauss(0, 0.01)), 2) if day >= today - timedelta(days=60) else None
+                })
+            day += timedelta(days=1)
+        tables[f"{ticker}_Stock"] = rows
+    return tables
+
+def touch_news_rows(tables: dict, count: int, seed: int = 3) -> int:
+    """Retitle `count` rows per table and move their updated_at past every existing one."""
+    rng = random.Random(seed)
+    latest = max(row['updated_at'] for rows in tables.values() for row in rows)
+    touched = 0
+    for rows in tables.values():
+        for row in rng.sample(rows, min(count, len(rows))):
+            touched += 1
+            row['title'] += " (cập nhật)"
+            row['updated_at'] = latest + timedelta(seconds=touched)
+    return touched
+
+
+class SyntheticCursor:
+    """psycopg2 RealDictCursor stand-in answering the agents' SELECTs from generated tables."""
+
+    _table_pattern = re.compile(r'FROM\s+"(\w+)"')
+
+    def __init__(self, tables: dict):
+        self.tables = tables
+        self._result = []
+
+    def execute(self, query, params=None):
+        if "NOW()::timestamp" in query:
+            self._result = [{'now': datetime.now()}]
+            return
+        match = self._table_pattern.search(query)
+        rows = self.tables.get(match.group(1), []) if match else []
+        if '"updated_at" >' in query:
+            # fetch_changed_rows: updated_at > mark - lag [AND date >= window start], (updated_at, id) order
+            since = datetime.fromisoformat(str(params[0])) - timedelta(seconds=params[1])
+            rows = [row for row in rows if row['updated_at'] > since and row['date'] is not None]
+            if len(params) > 2:
+                rows = [row for row in rows if row['date'].isoformat() >= str(params[2])]
+            rows = sorted(rows, key=lambda r: (r['updated_at'], r['id']))
+        elif "_News" in (match.group(1) if match else ""):
+            latest = sorted({row['date'] for row in rows}, reverse=True)[:5]
+            rows = [row for row in rows if row['date'] in latest]
+        self._result = [dict(row) for row in rows]
+
+    def fetchall(self):
+        return self._result
+
+    def fetchone(self):
+        return self._result[0] if self._result else None
+
+
+class SyntheticConnection:
+    def __init__(self, tables: dict):
+        self.tables = tables
+
+    def cursor(self, cursor_factory=None):
+        return SyntheticCursor(self.tables)
+
+    def close(self):
+        pass
+
+
+# --- SUPABASE STAND-IN (bookmarks table only) ---
+
+class _Result:
+    def __init__(self, data):
+        self.data = data
+
+
+class _BookmarksQuery:
+    def __init__(self, store, latency):
+        self.store = store
+        self.latency = latency
+        self.filters = []
+        self.action = 'select'
+        self.payload = None
+        self.order_desc = None
+
+    def select(self, *columns):
+        return self
+
+    def eq(self, column, value):
+        self.filters.append(lambda row: str(row.get(column)) == str(value))
+        return self
+
+    def in_(self, column, values):
+        values = {str(value) for value in values}
+        self.filters.append(lambda row: str(row.get(column)) in values)
+        return self
+
+    def order(self, column, desc=False):
+        self.order_desc = (column, desc)
+        return self
+
+    def insert(self, payload):
+        self.action, self.payload = 'insert', payload
+        return self
+
+    def delete(self):
+        self.action = 'delete'
+        return self
+
+    def execute(self):
+        if self.latency:
+            time.sleep(self.latency)
+        with self.store['lock']:
+            rows = self.store['rows']
+            if self.action == 'insert':
+                self.store['next_id'] += 1
+                row = dict(self.payload, id=self.store['next_id'], created_at=datetime.now().isoformat())
+                rows.append(row)
+                return _Result([row])
+            matched = [row for row in rows if all(check(row) for check in self.filters)]
+            if self.action == 'delete':
+                self.store['rows'] = [row for row in rows if row not in matched]
+                return _Result(matched)
+            if self.order_desc:
+                column, desc = self.order_desc
+                matched = sorted(matched, key=lambda row: row.get(column) or '', reverse=desc)
+            return _Result([dict(row) for row in matched])
+
+
+class InMemorySupabase:
+    """Minimal supabase client stand-in: table('bookmarks') with select/eq/in_/order/insert/delete."""
+
+    def __init__(self, latency_ms: float = 0.0):
+        self.latency = latency_ms / 1000.0
+        self.store = {'rows': [], 'next_id': 0, 'lock': threading.Lock()}
+
+    def table(self, name):
+        return _BookmarksQuery(self.store, self.latency)
+
+
+# --- SEEDING ---
+
+def make_redis(redis_url: str = None):
+    import redis
+    if redis_url:
+        client = redis.Redis.from_url(redis_url, decode_responses=True)
+        client.flushdb()
+        return client
+    try:
+        import fakeredis
+    except ImportError:
+        sys.exit("fakeredis is not installed: pip install fakeredis, or pass --redis-url redis://localhost:6379/15")
+    return fakeredis.FakeRedis(decode_responses=True)
+
+def seed_redis(redis_client, news_days: int, news_per_day: int, stock_years: int) -> dict:
+    """Run the real news and stock sync functions against synthetic tables."""
+    import push_data_news_to_Redis as news_agent
+    import push_data_stock_to_Redis as stock_agent
+
+    news_tables = generate_news_tables(news_days, news_per_day)
+    stock_tables = generate_stock_tables(stock_years)
+
+    news_agent.get_db_connection = lambda: SyntheticConnection(news_tables)
+    news_agent.get_redis_connection = lambda: redis_client
+    stock_agent.get_db_connection = lambda: SyntheticConnection(stock_tables)
+    stock_agent.get_redis_connection = lambda: redis_client
+
+    start = time.perf_counter()
+    news_count = news_agent.sync_postgres_to_redis(full=True)
+    news_seconds = time.perf_counter() - start
+    # Edit a few rows past the high-water mark and let the incremental path pick them up
+    changed_rows = touch_news_rows(news_tables, count=max(1, news_per_day // 10))
+    start = time.perf_counter()
+    incremental_count = news_agent.sync_postgres_to_redis()
+    incremental_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    stock_agent.sync_stock_data_to_redis()
+    stock_seconds = time.perf_counter() - start
+    return {
+        "news_records": news_count,
+        "news_sync_seconds": round(news_seconds, 4),
+        "news_incremental_records": incremental_count,
+        "news_rows_touched": changed_rows,
+        "news_incremental_seconds": round(incremental_seconds, 4),
+        "stock_sync_seconds": round(stock_seconds, 4),
+        "redis_keys": redis_client.dbsize()
+    }
+
+def wire_services(redis_client, supabase_latency_ms: float):
+    """Point the API services at the seeded Redis and the in-memory Supabase."""
+    from app import services
+    from app.auth import AuthUser
+    services.redis_client_news = redis_client
+    services.redis_client_stock = redis_client
+    services.supabase = InMemorySupabase(supabase_latency_ms)
+    services.payload_cache.clear()
+    # Pre-verified token: the benchmark measures the API, not JWT parsing
+    services.token_verifier.cache_ttl = 10 ** 9
+    services.token_verifier.remember(BENCH_TOKEN, AuthUser({'sub': BENCH_USER_ID}))
+    return services
+
+
+# --- REQUEST MIXES ---
+
+def news_request(rng, dates):
+    params = {"page": rng.choice([1, 1, 1, 2, 3, 5]), "limit": rng.choice([5, 5, 10, 20])}
+    industry = rng.choice([None, None, "Finance", "Technology", "FPT", "VCB"])
+    sentiment = rng.choice(FILTER_SENTIMENTS)
+    if industry:
+        params["industry"] = industry
+    if sentiment:
+        params["sentiment"] = sentiment
+    if rng.random() < 0.3:
+        params["date"] = rng.choice(dates)
+    query = "&".join(f"{key}={value}" for key, value in params.items())
+    return "GET", f"/api/news?{query}", None
+
+def stock_request(rng, dates):
+    return "GET", f"/api/stocks/{rng.choice(TICKERS)}/history?range={rng.choice(STOCK_RANGES)}", None
+
+def bookmarks_request(rng, dates):
+    return "GET", "/api/bookmarks", None
+
+def bookmark_status_request(rng, dates):
+    ids = [f"https://example.com/general_news/{rng.randint(1, 400)}" for _ in range(20)]
+    return "POST", "/api/bookmarks/status", {"article_ids": ids}
+
+def bookmark_toggle_request(rng, dates):
+    article_id = f"https://example.com/general_news/{rng.randint(1, 50)}"
+    return "POST", "/api/bookmarks/toggle", {"article_id": article_id, "title": "benchmark"}
+
+ROUTES = {
+    "news": news_request,
+    "stock": stock_request,
+    "bookmarks": bookmarks_request,
+    "bookmark_status": bookmark_status_request,
+    "bookmark_toggle": bookmark_toggle_request,
+}
+
+
+# --- RUNNER ---
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, int(round(fraction * (len(sorted_values) - 1)))))
+    return sorted_values[index]
+
+def run_route(app, route_name, total_requests, concurrency, seed=0):
+    """Fire total_requests at one route from `concurrency` threads; returns stats."""
+    make_request = ROUTES[route_name]
+    dates = [(date.today() - timedelta(days=offset)).isoformat() for offset in range(5)]
+    latencies = []
+    statuses = {}
+    lock = threading.Lock()
+    per_thread = [total_requests // concurrency + (1 if i < total_requests % concurrency else 0)
+                  for i in range(concurrency)]
+
+    def worker(thread_index):
+        rng = random.Random(seed * 1000 + thread_index)
+        client = app.test_client()
+        headers = {"Authorization": f"Bearer {BENCH_TOKEN}"}
+        local_latencies, local_statuses = [], {}
+        for _ in range(per_thread[thread_index]):
+            method, url, body = make_request(rng, dates)
+            start = time.perf_counter()
+            response = client.open(url, method=method, json=body, headers=headers)
+            local_latencies.append((time.perf_counter() - start) * 1000.0)
+            local_statuses[response.status_code] = local_statuses.get(response.status_code, 0) + 1
+        with lock:
+            latencies.extend(local_latencies)
+            for status, count in local_statuses.items():
+                statuses[status] = statuses.get(status, 0) + count
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(worker, range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    errors = sum(count for status, count in statuses.items() if status >= 500)
+    return {
+        "requests": len(latencies),
+        "concurrency": concurrency,
+        "elapsed_seconds": round(elapsed, 4),
+        "throughput_rps": round(len(latencies) / elapsed, 2) if elapsed else None,
+        "latency_ms": {
+            "mean": round(sum(latencies) / len(latencies), 3) if latencies else None,
+            "p50": round(percentile(latencies, 0.50), 3) if latencies else None,
+            "p95": round(percentile(latencies, 0.95), 3) if latencies else None,
+            "p99": round(percentile(latencies, 0.99), 3) if latencies else None,
+            "max": round(latencies[-1], 3) if latencies else None,
+        },
+        "status_codes": {str(status): count for status, count in sorted(statuses.items())},
+        "errors": errors
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description='Load test the dashboard API against seeded Redis payloads')
+    parser.add_argument('--routes', default=",".join(ROUTES), help=f"Comma-separated routes ({', '.join(ROUTES)})")
+    parser.add_argument('--concurrency', type=int, default=8, help='Concurrent client threads per route')
+    parser.add_argument('--requests', type=int, default=400, help='Requests per route')
+    parser.add_argument('--warmup', type=int, default=20, help='Unmeasured requests per route before measuring')
+    parser.add_argument('--news-days', type=int, default=7, help='Days of synthetic news per table')
+    parser.add_argument('--news-per-day', type=int, default=60, help='General_News articles per day')
+    parser.add_argument('--stock-years', type=int, default=8, help='Years of synthetic daily prices per ticker')
+    parser.add_argument('--supabase-latency-ms', type=float, default=0.0, help='Simulated Supabase round trip')
+    parser.add_argument('--redis-url', help='Use a real Redis (database is FLUSHED) instead of fakeredis')
+    parser.add_argument('--output', help='Write the JSON report to this file as well')
+    args = parser.parse_args()
+
+    route_names = [name.strip() for name in args.routes.split(",") if name.strip()]
+    unknown = [name for name in route_names if name not in ROUTES]
+    if unknown:
+        parser.error(f"Unknown routes: {unknown}")
+
+    redis_client = make_redis(args.redis_url)
+    seed_info = seed_redis(redis_client, args.news_days, args.news_per_day, args.stock_years)
+    wire_services(redis_client, args.supabase_latency_ms)
+    from app.routes import app
+
+    report = {
+        "started_at": datetime.now().isoformat(timespec='seconds'),
+        "backend": "redis" if args.redis_url else "fakeredis",
+        "seed": seed_info,
+        "routes": {}
+    }
+    for index, route_name in enumerate(route_names):
+        if args.warmup:
+            run_route(app, route_name, args.warmup, min(args.concurrency, args.warmup), seed=index + 100)
+        report["routes"][route_name] = run_route(app, route_name, args.requests, args.concurrency, seed=index)
+
+    output = json.dumps(report, indent=2, ensure_ascii=False)
+    print(output)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(output)
+    return 0 if all(stats["errors"] == 0 for stats in report["routes"].values()) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
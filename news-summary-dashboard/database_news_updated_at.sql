@@ -0,0 +1,34 @@
+-- News updated_at tracking for the incremental Redis sync
+-- The news agent (agent/push_data_news_to_Redis.py) keeps a high-water mark of
+-- updated_at per table and only pulls rows changed since the last sync.
+-- now() is the start time of the writing transaction, so a row can commit with
+-- an updated_at below the mark of a sync that ran meanwhile; the agent re-reads
+-- NEWS_SYNC_LAG_SECONDS before the mark to pick such rows up. Deleted rows are
+-- not seen by incremental syncs; a full sync runs every NEWS_FULL_SYNC_SECONDS.
+
+-- 1. Shared trigger function
+CREATE OR REPLACE FUNCTION set_updated_at()
+RETURNS TRIGGER AS $$
+BEGIN
+    NEW.updated_at = now();
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+-- 2. Column, trigger and index on every news table
+DO $$
+DECLARE
+    news_table TEXT;
+BEGIN
+    FOREACH news_table IN ARRAY ARRAY['General_News', 'FPT_News', 'GAS_News', 'IMP_News', 'VCB_News']
+    LOOP
+        EXECUTE format('ALTER TABLE %I ADD COLUMN IF NOT EXISTS updated_at TIMESTAMPTZ NOT NULL DEFAULT now()', news_table);
+        EXECUTE format('DROP TRIGGER IF EXISTS trg_%s_updated_at ON %I', lower(news_table), news_table);
+        EXECUTE format(
+            'CREATE TRIGGER trg_%s_updated_at BEFORE UPDATE ON %I FOR EACH ROW EXECUTE FUNCTION set_updated_at()',
+            lower(news_table), news_table
+        );
+        EXECUTE format('CREATE INDEX IF NOT EXISTS idx_%s_updated_at ON %I (updated_at)', lower(news_table), news_table);
+    END LOOP;
+END;
+$$;